@@ -1,6 +1,8 @@
+import json
 import uuid
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from app.core.research_manager import ResearchManager, get_research_manager
 from app.models.research import PlanResponse, ResearchRequest, ResearchResponse, ResearchStatus
@@ -23,6 +25,7 @@ async def start_research(
         topic=request.topic,
         config=request.config,
         user_id=request.user_id,
+        priority=request.priority,
     )
 
     return ResearchResponse(
@@ -46,6 +49,40 @@ async def get_research_status(
     return status
 
 
+@router.get("/{research_id}/events")
+async def stream_research_events(
+    research_id: str,
+    last_event_id: int | None = None,
+    last_event_id_header: int | None = Header(None, alias="Last-Event-ID"),
+    research_manager: ResearchManager = Depends(get_research_manager),
+):
+    """リサーチの進捗イベントを Server-Sent Events で配信
+
+    最初に現在の状態を snapshot として送り、以降はステータス・進捗（status）、計画の作成（plan）、
+    セクションの完了（section）を発生順に送る。再接続時は Last-Event-ID ヘッダー（または last_event_id パラメータ）
+    のイベントより後から再開する。終了状態（completed / error / cancelled）になるとストリームを閉じる。
+    """
+    if research_manager.research_service.get_status(research_id) is None:
+        raise HTTPException(status_code=404, detail=f"Research ID {research_id} not found")
+
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+
+    async def _event_stream():
+        yield "retry: 3000\n\n"
+        async for event in research_manager.stream_events(research_id, resume_from):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        _event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{research_id}/plan", response_model=PlanResponse)
 async def get_research_plan(
     research_id: str,
@@ -73,10 +110,28 @@ async def get_research_result(
 @router.get("/list", response_model=list[ResearchStatus])
 async def list_researches(
     user_id: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    before_id: str | None = None,
+    research_manager: ResearchManager = Depends(get_research_manager),
+):
+    """リサーチのリストを作成日時の新しい順に取得
+
+    続きのページは、前のページの最後のリサーチの created_at を before に、research_id を before_id に指定して取得する。
+    """
+    return await research_manager.list_researches(user_id=user_id, limit=limit, before=before, before_id=before_id)
+
+
+@router.post("/{research_id}/cancel")
+async def cancel_research(
+    research_id: str,
     research_manager: ResearchManager = Depends(get_research_manager),
 ):
-    """リサーチのリストを取得"""
-    return await research_manager.list_researches(user_id=user_id)
+    """キュー待ち・実行中・フィードバック待ちのリサーチを取り消す"""
+    success = await research_manager.cancel_research(research_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=f"Running research ID {research_id} not found")
+    return {"message": f"Research {research_id} cancelled"}
 
 
 @router.delete("/{research_id}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.core.user_manager import UserManager, get_user_manager
 from app.models.user import LoginRequest, LoginResponse, UserCreate, UserResponse
@@ -45,10 +45,15 @@ async def get_user(
 @router.get("/{username}/researches")
 async def get_user_researches(
     username: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    before_id: str | None = None,
     user_manager: UserManager = Depends(get_user_manager),
 ):
-    """ユーザーのリサーチ一覧を取得"""
-    researches = await user_manager.get_user_researches(username=username)
+    """ユーザーのリサーチ一覧を作成日時の新しい順に取得（続きは before / before_id で取得）"""
+    researches = await user_manager.get_user_researches(
+        username=username, limit=limit, before=before, before_id=before_id
+    )
     return researches
 
 
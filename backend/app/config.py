@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -12,6 +13,30 @@ USERS_DIR = DATA_DIR / "users"
 
 USERS_DIR.mkdir(parents=True, exist_ok=True)
 
+# 同時に実行するリサーチの数（プロセスごと。超えた分はキューで待つ）
+MAX_CONCURRENT_RESEARCHES = int(os.getenv("MAX_CONCURRENT_RESEARCHES", "5"))
+
+# リサーチの実行方法（inprocess: API サーバーの各プロセス内で実行 / worker: `python -m app.worker` のプロセスで実行）
+RESEARCH_EXECUTION_MODE = os.getenv("RESEARCH_EXECUTION_MODE", "inprocess")
+
+# ワーカーのジョブのリース（ハートビートで延長し、期限が切れたジョブは他のワーカーが引き継ぐ）
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+# 実行中のジョブが取り消されていないかを確認する間隔（他の API プロセスからの取り消しを検知する）
+JOB_CANCEL_POLL_SECONDS = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# 実行中のリサーチの状態をまとめて DB に書き込む間隔（計画の作成・interrupt・完了ではすぐに書き込む）
+RESEARCH_STATE_FLUSH_SECONDS = float(os.getenv("RESEARCH_STATE_FLUSH_SECONDS", "1.0"))
+
+# 進捗イベントのストリーム（/api/research/{id}/events）が他のプロセスで書き込まれたイベントを確認する間隔と、
+# 接続を保つためのコメントを送る間隔（同じプロセスで書き込まれたイベントはすぐに配信する）
+RESEARCH_EVENTS_POLL_SECONDS = float(os.getenv("RESEARCH_EVENTS_POLL_SECONDS", "1.0"))
+RESEARCH_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("RESEARCH_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+# 研究をまたいで共有する PDF・CSV のテキストのキャッシュの合計サイズの上限（取り込み後に使われていない順に削減する）
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
 # 匿名ユーザー用のディレクトリ名
 ANONYMOUS_USER_DIR = "anonymous"
 
@@ -36,3 +61,10 @@ def get_research_fts_database(research_id: str) -> Path:
     fts_db_dir = DATA_DIR / "fts_databases"
     fts_db_dir.mkdir(parents=True, exist_ok=True)
     return fts_db_dir / f"{research_id}.sqlite"
+
+
+def get_research_vector_store(research_id: str) -> Path:
+    """研究IDに基づいたベクトルストアのディレクトリを取得"""
+    vector_store_dir = DATA_DIR / "vector_stores" / research_id
+    vector_store_dir.mkdir(parents=True, exist_ok=True)
+    return vector_store_dir
@@ -0,0 +1,34 @@
+"""リサーチの進捗イベントの通知
+
+イベントは research_events テーブルに書き込まれ、ストリームはテーブルを id 順に読んで配信する。
+同じプロセスで書き込んだ場合は notify_research_events で待機中のストリームをすぐに起こし、
+他のプロセス（ワーカーや別の API プロセス）で書き込まれたイベントはポーリングで拾う。
+"""
+
+import asyncio
+
+# research id -> イベントを待っているストリーム
+_waiters: dict[str, set[asyncio.Event]] = {}
+
+
+def notify_research_events(research_id: str):
+    """research_id のイベントを書き込んだことを、このプロセスで待機中のストリームに知らせる"""
+    for waiter in _waiters.get(research_id, ()):
+        waiter.set()
+
+
+async def wait_for_research_events(research_id: str, timeout: float) -> bool:
+    """イベントの書き込みが通知されるか timeout 秒が経つまで待つ（通知された場合は True）"""
+    waiter = asyncio.Event()
+    _waiters.setdefault(research_id, set()).add(waiter)
+    try:
+        await asyncio.wait_for(waiter.wait(), timeout)
+        return True
+    except TimeoutError:
+        return False
+    finally:
+        waiters = _waiters.get(research_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del _waiters[research_id]
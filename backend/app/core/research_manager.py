@@ -1,231 +1,148 @@
 import asyncio
 import json
-import threading
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import aiosqlite
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.types import Command
 
-from app.config import DATA_DIR, get_document_metadata_file, get_research_fts_database, get_user_documents_dir
+from app.config import (
+    DATA_DIR,
+    MAX_CONCURRENT_RESEARCHES,
+    RESEARCH_EVENTS_KEEPALIVE_SECONDS,
+    RESEARCH_EVENTS_POLL_SECONDS,
+    RESEARCH_EXECUTION_MODE,
+    TEXT_CACHE_MAX_BYTES,
+    get_document_metadata_file,
+    get_research_fts_database,
+    get_research_vector_store,
+    get_user_documents_dir,
+)
+from app.core.research_events import notify_research_events, wait_for_research_events
+from app.core.research_state import ResearchStateWriter
 from app.db.models import init_db
 from app.models.research import DEFAULT_REPORT_STRUCTURE, PlanResponse, ResearchConfig, ResearchStatus, SectionModel
+from app.services.job_queue_service import get_job_queue_service
 from app.services.research_service import get_research_service
-from open_deep_researcher.graph import builder
 
 CHECKPOINTS_DATABASE_URL = f"{DATA_DIR}/checkpoints.db"
 
+# これ以上イベントが発生しない研究のステータス
+TERMINAL_STATUSES = ("completed", "error", "cancelled")
+
 
 class ResearchSession:
+    """1回分のグラフ実行（開始、またはフィードバックからの再開）を行うジョブ
+
+    グラフが interrupt() で止まるとチェックポイントに状態が保存され、ジョブはそこで終了する。
+    フィードバック待ちの間はワーカーもメモリも使わず、フィードバックを受け取ったら
+    resume を指定した新しいセッションでチェックポイントから再開する。
+    """
+
     def __init__(
         self,
         research_id: str,
         topic: str,
         config_dict: dict,
         user_id: str | None = None,
+        resume: Command | None = None,
     ):
         self.research_id = research_id
         self.topic = topic
         self.config_dict = config_dict
         self.user_id = user_id
-        self.feedback_event = threading.Event()  # フィードバック受信を通知するイベント
-        self.feedback_content = None  # フィードバック内容を保持
-        self.is_running = True
-        self.checkpoint_path = None
+        self.resume = resume  # 再開時に渡すコマンド（None の場合は最初から実行）
+        self.requeue_on_cancel = False  # True の場合、キャンセルされても研究を cancelled にしない（ワーカーの停止時）
 
-    def run_thread(self):
-        """スレッド内で実行されるメイン関数"""
+    async def run(self, graph):
+        """ワーカー（API サーバー内、またはワーカープロセス）から実行されるメイン関数"""
+        research_service = get_research_service()
         try:
-            # 新しいイベントループを作成
-            event_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(event_loop)
-            event_loop.run_until_complete(self._execute_research_workflow())
-
+            await self._execute_research_workflow(graph, research_service)
+        except asyncio.CancelledError:
+            if not self.requeue_on_cancel:
+                print(f"{self.research_id} がキャンセルされました")
+                await asyncio.to_thread(mark_research_status, research_service, self.research_id, "cancelled")
+                notify_research_events(self.research_id)
+            raise
         except Exception as e:
-            print(f"run_thread error: {e}")
-            research_service = get_research_service()
-            research_data = research_service.get_research(self.research_id)
-            if research_data:
-                research_data["status"] = "error"
-                research_data["error"] = f"スレッド実行エラー: {str(e)}"
-                research_service.save_research(research_data)
-
-    async def _execute_research_workflow(self):
-        init_db()
-
-        research_service = get_research_service()
+            print(f"research session error: {traceback.format_exc()}")
+            await asyncio.to_thread(
+                mark_research_status, research_service, self.research_id, "error", f"実行エラー: {str(e)}"
+            )
+            notify_research_events(self.research_id)
+
+    async def _get_graph_input(self, graph, research_data: dict, configurable: dict) -> tuple[bool, object]:
+        """(実行するか, グラフに渡す入力) を決める（入力が None の場合は最後のチェックポイントから続ける）
+
+        ワーカーの停止やプロセスの異常終了で中断したジョブを再実行する場合も、同じ判定で続きから実行する。
+        """
+        # 前回の実行が interrupt まで進んでいれば、フィードバック待ちのままにする
+        if research_data["status"] == "waiting_for_feedback":
+            return False, None
+        # 前回の実行が途中で止まっていれば、最後のチェックポイントから続ける
+        state = await graph.aget_state({"configurable": configurable})
+        if state.next and not any(task.interrupts for task in state.tasks):
+            print(f"{self.research_id} をチェックポイントから再開します")
+            return True, None
+
+        if self.resume is not None:
+            return True, self.resume
+
+        research_data["status"] = "initializing"
+        await asyncio.to_thread(get_research_service().update_research, self.research_id, status="initializing")
+        notify_research_events(self.research_id)
+        return True, {"topic": self.topic}
+
+    async def _execute_research_workflow(self, graph, research_service):
         configurable = _create_configurable(self.config_dict, self.research_id, self.user_id)
 
-        conn = await aiosqlite.connect(str(CHECKPOINTS_DATABASE_URL))
-        checkpointer = AsyncSqliteSaver(conn)
-        graph = builder.compile(checkpointer=checkpointer)
-
+        research_data = await asyncio.to_thread(research_service.get_research, self.research_id)
+        if not research_data:
+            return
+        should_run, graph_input = await self._get_graph_input(graph, research_data, configurable)
+        if not should_run:
+            return
+
+        # interrupt() またはグラフの終了までイベントを処理する。状態はメモリ上で更新し、まとめて DB に書き込む
+        state = ResearchStateWriter(self.research_id, research_data, research_service)
+        state.start()
         try:
-            # 初期実行
-            await self._run_initial_stream(graph, research_service, configurable)
-            while self.is_running:  # feedback
-                research_data = research_service.get_research(self.research_id)
-                if not research_data:
-                    break
-
-                if research_data["status"] == "completed":
-                    break
-
-                print(f"{self.research_id} waiting for feedback...")
-                self.feedback_event.clear()
-                self.feedback_event.wait()
-
-                feedback = self.feedback_content
-                self.feedback_content = None
-                await self._process_feedback(graph, feedback, research_service, configurable)
+            async for _, event in graph.astream(
+                graph_input, {"configurable": configurable}, stream_mode=["updates", "custom"]
+            ):
+                state.submit(event)
+                if state.deleted:
+                    print(f"{self.research_id} が削除されたため、実行を中止します")
+                    return
         finally:
-            await conn.close()
-
-    async def _run_initial_stream(self, graph, research_service, configurable):
-        """初期研究実行を処理"""
-        async for event in graph.astream({"topic": self.topic}, {"configurable": configurable}, stream_mode="updates"):
-            _process_event(self.research_id, event, research_service)
-            research_data = research_service.get_research(self.research_id)
-            if not research_data:
-                return
+            await state.close()
 
-    async def _process_feedback(self, graph, feedback, research_service, configurable):
-        """フィードバックの処理と継続実行"""
-        research_data = research_service.get_research(self.research_id)
-        if research_data:
-            research_data["status"] = "processing_feedback"
-            research_service.save_research(research_data)
+        if state.status == "waiting_for_feedback":
+            print(f"{self.research_id} waiting for feedback...")
 
-        if feedback is None or feedback.strip() == "":
-            command = Command(resume=True)  # フィードバックなし
-        else:
-            command = Command(resume=feedback)
 
-        async for event in graph.astream(command, {"configurable": configurable}, stream_mode="updates"):
-            _process_event(self.research_id, event, research_service)
+def create_research_session(research_data: dict, kind: str, payload: dict) -> ResearchSession:
+    """研究の情報とジョブの種類（start / resume）からセッションを作る"""
+    resume = _build_resume_command(payload.get("feedback")) if kind == "resume" else None
+    return ResearchSession(
+        research_data["id"],
+        research_data["topic"],
+        research_data.get("config") or {},
+        research_data.get("user_id"),
+        resume=resume,
+    )
 
-            research_data = research_service.get_research(self.research_id)
-            if not research_data:
-                return
 
-    def add_feedback(self, feedback):
-        """フィードバックを設定し、イベントを通知"""
-        self.feedback_content = feedback
-        self.feedback_event.set()  # 待機中のスレッドに通知
-
-
-def _process_event(research_id: str, event: dict, research_service) -> None:  # noqa: C901
-    """イベントを処理してステータスを更新"""
-    research_data = research_service.get_research(research_id)
-    if not research_data:
-        print(f"{research_id} のデータが見つかりません")
-        return
-
-    # TODO: refactoring
-    if "generate_report_plan" in event:
-        if "sections" in event["generate_report_plan"]:
-            # セクションリストを更新
-            sections = event["generate_report_plan"]["sections"]
-            research_data["sections"] = [
-                {
-                    "name": s.name,
-                    "description": s.description,
-                    "content": s.content or "",
-                    "search_options": s.search_options,
-                }
-                for s in sections
-            ]
+def _build_resume_command(feedback: str | None) -> Command:
+    """フィードバックからグラフを再開するコマンドを作る"""
+    if feedback is None or feedback.strip() == "":
+        return Command(resume=True)  # フィードバックなし
+    return Command(resume=feedback)
+
 
-    elif "__interrupt__" in event:
-        research_data["waiting_for_feedback"] = True
-        research_data["status"] = "waiting_for_feedback"
-
-    elif "human_feedback" in event:
-        research_data["status"] = "human_feedback"
-
-    elif "setup_knowledge_base" in event:
-        research_data["status"] = "setup_knowledge_base"
-        research_data["progress"] = 0.1
-
-    elif "determine_if_question" in event:
-        research_data["status"] = "analyzing_question"
-        research_data["progress"] = 0.15
-
-    elif "generate_introduction" in event:
-        research_data["status"] = "writing_introduction"
-        if "introduction" in event["generate_introduction"]:
-            research_data["introduction"] = event["generate_introduction"]["introduction"]
-        if "all_urls" in event["generate_introduction"]:
-            research_data["all_urls"] = event["generate_introduction"]["all_urls"]
-        research_data["progress"] = 0.2
-
-    elif "build_section_with_research" in event:
-        research_data["status"] = "researching_sections"
-        research_data["progress"] = 0.4
-
-        if "completed_sections" in event["build_section_with_research"]:
-            # 完了したセクションを追加
-            completed_sections = research_data.get("completed_sections", [])
-            for section in event["build_section_with_research"]["completed_sections"]:
-                section_name = section.name
-                if section_name not in completed_sections:
-                    completed_sections.append(section_name)
-
-                # セクションの内容を更新
-                sections = research_data.get("sections", [])
-                for i, s in enumerate(sections):
-                    if s["name"] == section_name:
-                        sections[i]["content"] = section.content
-                research_data["sections"] = sections
-
-            research_data["completed_sections"] = completed_sections
-
-            # 進捗率を更新
-            total_sections = len(research_data.get("sections", [])) if research_data.get("sections") else 1
-            completed = len(completed_sections)
-            research_data["progress"] = min(0.8, completed / total_sections) if total_sections > 0 else 0
-
-        if "all_urls" in event["build_section_with_research"]:
-            all_urls = research_data.get("all_urls", []) + event["build_section_with_research"]["all_urls"]
-            research_data["all_urls"] = list(set(all_urls))
-
-    elif "gather_completed_sections" in event:
-        research_data["status"] = "collecting_sections"
-        research_data["progress"] = 0.8
-
-    elif "generate_conclusion" in event:
-        research_data["status"] = "generating_conclusion"
-        if "conclusion" in event["generate_conclusion"]:
-            research_data["conclusion"] = event["generate_conclusion"]["conclusion"]
-        research_data["progress"] = 0.9
-
-    elif "compile_final_report" in event:
-        if "final_report" in event["compile_final_report"]:
-            # 最終レポートを保存
-            research_data["final_report"] = event["compile_final_report"]["final_report"]
-            research_data["status"] = "completed"
-            research_data["progress"] = 1.0
-            research_data["completed_at"] = datetime.now().isoformat()
-            print(f"research {research_id} が完了しました！")
-        else:
-            research_data["status"] = "compiling_report"
-
-    # デバッグ用：不明なイベントタイプがあれば内容を詳細に検査
-    else:
-        print(f"不明なイベントタイプ（{research_id}）: {event.keys()}")
-        # イベントの内容をデバッグ出力
-        for key, value in event.items():
-            if isinstance(value, dict):
-                print(f"  {key} のキー: {value.keys()}")
-                if "final_report" in value:
-                    research_data["final_report"] = value["final_report"]
-                    research_data["status"] = "completed"
-                    research_data["progress"] = 1.0
-                    print(f"予期しないイベント形式で最終レポートを発見 -  {research_id} が完了")
-
-    research_service.save_research(research_data)
+def mark_research_status(research_service, research_id: str, status: str, error: str | None = None):
+    """研究のステータスを終了状態（cancelled / error）に更新"""
+    research_service.update_research(research_id, status=status, error=error, waiting_for_feedback=False)
 
 
 def _create_configurable(
@@ -275,6 +192,22 @@ def _create_configurable(
             "chunk_overlap": 2000,
             "top_k": 5,
             "enabled_files": _get_enable_local_document_files(user_id=user_id),
+            # 研究をまたいで同じファイルから抽出したテキストを再利用する
+            "text_cache_dir": str(DATA_DIR / "text_cache"),
+            "text_cache_max_bytes": TEXT_CACHE_MAX_BYTES,
+        },
+        "hybrid_search_config": {
+            "vector_store_path": str(get_research_vector_store(research_id)),
+            "embedding_provider": "hashing",
+            "embedding_model": "hashing-512",
+            "rrf_k": 60,
+            # 研究をまたいで同じチャンクの埋め込みを再利用する
+            "embedding_cache_dir": str(DATA_DIR / "embedding_cache"),
+        },
+        "tfidf_search_config": {
+            "lsa_components": 0,
+            "use_lsa": True,
+            "rrf_k": 60,
         },
         # 言語設定
         "language": "japanese",
@@ -308,14 +241,37 @@ def _get_enable_local_document_files(user_id: str = None) -> list:
 
 
 class ResearchManager:
-    """研究管理クラス（データベース中心・スレッド分離実装）"""
+    """研究管理クラス（データベース中心）
+
+    ジョブ・実行中のワーカー（リースの所有者）・フィードバックはすべてデータベースに保存するため、
+    どの API プロセスでも開始・フィードバック・取り消し・削除を受け付けられる。
+    execution_mode が "inprocess" の場合は API プロセス内のワーカーがジョブテーブルからジョブを取得して実行し、
+    "worker" の場合は `python -m app.worker` のプロセスに実行させる。
+    """
 
-    def __init__(self):
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_RESEARCHES, execution_mode: str = RESEARCH_EXECUTION_MODE):
         init_db()
 
         self.research_service = get_research_service()
-        self.thread_pool = ThreadPoolExecutor(max_workers=5)  # 同時実行数制限
-        self.sessions = {}  # research id -> ResearchSessionのマッピング
+        self.job_queue = get_job_queue_service()
+        self.execution_mode = execution_mode
+
+        # API プロセス内のワーカー（inprocess の場合のみ。start() で起動する）
+        self.worker = None
+        self._worker_task = None
+        if not self.uses_workers:
+            from app.worker import ResearchWorker
+
+            self.worker = ResearchWorker(concurrency=max_concurrency)  # 同時実行数制限
+
+    @property
+    def uses_workers(self) -> bool:
+        return self.execution_mode == "worker"
+
+    def start(self):
+        """API プロセス内のワーカーをサーバーのイベントループ上で起動する（inprocess の場合）"""
+        if self.worker is not None and self._worker_task is None:
+            self._worker_task = asyncio.create_task(self.worker.run(handle_signals=False))
 
     async def execute_research(
         self,
@@ -323,15 +279,16 @@ class ResearchManager:
         topic: str,
         config: ResearchConfig = None,
         user_id: str = None,
+        priority: int = 0,
     ):
-        """研究を実行する"""
+        """研究をキューに追加する（priority が小さいほど先に実行する）"""
         try:
             # 初期状態をデータベースに保存
             now = datetime.now().isoformat()
             research_data = {
                 "id": research_id,
                 "topic": topic,
-                "status": "initializing",
+                "status": "queued",
                 "config": config.dict() if config else {},
                 "created_at": now,
                 "updated_at": now,
@@ -349,16 +306,8 @@ class ResearchManager:
             # データベースに保存
             self.research_service.save_research(research_data)
 
-            # セッションを作成して開始
-            config_dict = config.dict() if config else {}
-            session = ResearchSession(research_id, topic, config_dict, user_id)
-            self.sessions[research_id] = session
-
-            # ThreadPoolExecutorで実行
-            future = self.thread_pool.submit(session.run_thread)
-
-            # 完了を監視するタスクを作成
-            asyncio.create_task(self._wait_for_completion(research_id, future))
+            # キューに追加
+            self._submit_job(research_id, "start", {}, priority)
 
             return True
 
@@ -376,45 +325,60 @@ class ResearchManager:
             print(f"execute_research error: {traceback.format_exc()}")
             return False
 
-    async def _wait_for_completion(self, research_id, future):
-        """スレッドの完了を待つ"""
-        try:
-            await asyncio.to_thread(future.result)
-        except Exception as e:
-            print(f"{research_id} の実行中にエラーが発生: {e}")
-            research_data = self.research_service.get_research(research_id)
-            if research_data:
-                research_data["status"] = "error"
-                research_data["error"] = str(e)
-                self.research_service.save_research(research_data)
-        finally:
-            # 処理が完了したらセッション追跡から削除
-            if research_id in self.sessions:
-                del self.sessions[research_id]
-
-    async def submit_feedback(self, research_id, feedback=None):
-        """research plan に対するフィードバックを送信"""
-        session = self.sessions.get(research_id)
-        if not session:
-            return False
-
-        research_data = self.research_service.get_research(research_id)
-        if not research_data:
+    def _submit_job(self, research_id: str, kind: str, payload: dict, priority: int):
+        """ジョブ（start / resume）をジョブテーブルに追加する"""
+        if self.job_queue.enqueue(research_id, kind, payload, priority) is None:
+            raise RuntimeError(f"{research_id} のジョブをキューに追加できませんでした")
+        if self.worker is not None:
+            # このプロセスのワーカーが待機中なら、ポーリングを待たずに取得させる
+            self.start()
+            self.worker.notify()
+
+    async def submit_feedback(self, research_id, feedback=None, priority: int = 0):
+        """research plan に対するフィードバックを送信し、チェックポイントから再開するジョブをキューに追加する"""
+        # フィードバック待ちの場合だけ処理中に更新する（複数の API プロセスで同時に受け付けても1回だけ通る）
+        if not self.research_service.transition_status(
+            research_id, "waiting_for_feedback", "processing_feedback", waiting_for_feedback=False
+        ):
             return False
+        notify_research_events(research_id)
 
-        if research_data["status"] != "waiting_for_feedback" or not research_data.get("waiting_for_feedback"):
+        try:
+            self._submit_job(research_id, "resume", {"feedback": feedback}, priority)
+        except Exception as e:
+            print(f"submit_feedback error: {traceback.format_exc()}")
+            mark_research_status(self.research_service, research_id, "error", str(e))
+            notify_research_events(research_id)
             return False
 
-        # フィードバック処理中に状態を更新
-        research_data["waiting_for_feedback"] = False
-        research_data["status"] = "processing_feedback"
-        self.research_service.save_research(research_data)
+        return True
 
-        # フィードバックをセッションに送信
-        session.add_feedback(feedback)
+    async def cancel_research(self, research_id: str) -> bool:
+        """キュー待ち・実行中・フィードバック待ちの研究を取り消す"""
+        previous_status = self.job_queue.cancel(research_id)
+        if previous_status == "queued":
+            # キュー待ちだったジョブは実行されないため、ここでステータスを更新する
+            mark_research_status(self.research_service, research_id, "cancelled")
+            notify_research_events(research_id)
+            return True
+        if previous_status == "running":
+            # このプロセスで実行中ならすぐに止める。他のプロセスのワーカーはポーリングで取り消しを検知し、
+            # セッション側で研究を cancelled にする
+            if self.worker is not None:
+                self.worker.cancel_local(research_id)
+            return True
 
+        # フィードバック待ちの研究はジョブを持たないため、ステータスだけを更新する
+        if not self.research_service.transition_status(
+            research_id, "waiting_for_feedback", "cancelled", waiting_for_feedback=False
+        ):
+            return False
+        notify_research_events(research_id)
         return True
 
+    def _queue_position(self, research_id: str) -> int | None:
+        return self.job_queue.position(research_id)
+
     async def get_research_status(self, research_id: str) -> ResearchStatus:
         """研究の現在のステータスを取得"""
         # データベースから研究情報をロード
@@ -446,8 +410,52 @@ class ResearchManager:
             error=research_data.get("error"),
             completed_at=research_data.get("completed_at"),
             user_id=research_data.get("user_id"),
+            queue_position=self._queue_position(research_id),
         )
 
+    async def stream_events(self, research_id: str, last_event_id: int | None = None):  # noqa: C901
+        """研究の進捗イベントを順に返す（/events のストリーム用）
+
+        last_event_id を指定しない場合は、現在の状態を snapshot イベントとして返してから続きのイベントを返す。
+        指定した場合は、そのイベントより後のイベントから返す（再接続時の再開）。
+        終了状態のイベントを返すか研究が削除されると終了し、イベントがない間は keepalive 用に None を返す。
+        """
+        if last_event_id is None:
+            # スナップショットより前にイベントIDを読み、その間に書き込まれたイベントを取りこぼさないようにする
+            last_event_id = await asyncio.to_thread(self.research_service.get_last_event_id, research_id)
+            status = await self.get_research_status(research_id)
+            if status is None:
+                return
+            yield {"id": last_event_id, "type": "snapshot", "data": status.model_dump()}
+            if status.status in TERMINAL_STATUSES:
+                return
+
+        loop = asyncio.get_running_loop()
+        check_at = loop.time()  # 研究の存在とステータスを確認し、keepalive を送る時刻
+        while True:
+            events = await asyncio.to_thread(self.research_service.list_events, research_id, last_event_id)
+            for event in events:
+                last_event_id = event["id"]
+                yield event
+                if event["type"] == "status" and event["data"].get("status") in TERMINAL_STATUSES:
+                    return
+            if events:
+                check_at = loop.time() + RESEARCH_EVENTS_KEEPALIVE_SECONDS
+                continue
+
+            if loop.time() >= check_at:
+                status = await asyncio.to_thread(self.research_service.get_status, research_id)
+                if status is None:
+                    yield {"id": last_event_id, "type": "deleted", "data": {}}
+                    return
+                if status in TERMINAL_STATUSES:
+                    return
+                yield None
+                check_at = loop.time() + RESEARCH_EVENTS_KEEPALIVE_SECONDS
+
+            # 同じプロセスでの書き込みはすぐに通知され、他のプロセスでの書き込みはポーリングで拾う
+            await wait_for_research_events(research_id, RESEARCH_EVENTS_POLL_SECONDS)
+
     async def get_research_plan(self, research_id: str) -> PlanResponse:
         """研究プランを取得（フィードバック用）"""
         # データベースから研究情報をロード
@@ -495,46 +503,57 @@ class ResearchManager:
             "completed_at": research_data.get("completed_at", research_data.get("created_at")),
         }
 
-    async def list_researches(self, user_id: str = None) -> list[ResearchStatus]:
-        """すべての研究のリストを取得"""
-        # データベースから全ての研究情報を取得
-        researches = self.research_service.list_researches(user_id=user_id)
+    async def list_researches(
+        self,
+        user_id: str = None,
+        limit: int = 50,
+        before: str | None = None,
+        before_id: str | None = None,
+    ) -> list[ResearchStatus]:
+        """研究のリストを作成日時の新しい順に取得（before / before_id に前のページの最後の研究を指定して続きを取得）"""
+        researches = self.research_service.list_researches(
+            user_id=user_id, limit=limit, before=before, before_id=before_id
+        )
+
+        # キュー待ちの研究の順番はまとめて取得する
+        queue_positions = self.job_queue.positions(
+            [r["id"] for r in researches if r["status"] in ("queued", "processing_feedback")]
+        )
 
-        result = []
-        for research in researches:
-            sections = []
-            status = ResearchStatus(
+        return [
+            ResearchStatus(
                 research_id=research["id"],
                 status=research["status"],
                 topic=research["topic"],
-                sections=sections,
+                sections=[],
                 progress=research.get("progress", 0.0),
                 completed_sections=[],
                 final_report=None,
-                error=research.get("error"),
                 completed_at=research.get("completed_at"),
                 user_id=research.get("user_id"),
+                queue_position=queue_positions.get(research["id"]),
+                error=research.get("error"),
+                created_at=research.get("created_at"),
+                total_section_count=research["total_section_count"],
+                completed_section_count=research["completed_section_count"],
             )
-            result.append(status)
-
-        return result
+            for research in researches
+        ]
 
     async def delete_research(self, research_id):
         """研究を削除する"""
-        # セッションが存在すれば、削除し、フィードバックで終了を促す
-        session = self.sessions.pop(research_id, None)
-        if session:
-            try:
-                # 終了シグナルとして None をフィードバックとして送信
-                session.add_feedback(None)
-            except Exception:
-                pass
+        # キュー待ち・実行中であれば取り消す
+        if self.job_queue.cancel(research_id) == "running" and self.worker is not None:
+            self.worker.cancel_local(research_id)
 
         return self.research_service.delete_research(research_id)
 
-    def __del__(self):
-        if hasattr(self, "thread_pool"):
-            self.thread_pool.shutdown(wait=False)
+    async def shutdown(self):
+        """API プロセス内のワーカーを停止する（実行中のジョブは実行待ちに戻り、次の起動時や他のプロセスで続きから実行される）"""
+        if self._worker_task is not None:
+            self.worker.stop()
+            await self._worker_task
+            self._worker_task = None
 
 
 _research_manager = None
@@ -0,0 +1,223 @@
+import asyncio
+from datetime import datetime
+
+from app.config import RESEARCH_STATE_FLUSH_SECONDS
+from app.core.research_events import notify_research_events
+
+# 書き込みを終える合図
+_CLOSE = object()
+
+
+class ResearchStateWriter:
+    """実行中の研究の状態をメモリに持ち、変更をまとめて SQLite に書き込む（write-behind）
+
+    セッションはグラフのイベントを submit するだけで、イベントは非同期のキューを通して別タスクで状態に反映される。
+    変更は flush_interval 秒ごとにまとめて1つのトランザクションで書き込み、計画の作成・セクションの完了・
+    interrupt・完了などの重要な遷移ではすぐに書き込む。書き込んだ変更は進捗イベントとしても記録され、
+    /events のストリームに配信される。書き込み時に研究が削除されていれば deleted を立て、セッションに停止を伝える。
+    """
+
+    def __init__(
+        self,
+        research_id: str,
+        research_data: dict,
+        research_service,
+        flush_interval: float = RESEARCH_STATE_FLUSH_SECONDS,
+    ):
+        self.research_id = research_id
+        self.research_service = research_service
+        self.flush_interval = flush_interval
+
+        # メモリ上の現在の状態
+        self.status = research_data.get("status")
+        self.section_names = [s["name"] for s in research_data.get("sections") or []]
+        self.completed_sections = set(research_data.get("completed_sections") or [])
+        self.known_urls = set(research_data.get("all_urls") or [])
+        self.deleted = False  # 書き込み時に研究が見つからなかった
+
+        # まだ書き込んでいない変更
+        self._fields: dict = {}  # research テーブルの列
+        self._sections: list[dict] | None = None  # 置き換える計画のセクション
+        self._section_contents: dict[str, str] = {}  # 完了したセクションの名前 -> 内容
+        self._urls: dict[str, None] = {}  # 追加する URL（順序付きの集合）
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"research-state-{self.research_id}")
+
+    def submit(self, event: dict):
+        """グラフのイベントをキューに追加する"""
+        self._queue.put_nowait(event)
+
+    async def close(self):
+        """キューに残ったイベントを反映し、最後の変更を書き込んで終了する"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(_CLOSE)
+        await self._task
+        self._task = None
+
+    def _has_pending(self) -> bool:
+        return bool(self._fields or self._sections is not None or self._section_contents or self._urls)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = None  # 次にまとめて書き込む時刻
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                await self._flush()
+                deadline = None
+                continue
+
+            if event is _CLOSE:
+                await self._flush()
+                return
+
+            if self.apply(event):
+                await self._flush()
+                deadline = None
+            elif deadline is None and self._has_pending():
+                deadline = loop.time() + self.flush_interval
+
+    async def _flush(self):
+        if self.deleted or not self._has_pending():
+            return
+        fields, sections, section_contents, urls = self._fields, self._sections, self._section_contents, self._urls
+        self._fields, self._sections, self._section_contents, self._urls = {}, None, {}, {}
+
+        # DB への書き込みでサーバーのイベントループを止めないよう、別スレッドで行う
+        result = await asyncio.to_thread(
+            self.research_service.apply_changes, self.research_id, fields, sections, section_contents, list(urls)
+        )
+        if result is True:
+            notify_research_events(self.research_id)
+        elif result is False:
+            print(f"{self.research_id} のデータが見つかりません")
+            self.deleted = True
+        elif result is None:
+            # 書き込みに失敗した変更は、後の変更で上書きされていなければ次の書き込みに回す
+            self._fields = {**fields, **self._fields}
+            if self._sections is None:
+                self._sections = sections
+                self._section_contents = {**section_contents, **self._section_contents}
+            self._urls = {**urls, **self._urls}
+
+    def _set(self, **fields):
+        self._fields.update(fields)
+        if "status" in fields:
+            self.status = fields["status"]
+
+    def _add_urls(self, urls: list[str]):
+        for url in urls:
+            if url not in self.known_urls:
+                self.known_urls.add(url)
+                self._urls[url] = None
+
+    def _complete_report(self, final_report: str):
+        self._set(final_report=final_report, status="completed", progress=1.0, completed_at=datetime.now().isoformat())
+
+    def apply(self, event: dict) -> bool:  # noqa: C901
+        """イベントをメモリ上の状態に反映する（すぐに書き込むべき遷移の場合は True）"""
+        # TODO: refactoring
+        if "generate_report_plan" in event:
+            if "sections" in event["generate_report_plan"]:
+                # セクションリストを更新
+                sections = event["generate_report_plan"]["sections"]
+                self._sections = [
+                    {
+                        "name": s.name,
+                        "description": s.description,
+                        "content": s.content or "",
+                        "search_options": s.search_options,
+                    }
+                    for s in sections
+                ]
+                self._section_contents = {}
+                self.section_names = [s.name for s in sections]
+                self.completed_sections = set()
+                return True
+
+        elif "__interrupt__" in event:
+            self._set(waiting_for_feedback=True, status="waiting_for_feedback")
+            return True
+
+        elif "human_feedback" in event:
+            self._set(status="human_feedback")
+
+        elif "knowledge_base_progress" in event:
+            # ナレッジベース構築中の進捗（custom ストリーム）
+            kb_progress = event["knowledge_base_progress"]
+            self._set(status="setup_knowledge_base", progress=0.1 * kb_progress["fraction"])
+            print(
+                f"{self.research_id} knowledge base: {kb_progress['files_processed'] + kb_progress['files_failed']}"
+                f"/{kb_progress['files_total']} files, {kb_progress['chunks_written']} chunks"
+            )
+
+        elif "setup_knowledge_base" in event:
+            self._set(status="setup_knowledge_base", progress=0.1)
+
+        elif "determine_if_question" in event:
+            self._set(status="analyzing_question", progress=0.15)
+
+        elif "generate_introduction" in event:
+            self._set(status="writing_introduction", progress=0.2)
+            if "introduction" in event["generate_introduction"]:
+                self._set(introduction=event["generate_introduction"]["introduction"])
+            if "all_urls" in event["generate_introduction"]:
+                self._add_urls(event["generate_introduction"]["all_urls"])
+
+        elif "build_section_with_research" in event:
+            self._set(status="researching_sections", progress=0.4)
+
+            if "completed_sections" in event["build_section_with_research"]:
+                # 完了したセクションの内容を更新
+                for section in event["build_section_with_research"]["completed_sections"]:
+                    self._section_contents[section.name] = section.content
+                    self.completed_sections.add(section.name)
+                    if section.name not in self.section_names:
+                        self.section_names.append(section.name)
+
+                # 進捗率を更新
+                total_sections = len(self.section_names) or 1
+                self._set(progress=min(0.8, len(self.completed_sections) / total_sections))
+
+            if "all_urls" in event["build_section_with_research"]:
+                self._add_urls(event["build_section_with_research"]["all_urls"])
+
+            # 完了したセクションはすぐに書き込み、ストリームに届ける
+            return "completed_sections" in event["build_section_with_research"]
+
+        elif "gather_completed_sections" in event:
+            self._set(status="collecting_sections", progress=0.8)
+
+        elif "generate_conclusion" in event:
+            self._set(status="generating_conclusion", progress=0.9)
+            if "conclusion" in event["generate_conclusion"]:
+                self._set(conclusion=event["generate_conclusion"]["conclusion"])
+
+        elif "compile_final_report" in event:
+            if "final_report" in event["compile_final_report"]:
+                # 最終レポートを保存
+                self._complete_report(event["compile_final_report"]["final_report"])
+                print(f"research {self.research_id} が完了しました！")
+                return True
+            self._set(status="compiling_report")
+
+        # デバッグ用：不明なイベントタイプがあれば内容を詳細に検査
+        else:
+            print(f"不明なイベントタイプ（{self.research_id}）: {event.keys()}")
+            # イベントの内容をデバッグ出力
+            for key, value in event.items():
+                if isinstance(value, dict):
+                    print(f"  {key} のキー: {value.keys()}")
+                    if "final_report" in value:
+                        self._complete_report(value["final_report"])
+                        print(f"予期しないイベント形式で最終レポートを発見 -  {self.research_id} が完了")
+                        return True
+
+        return False
@@ -50,9 +50,13 @@ class UserManager:
             print(f"ユーザー情報取得中にエラーが発生しました: {e}")
             return None
 
-    async def get_user_researches(self, username: str) -> list:
-        """ユーザーのリサーチ一覧を取得"""
-        return await self.research_manager.list_researches(user_id=username)
+    async def get_user_researches(
+        self, username: str, limit: int = 50, before: str | None = None, before_id: str | None = None
+    ) -> list:
+        """ユーザーのリサーチ一覧を取得（作成日時の新しい順）"""
+        return await self.research_manager.list_researches(
+            user_id=username, limit=limit, before=before, before_id=before_id
+        )
 
     async def get_user_documents(self, username: str) -> list:
         """ユーザーのドキュメント一覧を取得"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Text, create_engine
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String, Text, create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
@@ -7,6 +7,17 @@ from app.config import DATA_DIR
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATA_DIR}/application.db"
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    # API とワーカープロセスから同時に書き込むため、WAL とロック待ちを有効にする
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -35,6 +46,14 @@ class Research(Base):
     # リレーションシップ
     sections = relationship("Section", back_populates="research", cascade="all, delete-orphan")
     urls = relationship("URL", back_populates="research", cascade="all, delete-orphan")
+    jobs = relationship("ResearchJob", back_populates="research", cascade="all, delete-orphan")
+    events = relationship("ResearchEvent", back_populates="research", cascade="all, delete-orphan")
+
+    # 一覧の keyset ページング（作成日時の新しい順）に使う
+    __table_args__ = (
+        Index("ix_research_created_at", "created_at", "id"),
+        Index("ix_research_user_created_at", "user_id", "created_at", "id"),
+    )
 
 
 class Section(Base):
@@ -52,6 +71,8 @@ class Section(Base):
 
     research = relationship("Research", back_populates="sections")
 
+    __table_args__ = (Index("ix_sections_research_id", "research_id", "is_completed"),)
+
 
 class URL(Base):
     """URLのテーブル"""
@@ -64,6 +85,47 @@ class URL(Base):
 
     research = relationship("Research", back_populates="urls")
 
+    __table_args__ = (Index("ux_urls_research_url", "research_id", "url", unique=True),)
+
+
+class ResearchJob(Base):
+    """ワーカープロセスが実行するリサーチのジョブのテーブル"""
+
+    __tablename__ = "research_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    research_id = Column(String, ForeignKey("research.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False)  # start / resume
+    payload = Column(Text)  # JSON形式で保存
+    priority = Column(Integer, nullable=False, default=0)  # 小さいほど先に実行する
+    status = Column(String, nullable=False, default="queued")  # queued / running / completed / failed / cancelled
+    lease_owner = Column(String)  # 実行中のワーカーのID
+    lease_expires_at = Column(Float)  # リースの期限（UNIX時間）。過ぎたジョブは他のワーカーが引き継ぐ
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(String, nullable=False)
+    updated_at = Column(String, nullable=False)
+
+    research = relationship("Research", back_populates="jobs")
+
+    __table_args__ = (Index("ix_research_jobs_claim", "status", "priority", "id"),)
+
+
+class ResearchEvent(Base):
+    """リサーチの進捗イベントのテーブル（/events のストリームで配信し、id で途中から再開する）"""
+
+    __tablename__ = "research_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    research_id = Column(String, ForeignKey("research.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String, nullable=False)  # status / plan / section
+    data = Column(Text)  # JSON形式で保存
+    created_at = Column(String, nullable=False)
+
+    research = relationship("Research", back_populates="events")
+
+    __table_args__ = (Index("ix_research_events_research_id", "research_id", "id"),)
+
 
 class User(Base):
     """ユーザー情報のテーブル"""
@@ -79,6 +141,27 @@ class User(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _create_missing_indexes()
+    _migrate_urls_unique_index()
+
+
+def _create_missing_indexes():
+    """既存のテーブルに後から追加したインデックスを作成する（create_all はテーブルがある場合は作成しない）"""
+    for table in (Research.__table__, Section.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _migrate_urls_unique_index():
+    """一意インデックスのない既存の urls テーブルから重複を除き、インデックスを作成する"""
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_urls_research_url'")
+        ).first()
+        if exists:
+            return
+        conn.execute(text("DELETE FROM urls WHERE id NOT IN (SELECT MIN(id) FROM urls GROUP BY research_id, url)"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_urls_research_url ON urls (research_id, url)"))
 
 
 # データベースセッションを取得する関数
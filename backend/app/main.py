@@ -1,12 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.endpoints import diagnostics, documents, feedback, research, users
+from app.core.research_manager import get_research_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # inprocess モードでは、このプロセス内のワーカーがジョブテーブルのジョブを実行する
+    get_research_manager().start()
+    yield
+    # 実行中のリサーチを実行待ちに戻してワーカーを停止する
+    await get_research_manager().shutdown()
+
 
 app = FastAPI(
     title="Open Deep Researcher API",
     description="リサーチの実行とドキュメント管理のためのAPI",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORSミドルウェアの設定
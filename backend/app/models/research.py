@@ -27,6 +27,8 @@ class SearchProviderEnum(str, Enum):
     TAVILY = "tavily"
     ARXIV = "arxiv"
     LOCAL = "local"
+    HYBRID = "hybrid"
+    TFIDF = "tfidf"
 
 
 class ResearchConfig(BaseModel):
@@ -98,6 +100,17 @@ class ResearchConfig(BaseModel):
         "top_k": 5,
         # NOTE: db_path, enable_files, local_document_path は research_manager.py で設定
     }
+    hybrid_search_config: dict[str, Any] = {
+        "embedding_provider": "hashing",
+        "embedding_model": "hashing-512",
+        "rrf_k": 60,
+        # NOTE: vector_store_path は research_manager.py で設定
+    }
+    tfidf_search_config: dict[str, Any] = {
+        "lsa_components": 0,
+        "use_lsa": True,
+        "rrf_k": 60,
+    }
     # 言語設定
     language: str = "japanese"
 
@@ -106,6 +119,7 @@ class ResearchRequest(BaseModel):
     topic: str
     config: ResearchConfig | None = None
     user_id: str | None = None
+    priority: int = 0  # 小さいほど先に実行する
 
 
 class ResearchResponse(BaseModel):
@@ -145,3 +159,7 @@ class ResearchStatus(BaseModel):
     error: str | None = None
     completed_at: str | None = None
     user_id: str | None = None
+    queue_position: int | None = None  # キュー待ちの場合の順番（次に実行されるものが 1）
+    created_at: str | None = None
+    total_section_count: int | None = None  # 一覧でのみ設定（sections は返さない）
+    completed_section_count: int | None = None
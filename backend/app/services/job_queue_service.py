@@ -0,0 +1,274 @@
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+from app.db.models import ResearchJob, get_db_context
+
+# 実行待ち・実行中のジョブの状態
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+# 実行待ちのジョブ、またはリースの期限が切れた実行中のジョブのうち、先頭の1件を取得してリースする
+_CLAIM_SQL = text(
+    """
+    UPDATE research_jobs
+    SET status = 'running',
+        lease_owner = :worker_id,
+        lease_expires_at = :lease_expires_at,
+        attempts = attempts + 1,
+        updated_at = :now_iso
+    WHERE id = (
+        SELECT id FROM research_jobs
+        WHERE (status = 'queued' OR (status = 'running' AND lease_expires_at < :now))
+          AND attempts < :max_attempts
+        ORDER BY priority, id
+        LIMIT 1
+    )
+    RETURNING id, research_id, kind, payload, priority, attempts
+    """
+)
+
+# リースの期限が切れ、試行回数の上限に達したジョブを失敗にする
+_FAIL_EXPIRED_SQL = text(
+    """
+    UPDATE research_jobs
+    SET status = 'failed', error = 'lease expired', lease_owner = NULL, updated_at = :now_iso
+    WHERE status = 'running' AND lease_expires_at < :now AND attempts >= :max_attempts
+    RETURNING research_id
+    """
+)
+
+# 研究ごとの最初の実行待ちのジョブの順番（次に実行されるジョブが 1）を求める（position と同じ定義）
+_POSITIONS_SQL = text(
+    """
+    SELECT research_id, position
+    FROM (
+        SELECT research_id,
+               ROW_NUMBER() OVER (ORDER BY priority, id) AS position,
+               ROW_NUMBER() OVER (PARTITION BY research_id ORDER BY id) AS nth
+        FROM research_jobs
+        WHERE status = 'queued'
+    )
+    WHERE nth = 1 AND research_id IN :research_ids
+    """
+).bindparams(bindparam("research_ids", expanding=True))
+
+
+class JobQueueService:
+    """SQLite のテーブルを使ったリサーチのジョブキュー
+
+    API はジョブを追加するだけで、ワーカー（API プロセス内、またはワーカープロセス）が claim でジョブをリースして実行する。
+    ワーカーは実行中に heartbeat でリースを延長し、プロセスが落ちてリースの期限が切れたジョブは
+    他のワーカーが引き継ぐ。claim は1つの UPDATE ... RETURNING で行うため、複数のワーカーが
+    同じジョブを取得することはない。
+    """
+
+    def enqueue(self, research_id: str, kind: str, payload: dict | None = None, priority: int = 0) -> int | None:
+        """ジョブを追加し、ジョブIDを返す"""
+        try:
+            now = datetime.now().isoformat()
+            with get_db_context() as db:
+                job = ResearchJob(
+                    research_id=research_id,
+                    kind=kind,
+                    payload=json.dumps(payload or {}),
+                    priority=priority,
+                    status="queued",
+                    attempts=0,
+                    created_at=now,
+                    updated_at=now,
+                )
+                db.add(job)
+                db.commit()
+                return job.id
+
+        except Exception as e:
+            print(f"ジョブの追加中にエラーが発生しました: {e}")
+            import traceback
+
+            print(traceback.format_exc())
+            return None
+
+    def claim(self, worker_id: str, lease_seconds: float, max_attempts: int) -> dict | None:
+        """次に実行するジョブをリースして返す（なければ None）"""
+        now = time.time()
+        with get_db_context() as db:
+            row = db.execute(
+                _CLAIM_SQL,
+                {
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + lease_seconds,
+                    "now": now,
+                    "now_iso": datetime.now().isoformat(),
+                    "max_attempts": max_attempts,
+                },
+            ).first()
+            db.commit()
+
+        if row is None:
+            return None
+        return {
+            "id": row.id,
+            "research_id": row.research_id,
+            "kind": row.kind,
+            "payload": json.loads(row.payload) if row.payload else {},
+            "priority": row.priority,
+            "attempts": row.attempts,
+        }
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """リースを延長する（ジョブが取り消された・他のワーカーに移った場合は False）"""
+        with get_db_context() as db:
+            updated = (
+                db.query(ResearchJob)
+                .filter(
+                    ResearchJob.id == job_id,
+                    ResearchJob.status == "running",
+                    ResearchJob.lease_owner == worker_id,
+                )
+                .update({ResearchJob.lease_expires_at: time.time() + lease_seconds}, synchronize_session=False)
+            )
+            db.commit()
+        return updated == 1
+
+    def is_leased_by(self, job_id: int, worker_id: str) -> bool:
+        """ジョブが実行中で、worker_id がリースしているか"""
+        with get_db_context() as db:
+            return (
+                db.query(ResearchJob.id)
+                .filter(
+                    ResearchJob.id == job_id,
+                    ResearchJob.status == "running",
+                    ResearchJob.lease_owner == worker_id,
+                )
+                .first()
+                is not None
+            )
+
+    def finish(self, job_id: int, worker_id: str, status: str = "completed", error: str | None = None) -> bool:
+        """リース中のジョブを終了状態にする"""
+        with get_db_context() as db:
+            updated = (
+                db.query(ResearchJob)
+                .filter(
+                    ResearchJob.id == job_id,
+                    ResearchJob.status == "running",
+                    ResearchJob.lease_owner == worker_id,
+                )
+                .update(
+                    {
+                        ResearchJob.status: status,
+                        ResearchJob.error: error,
+                        ResearchJob.lease_owner: None,
+                        ResearchJob.lease_expires_at: None,
+                        ResearchJob.updated_at: datetime.now().isoformat(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        return updated == 1
+
+    def release(self, job_id: int, worker_id: str) -> bool:
+        """ワーカーの停止時に、リース中のジョブを実行待ちに戻す"""
+        with get_db_context() as db:
+            updated = (
+                db.query(ResearchJob)
+                .filter(
+                    ResearchJob.id == job_id,
+                    ResearchJob.status == "running",
+                    ResearchJob.lease_owner == worker_id,
+                )
+                .update(
+                    {
+                        ResearchJob.status: "queued",
+                        ResearchJob.lease_owner: None,
+                        ResearchJob.lease_expires_at: None,
+                        # 停止による中断は試行回数に数えない
+                        ResearchJob.attempts: ResearchJob.attempts - 1,
+                        ResearchJob.updated_at: datetime.now().isoformat(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        return updated == 1
+
+    def fail_expired(self, max_attempts: int) -> list[str]:
+        """試行回数の上限に達してリースが切れたジョブを失敗にし、そのリサーチIDを返す"""
+        with get_db_context() as db:
+            rows = db.execute(
+                _FAIL_EXPIRED_SQL,
+                {"now": time.time(), "now_iso": datetime.now().isoformat(), "max_attempts": max_attempts},
+            ).all()
+            db.commit()
+        return [row.research_id for row in rows]
+
+    def cancel(self, research_id: str) -> str | None:
+        """リサーチの実行待ち・実行中のジョブを取り消し、取り消す前の状態を返す（なければ None）
+
+        実行中のジョブは、ワーカーが次のハートビートで取り消しを検知して停止する。
+        """
+        with get_db_context() as db:
+            job = (
+                db.query(ResearchJob)
+                .filter(ResearchJob.research_id == research_id, ResearchJob.status.in_(ACTIVE_JOB_STATUSES))
+                .order_by(ResearchJob.id.desc())
+                .first()
+            )
+            if job is None:
+                return None
+            previous_status = job.status
+            job.status = "cancelled"
+            job.lease_owner = None
+            job.updated_at = datetime.now().isoformat()
+            db.commit()
+            return previous_status
+
+    def get_status(self, job_id: int) -> str | None:
+        """ジョブの状態を返す（ジョブがなければ None）"""
+        with get_db_context() as db:
+            job = db.query(ResearchJob).filter(ResearchJob.id == job_id).first()
+            return job.status if job else None
+
+    def position(self, research_id: str) -> int | None:
+        """実行待ちのジョブの順番（次に実行されるジョブが 1）。実行待ちでない場合は None"""
+        with get_db_context() as db:
+            job = (
+                db.query(ResearchJob)
+                .filter(ResearchJob.research_id == research_id, ResearchJob.status == "queued")
+                .order_by(ResearchJob.id)
+                .first()
+            )
+            if job is None:
+                return None
+            ahead = (
+                db.query(ResearchJob)
+                .filter(
+                    ResearchJob.status == "queued",
+                    (ResearchJob.priority < job.priority)
+                    | ((ResearchJob.priority == job.priority) & (ResearchJob.id < job.id)),
+                )
+                .count()
+            )
+            return ahead + 1
+
+    def positions(self, research_ids: list[str]) -> dict[str, int]:
+        """複数の研究の実行待ちの順番を1回のクエリで取得する（実行待ちでない研究は含まない）"""
+        if not research_ids:
+            return {}
+        with get_db_context() as db:
+            rows = db.execute(_POSITIONS_SQL, {"research_ids": list(research_ids)}).all()
+        return {row.research_id: row.position for row in rows}
+
+
+_job_queue_service = None
+
+
+def get_job_queue_service() -> JobQueueService:
+    """JobQueueServiceのシングルトンインスタンスを取得"""
+    global _job_queue_service
+    if _job_queue_service is None:
+        _job_queue_service = JobQueueService()
+    return _job_queue_service
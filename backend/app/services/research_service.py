@@ -1,9 +1,14 @@
 import json
 from datetime import datetime
 
+from sqlalchemy import case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.db.models import URL, Research, Section, get_db_context
+from app.db.models import URL, Research, ResearchEvent, Section, get_db_context
+
+# 変更されたときに status イベントとして配信する research テーブルの列
+STATUS_EVENT_FIELDS = ("status", "progress", "error", "waiting_for_feedback", "completed_at")
 
 
 class ResearchService:
@@ -87,7 +92,7 @@ class ResearchService:
 
                 # URL情報を保存
                 if research_data.get("all_urls"):
-                    for url_str in research_data["all_urls"]:
+                    for url_str in dict.fromkeys(research_data["all_urls"]):
                         new_url = URL(research_id=research_data["id"], url=url_str)
                         db.add(new_url)
 
@@ -107,6 +112,154 @@ class ResearchService:
             print(traceback.format_exc())
             return False
 
+    def transition_status(self, research_id: str, from_status: str, to_status: str, **fields) -> bool:
+        """ステータスが from_status の場合だけ to_status に更新する（複数のプロセスから同時に呼ばれても1回だけ成功する）"""
+        try:
+            with get_db_context() as db:
+                values = {Research.status: to_status, Research.updated_at: datetime.now().isoformat()}
+                for key, value in fields.items():
+                    values[getattr(Research, key)] = value
+                updated = (
+                    db.query(Research)
+                    .filter(Research.id == research_id, Research.status == from_status)
+                    .update(values, synchronize_session=False)
+                )
+                if updated == 1:
+                    self._add_status_event(db, research_id, {"status": to_status, **fields})
+                db.commit()
+                return updated == 1
+
+        except Exception as e:
+            print(f"リサーチのステータス更新中にエラーが発生しました: {e}")
+            import traceback
+
+            print(traceback.format_exc())
+            return False
+
+    def update_research(self, research_id: str, **fields) -> bool:
+        """リサーチの指定した列だけを更新する（status, progress など。リサーチがなければ False）"""
+        try:
+            with get_db_context() as db:
+                updated = self._update_research(db, research_id, fields)
+                db.commit()
+                return updated
+
+        except Exception as e:
+            print(f"リサーチの更新中にエラーが発生しました: {e}")
+            import traceback
+
+            print(traceback.format_exc())
+            return False
+
+    def apply_changes(
+        self,
+        research_id: str,
+        fields: dict,
+        sections: list[dict] | None = None,
+        section_contents: dict[str, str] | None = None,
+        urls: list[str] | None = None,
+    ) -> bool | None:
+        """まとめた変更を1つのトランザクションで書き込む
+
+        Args:
+            research_id: リサーチID
+            fields: 更新する research テーブルの列
+            sections: 置き換えるセクション（レポートの計画）。None の場合は変更しない
+            section_contents: 完了したセクションの名前 -> 内容（名前が一致するセクションを更新し、なければ追加する）
+            urls: 追加する URL（保存済みの URL は一意インデックスで無視する）
+
+        ステータス・計画・完了したセクションの変更は、同じトランザクションでイベントとして記録する。
+
+        Returns:
+            書き込めた場合は True、リサーチがない場合は False、エラーの場合は None
+        """
+        try:
+            with get_db_context() as db:
+                if not self._update_research(db, research_id, fields):
+                    db.rollback()
+                    return False
+                if sections is not None:
+                    self._replace_sections(db, research_id, sections)
+                    self._add_event(
+                        db,
+                        research_id,
+                        "plan",
+                        {
+                            "sections": [
+                                {
+                                    "name": s["name"],
+                                    "description": s.get("description", ""),
+                                    "search_options": s.get("search_options") or [],
+                                }
+                                for s in sections
+                            ]
+                        },
+                    )
+                for name, content in (section_contents or {}).items():
+                    self._upsert_section(db, research_id, name, content)
+                    self._add_event(db, research_id, "section", {"name": name, "content": content})
+                if urls:
+                    self._add_urls(db, research_id, urls)
+                db.commit()
+                return True
+
+        except Exception as e:
+            print(f"リサーチの変更の保存中にエラーが発生しました: {e}")
+            import traceback
+
+            print(traceback.format_exc())
+            return None
+
+    def _update_research(self, db, research_id: str, fields: dict) -> bool:
+        values = {getattr(Research, key): value for key, value in fields.items()}
+        values[Research.updated_at] = datetime.now().isoformat()
+        updated = db.query(Research).filter(Research.id == research_id).update(values, synchronize_session=False)
+        if updated == 1:
+            self._add_status_event(db, research_id, fields)
+        return updated == 1
+
+    def _add_status_event(self, db, research_id: str, fields: dict):
+        data = {key: fields[key] for key in STATUS_EVENT_FIELDS if key in fields}
+        if data:
+            self._add_event(db, research_id, "status", data)
+
+    def _add_event(self, db, research_id: str, event_type: str, data: dict):
+        db.add(
+            ResearchEvent(
+                research_id=research_id,
+                type=event_type,
+                data=json.dumps(data, ensure_ascii=False),
+                created_at=datetime.now().isoformat(),
+            )
+        )
+
+    def _replace_sections(self, db, research_id: str, sections: list[dict]):
+        db.query(Section).filter(Section.research_id == research_id).delete()
+        for section_data in sections:
+            db.add(
+                Section(
+                    research_id=research_id,
+                    name=section_data["name"],
+                    description=section_data.get("description", ""),
+                    content=section_data.get("content", ""),
+                    search_options=json.dumps(section_data.get("search_options") or []),
+                    is_completed=False,
+                )
+            )
+        db.flush()
+
+    def _upsert_section(self, db, research_id: str, name: str, content: str):
+        section = db.query(Section).filter(Section.research_id == research_id, Section.name == name).first()
+        if section is None:
+            section = Section(research_id=research_id, name=name, description="", search_options="[]")
+            db.add(section)
+        section.content = content
+        section.is_completed = True
+
+    def _add_urls(self, db, research_id: str, urls: list[str]):
+        rows = [{"research_id": research_id, "url": url} for url in dict.fromkeys(urls)]
+        db.execute(sqlite_insert(URL).values(rows).on_conflict_do_nothing(index_elements=["research_id", "url"]))
+
     def get_research(self, research_id: str) -> dict | None:
         """IDを指定してリサーチ情報を取得"""
         try:
@@ -175,50 +328,99 @@ class ResearchService:
             print(traceback.format_exc())
             return None
 
-    def list_researches(self, user_id: str | None = None) -> list[dict]:
-        """すべてのリサーチの基本情報を取得"""
+    def list_events(self, research_id: str, after_id: int = 0, limit: int = 100) -> list[dict]:
+        """after_id より後のイベントを古い順に取得"""
         try:
             with get_db_context() as db:
-                # リサーチ情報を取得
-                if user_id:
-                    researches_query = (
-                        db.query(Research).filter(Research.user_id == user_id).order_by(Research.created_at.desc())
-                    )
-                else:
-                    researches_query = db.query(Research).order_by(Research.created_at.desc())
-
-                researches = []
-
-                for research in researches_query:
-                    # 基本情報を辞書に変換
-                    research_data = {
-                        "id": research.id,
-                        "topic": research.topic,
-                        "status": research.status,
-                        "created_at": research.created_at,
-                        "updated_at": research.updated_at,
-                        "completed_at": research.completed_at,
-                        "progress": research.progress,
-                        "error": research.error,
-                        "waiting_for_feedback": research.waiting_for_feedback,
-                        "user_id": research.user_id,
-                    }
-
-                    # 完了済みセクション数と全セクション数を取得
-                    completed_count = (
-                        db.query(Section)
-                        .filter(Section.research_id == research.id, Section.is_completed.is_(True))
-                        .count()
-                    )
+                events = (
+                    db.query(ResearchEvent)
+                    .filter(ResearchEvent.research_id == research_id, ResearchEvent.id > after_id)
+                    .order_by(ResearchEvent.id)
+                    .limit(limit)
+                    .all()
+                )
+                return [
+                    {"id": event.id, "type": event.type, "data": json.loads(event.data) if event.data else {}}
+                    for event in events
+                ]
 
-                    total_count = db.query(Section).filter(Section.research_id == research.id).count()
+        except Exception as e:
+            print(f"リサーチのイベントの取得中にエラーが発生しました: {e}")
+            import traceback
 
-                    research_data["completed_section_count"] = completed_count
-                    research_data["total_section_count"] = total_count
+            print(traceback.format_exc())
+            return []
 
-                    researches.append(research_data)
+    def get_status(self, research_id: str) -> str | None:
+        """リサーチのステータスだけを取得（リサーチがなければ None）"""
+        with get_db_context() as db:
+            return db.query(Research.status).filter(Research.id == research_id).scalar()
+
+    def get_last_event_id(self, research_id: str) -> int:
+        """リサーチの最新のイベントID（イベントがなければ 0）"""
+        with get_db_context() as db:
+            return db.query(func.max(ResearchEvent.id)).filter(ResearchEvent.research_id == research_id).scalar() or 0
+
+    def list_researches(
+        self,
+        user_id: str | None = None,
+        limit: int = 50,
+        before: str | None = None,
+        before_id: str | None = None,
+    ) -> list[dict]:
+        """リサーチの基本情報を作成日時の新しい順に取得（keyset ページング）
+
+        Args:
+            user_id: 指定した場合はそのユーザーのリサーチだけを取得
+            limit: 取得する件数
+            before: 前のページの最後のリサーチの created_at（指定した場合はそれより古いリサーチを取得）
+            before_id: 前のページの最後のリサーチのID（created_at が同じリサーチの順序を決める）
+
+        設定やレポートなどの大きなテキスト列は読まず（一覧に表示するエラーメッセージは読む）、
+        セクション数は1回の集計クエリで取得する。
+        """
+        try:
+            with get_db_context() as db:
+                # 1ページ分のリサーチを (created_at, id) のインデックスで取得する
+                page_query = db.query(
+                    Research.id,
+                    Research.topic,
+                    Research.status,
+                    Research.created_at,
+                    Research.updated_at,
+                    Research.completed_at,
+                    Research.progress,
+                    Research.waiting_for_feedback,
+                    Research.user_id,
+                    Research.error,
+                )
+                if user_id:
+                    page_query = page_query.filter(Research.user_id == user_id)
+                if before is not None:
+                    if before_id is not None:
+                        page_query = page_query.filter(
+                            (Research.created_at < before)
+                            | ((Research.created_at == before) & (Research.id < before_id))
+                        )
+                    else:
+                        page_query = page_query.filter(Research.created_at < before)
+                page = page_query.order_by(Research.created_at.desc(), Research.id.desc()).limit(limit).subquery("page")
+
+                # 完了済みセクション数と全セクション数をまとめて集計する
+                completed_count = func.coalesce(func.sum(case((Section.is_completed.is_(True), 1), else_=0)), 0)
+                rows = (
+                    db.query(
+                        page,
+                        func.count(Section.id).label("total_section_count"),
+                        completed_count.label("completed_section_count"),
+                    )
+                    .outerjoin(Section, Section.research_id == page.c.id)
+                    .group_by(*page.c)
+                    .order_by(page.c.created_at.desc(), page.c.id.desc())
+                    .all()
+                )
 
-                return researches
+                return [dict(row._mapping) for row in rows]
 
         except Exception as e:
             print(f"リサーチリストの取得中にエラーが発生しました: {e}")
@@ -0,0 +1,254 @@
+"""リサーチのワーカープロセス
+
+RESEARCH_EXECUTION_MODE=worker の API サーバーがジョブテーブルに追加したジョブをリースして実行する。
+（RESEARCH_EXECUTION_MODE=inprocess の場合は、同じ ResearchWorker が API の各プロセス内で動く）
+1プロセスで --concurrency 個のジョブを同時に実行し、--processes で複数のプロセスを起動できる。
+別のマシンやコンテナで起動する場合も、同じ application.db と checkpoints.db を参照させる。
+
+    python -m app.worker --processes 2 --concurrency 3
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.config import (
+    JOB_CANCEL_POLL_SECONDS,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    MAX_CONCURRENT_RESEARCHES,
+)
+from app.core.research_events import notify_research_events
+from app.core.research_manager import CHECKPOINTS_DATABASE_URL, create_research_session, mark_research_status
+from app.db.models import init_db
+from app.services.job_queue_service import get_job_queue_service
+from app.services.research_service import get_research_service
+from open_deep_researcher.graph import builder
+
+
+class ResearchWorker:
+    """ジョブテーブルからジョブをリースして実行するワーカー
+
+    実行中はハートビートでリースを延長し、cancel_poll_seconds ごとにジョブが取り消されていないかを確認する。
+    停止すると新しいジョブの取得をやめ、実行中のジョブを実行待ちに戻して終了する。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = MAX_CONCURRENT_RESEARCHES,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS,
+        cancel_poll_seconds: float = JOB_CANCEL_POLL_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        poll_interval: float = 1.0,
+    ):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.cancel_poll_seconds = min(cancel_poll_seconds, heartbeat_seconds)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.job_queue = get_job_queue_service()
+        self.research_service = get_research_service()
+        self._stopping: asyncio.Event | None = None
+        self._wakeup: asyncio.Event | None = None  # 新しいジョブの追加の通知（同じプロセスの API から）
+        self._running: dict[str, asyncio.Task] = {}  # research id -> 実行中のセッションのタスク
+
+    def stop(self):
+        """新しいジョブの取得をやめ、実行中のジョブを実行待ちに戻して終了する"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def notify(self):
+        """ジョブが追加されたことを通知し、待機中のスロットにすぐ取得させる"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel_local(self, research_id: str) -> bool:
+        """このプロセスで実行中の研究のセッションを止める（ジョブの取り消しはジョブテーブルで行っておく）"""
+        task = self._running.get(research_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def run(self, handle_signals: bool = True):
+        """ジョブの取得と実行を停止するまで続ける（handle_signals が True の場合は SIGTERM / SIGINT で停止する）"""
+        init_db()
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        if handle_signals:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, self.stop)
+
+        # プロセス内のジョブでチェックポイントの接続とコンパイル済みのグラフを共有する
+        conn = await aiosqlite.connect(str(CHECKPOINTS_DATABASE_URL))
+        graph = builder.compile(checkpointer=AsyncSqliteSaver(conn))
+        print(f"worker {self.worker_id} started (concurrency={self.concurrency})")
+        try:
+            await asyncio.gather(self._sweep_expired(), *(self._slot(graph) for _ in range(self.concurrency)))
+        finally:
+            await conn.close()
+            print(f"worker {self.worker_id} stopped")
+
+    async def _sleep(self, seconds: float):
+        """seconds 秒待つ（停止を指示された場合はすぐに戻る）"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except TimeoutError:
+            pass
+
+    async def _wait_for_job(self):
+        """ジョブの追加が通知されるか poll_interval 秒が経つまで待つ"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _slot(self, graph):
+        """ジョブを1つずつ取得して実行する"""
+        while not self._stopping.is_set():
+            job = await asyncio.to_thread(self.job_queue.claim, self.worker_id, self.lease_seconds, self.max_attempts)
+            if job is None:
+                await self._wait_for_job()
+                continue
+            try:
+                await self._run_job(graph, job)
+            except Exception as e:
+                import traceback
+
+                print(f"ジョブ {job['id']} の実行中にエラーが発生: {traceback.format_exc()}")
+                await asyncio.to_thread(self.job_queue.finish, job["id"], self.worker_id, "failed", str(e))
+
+    async def _run_job(self, graph, job: dict):
+        research_id = job["research_id"]
+        research_data = await asyncio.to_thread(self.research_service.get_research, research_id)
+        if not research_data:
+            await asyncio.to_thread(self.job_queue.finish, job["id"], self.worker_id, "cancelled", "research not found")
+            return
+
+        print(f"worker {self.worker_id}: {job['kind']} {research_id} (attempt {job['attempts']})")
+        session = create_research_session(research_data, job["kind"], job["payload"])
+        task = asyncio.create_task(session.run(graph))
+        self._running[research_id] = task
+        heartbeat = asyncio.create_task(self._heartbeat(job, session, task))
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            await asyncio.wait({task, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                # ワーカーの停止。研究は cancelled にせず、ジョブを実行待ちに戻して他のワーカーに引き継ぐ
+                session.requeue_on_cancel = True
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await asyncio.to_thread(self.job_queue.release, job["id"], self.worker_id)
+                return
+            if task.cancelled():
+                return  # ハートビートでジョブの取り消し（またはリースの喪失）を検知した
+
+            research_data = await asyncio.to_thread(self.research_service.get_research, research_id)
+            if research_data and research_data["status"] == "error":
+                await asyncio.to_thread(
+                    self.job_queue.finish, job["id"], self.worker_id, "failed", research_data.get("error")
+                )
+            else:
+                await asyncio.to_thread(self.job_queue.finish, job["id"], self.worker_id)
+        finally:
+            heartbeat.cancel()
+            stopping.cancel()
+            if self._running.get(research_id) is task:
+                del self._running[research_id]
+
+    async def _heartbeat(self, job: dict, session, task: asyncio.Task):
+        """リースを延長し続け、ジョブが取り消された場合は実行を止める"""
+        last_heartbeat = time.monotonic()
+        while True:
+            await asyncio.sleep(self.cancel_poll_seconds)
+            if time.monotonic() - last_heartbeat >= self.heartbeat_seconds:
+                alive = await asyncio.to_thread(self.job_queue.heartbeat, job["id"], self.worker_id, self.lease_seconds)
+                last_heartbeat = time.monotonic()
+            else:
+                # 書き込みをせずに、取り消されていないかだけを確認する
+                alive = await asyncio.to_thread(self.job_queue.is_leased_by, job["id"], self.worker_id)
+            if alive:
+                continue
+
+            status = await asyncio.to_thread(self.job_queue.get_status, job["id"])
+            if status == "running":
+                # リースが切れて他のワーカーが引き継いだ。研究のステータスはそちらに任せる
+                print(f"ジョブ {job['id']} のリースを失いました")
+                session.requeue_on_cancel = True
+            else:
+                print(f"ジョブ {job['id']} が取り消されました")
+            task.cancel()
+            return
+
+    async def _sweep_expired(self):
+        """試行回数の上限に達してリースが切れたジョブを失敗にし、研究をエラーにする"""
+        while not self._stopping.is_set():
+            research_ids = await asyncio.to_thread(self.job_queue.fail_expired, self.max_attempts)
+            for research_id in research_ids:
+                print(f"{research_id} のジョブが {self.max_attempts} 回中断したため失敗にしました")
+                await asyncio.to_thread(
+                    mark_research_status,
+                    self.research_service,
+                    research_id,
+                    "error",
+                    "ワーカーが応答しなくなったため、リサーチを中断しました",
+                )
+                notify_research_events(research_id)
+            await self._sleep(self.lease_seconds)
+
+
+def _run_worker(concurrency: int, poll_interval: float):
+    asyncio.run(ResearchWorker(concurrency=concurrency, poll_interval=poll_interval).run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open Deep Researcher のリサーチワーカー")
+    parser.add_argument("--processes", type=int, default=1, help="起動するワーカープロセスの数")
+    parser.add_argument(
+        "--concurrency", type=int, default=MAX_CONCURRENT_RESEARCHES, help="1プロセスで同時に実行するジョブの数"
+    )
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="ジョブがないときの確認間隔（秒）")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_worker(args.concurrency, args.poll_interval)
+        return
+
+    # 子プロセスが同時にテーブルを作成しないよう、先に作成しておく
+    init_db()
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_run_worker, args=(args.concurrency, args.poll_interval), name=f"research-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def _terminate(signum, frame):
+        # 子プロセスに SIGTERM を送り、それぞれ実行中のジョブを実行待ちに戻して終了させる
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, _terminate)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from app.core.research_manager import ResearchManager
+from app.db import models
+from app.services.research_service import get_research_service
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # backend/data のデータベースを使わないよう、一時ファイルのデータベースに差し替える
+    engine = create_engine(f"sqlite:///{tmp_path / 'application.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(models, "engine", engine)
+    original_bind = models.SessionLocal.kw["bind"]
+    models.SessionLocal.configure(bind=engine)
+    try:
+        yield ResearchManager(execution_mode="worker")
+    finally:
+        models.SessionLocal.configure(bind=original_bind)
+        engine.dispose()
+
+
+def _save(research_id: str, created_at: str, **fields):
+    get_research_service().save_research(
+        {"id": research_id, "topic": f"topic {research_id}", "created_at": created_at, **fields}
+    )
+
+
+def test_list_includes_error_of_failed_research(manager):
+    _save(
+        "done",
+        "2026-01-01T00:00:00",
+        status="completed",
+        sections=[{"name": "a"}, {"name": "b"}],
+        completed_sections=["a"],
+    )
+    _save("failed", "2026-01-02T00:00:00", status="failed", error="検索に失敗しました")
+
+    researches = asyncio.run(manager.list_researches(limit=10))
+
+    assert [research.research_id for research in researches] == ["failed", "done"]
+    failed, done = researches
+    assert failed.status == "failed"
+    assert failed.error == "検索に失敗しました"
+    assert done.error is None
+    assert (done.total_section_count, done.completed_section_count) == (2, 1)
@@ -0,0 +1,82 @@
+"""チャンカーの性能を比較するベンチマーク
+
+同じ区切り文字・chunk_size・chunk_overlap で RecursiveCharacterTextSplitter と OffsetChunker を実行し、
+所要時間とチャンクが一致することを確認する。テキストは英語（空白区切り）、日本語（句読点・改行あり）、
+日本語（区切りなし）の3種類を合成する。
+
+    python benchmarks/bench_chunker.py --chars 2000000 --chunk-size 10000 --chunk-overlap 2000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from open_deep_researcher.retriever.local.chunker import CHUNK_SEPARATORS, OffsetChunker
+
+ENGLISH_WORDS = "machine learning deep neural network retrieval index search query document chunk token".split()
+JAPANESE_WORDS = "機械学習 深層学習 検索 文書 索引 言語モデル 最適化 推論 データベース 全文検索 が を に は の".split()
+
+
+def generate_texts(num_chars: int, seed: int = 0) -> dict[str, str]:
+    rng = random.Random(seed)
+
+    def english() -> str:
+        words = []
+        for i in range(num_chars // 7):
+            words.append(rng.choice(ENGLISH_WORDS) + ("." if i % 15 == 14 else ""))
+            if i % 120 == 119:
+                words.append("\n\n")
+        return " ".join(words)
+
+    def japanese() -> str:
+        parts = []
+        length = 0
+        while length < num_chars:
+            sentence = "".join(rng.choice(JAPANESE_WORDS) for _ in range(rng.randint(8, 20)))
+            sentence += rng.choice(["、", "。", "。\n", "，", "．"])
+            parts.append(sentence)
+            length += len(sentence)
+        return "".join(parts)
+
+    def japanese_unpunctuated() -> str:
+        return "".join(rng.choice(JAPANESE_WORDS) for _ in range(num_chars // 3))
+
+    return {"english": english(), "japanese": japanese(), "japanese (no punct.)": japanese_unpunctuated()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--chunk-overlap", type=int, default=2_000)
+    args = parser.parse_args()
+
+    # chunk_size を超えるチャンクの警告を抑える
+    logging.getLogger("langchain_text_splitters.base").setLevel(logging.ERROR)
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, separators=CHUNK_SEPARATORS
+    )
+    chunker = OffsetChunker(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    for name, text in generate_texts(args.chars).items():
+        start = time.perf_counter()
+        expected = splitter.split_text(text)
+        splitter_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        spans = chunker.split_offsets(text)
+        offsets_time = time.perf_counter() - start
+        chunks = [text[begin:end] for begin, end in spans]
+
+        print(
+            f"{name:>20}: splitter {splitter_time * 1000:9.1f} ms  offsets {offsets_time * 1000:8.1f} ms  "
+            f"({splitter_time / offsets_time:6.1f}x, {len(chunks)} chunks, identical: {chunks == expected})"
+        )
+
+
+if __name__ == "__main__":
+    main()
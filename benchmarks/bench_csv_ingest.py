@@ -0,0 +1,82 @@
+"""CSV の読み込み・チャンク化の性能を比較するベンチマーク
+
+合成した CSV を CSVLoader（1行1ドキュメント）と PandasCSVLoader（ヘッダー付きの行ブロック）で読み込み、
+chunk_documents でチャンク化するまでの所要時間、ドキュメント数・チャンク数、ピークメモリ（tracemalloc）を比較する。
+
+    python benchmarks/bench_csv_ingest.py --rows 200000 --chunk-size 10000
+"""
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench_fts_ingest import WORDS
+from langchain_community.document_loaders import CSVLoader
+
+from open_deep_researcher.retriever.local.csv_loader import PandasCSVLoader
+from open_deep_researcher.retriever.local.full_text_search import chunk_documents
+
+
+def generate_csv(path: Path, num_rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "category", "price", "description"])
+        for i in range(num_rows):
+            writer.writerow(
+                [
+                    i,
+                    f"item {i}",
+                    rng.choice(WORDS),
+                    f"{rng.uniform(1, 1000):.2f}",
+                    " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))),
+                ]
+            )
+
+
+def measure(name: str, loader, chunk_size: int, chunk_overlap: int):
+    start = time.perf_counter()
+    documents = loader.load()
+    chunks = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    elapsed = time.perf_counter() - start
+    del documents, chunks
+
+    # tracemalloc は処理を遅くするため、ピークメモリは別に測る
+    tracemalloc.start()
+    documents = loader.load()
+    chunks = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>16}: {elapsed:8.2f}s  peak {peak / 1e6:8.1f} MB  "
+        f"{len(documents):>8} documents  {len(chunks):>8} chunks"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--chunk-overlap", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "bench.csv"
+        generate_csv(path, args.rows)
+        print(f"corpus: {args.rows} rows, {path.stat().st_size / 1e6:.1f} MB")
+
+        measure("CSVLoader", CSVLoader(str(path)), args.chunk_size, args.chunk_overlap)
+        measure(
+            "PandasCSVLoader",
+            PandasCSVLoader(path, block_chars=args.chunk_size),
+            args.chunk_size,
+            args.chunk_overlap,
+        )
+
+
+if __name__ == "__main__":
+    main()
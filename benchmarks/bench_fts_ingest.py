@@ -0,0 +1,88 @@
+"""SQLiteFTSDocumentRetriever の取り込み性能を比較するベンチマーク
+
+合成した 100k チャンクのコーパスを、1行ずつの INSERT（トリガーで FTS を逐次更新）と
+一括取り込みモード（executemany + WAL + トリガー無効化 + rebuild/optimize）で取り込み、所要時間を比較する。
+
+    python benchmarks/bench_fts_ingest.py --chunks 100000 --chunk-chars 500
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever
+
+WORDS = (
+    "machine learning deep neural network retrieval index search query document chunk token "
+    "機械学習 深層学習 検索 文書 索引 言語モデル 最適化 推論 データベース 全文検索"
+).split()
+
+
+def generate_corpus(num_chunks: int, chunk_chars: int, seed: int = 0) -> list[dict[str, str]]:
+    rng = random.Random(seed)
+    documents = []
+    for i in range(num_chunks):
+        words = []
+        length = 0
+        while length < chunk_chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        file_path = f"file_{i // 100}.txt"
+        documents.append(
+            {
+                "file_path": file_path,
+                "title": f"{file_path} (chunk {i % 100 + 1}/100)",
+                "content": " ".join(words),
+                "chunk_id": f"{file_path}_{i % 100}",
+            }
+        )
+    return documents
+
+
+def ingest_row_by_row(db_path: Path, documents: list[dict[str, str]]) -> None:
+    retriever = SQLiteFTSDocumentRetriever(str(db_path))
+    retriever.create_document_table()
+    cursor = retriever.conn.cursor()
+    for doc in documents:
+        cursor.execute(
+            "INSERT INTO documents (file_path, title, content, chunk_id) VALUES (?, ?, ?, ?)",
+            (doc["file_path"], doc["title"], doc["content"], doc["chunk_id"]),
+        )
+    retriever.conn.commit()
+    retriever.close()
+
+
+def ingest_bulk(db_path: Path, documents: list[dict[str, str]]) -> None:
+    retriever = SQLiteFTSDocumentRetriever(str(db_path))
+    retriever.create_document_table()
+    retriever.bulk_insert_documents(documents)
+    retriever.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--chunk-chars", type=int, default=500)
+    args = parser.parse_args()
+
+    documents = generate_corpus(args.chunks, args.chunk_chars)
+    print(f"corpus: {len(documents)} chunks x ~{args.chunk_chars} chars")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, ingest in [("row-by-row", ingest_row_by_row), ("bulk", ingest_bulk)]:
+            db_path = Path(tmp_dir) / f"{name}.sqlite"
+            start = time.perf_counter()
+            ingest(db_path, documents)
+            elapsed = time.perf_counter() - start
+
+            retriever = SQLiteFTSDocumentRetriever(str(db_path))
+            hits = len(retriever.search("全文検索", limit=10))
+            retriever.close()
+            print(f"{name:>12}: {elapsed:8.2f}s  ({len(documents) / elapsed:,.0f} chunks/s, hits={hits})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""多数のセクションが同じナレッジベースを同時に検索する場合のベンチマーク
+
+クエリごとに新しいコネクションを開いてイベントループ上で検索する従来の方式と、
+読み取り専用コネクションプール + 専用スレッドプールで全クエリを並行実行する local_search を比較する。
+
+    python benchmarks/bench_fts_search.py --chunks 100000 --sections 20 --queries 4
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench_fts_ingest import WORDS, generate_corpus
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever, local_search
+from open_deep_researcher.utils import deduplicate_and_format_sources
+
+
+async def sequential_search(query_list: list[str], db_path: str, top_k: int) -> str:
+    """クエリごとにコネクションを開き、イベントループ上で順番に検索する（従来の方式）"""
+    search_docs = []
+    for query in query_list:
+        retriever = SQLiteFTSDocumentRetriever(db_path)
+        results = retriever.search(query, limit=top_k)
+        retriever.close()
+        search_docs.append(
+            {
+                "query": query,
+                "images": [],
+                "results": [
+                    {"title": doc["title"], "url": doc["file_path"], "content": doc["content"]} for doc in results
+                ],
+            }
+        )
+    return deduplicate_and_format_sources(search_docs, max_tokens_per_source=1024)
+
+
+async def pooled_search(query_list: list[str], db_path: str, top_k: int) -> str:
+    return await local_search(query_list, db_path=db_path, top_k=top_k, max_tokens_per_source=1024)
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """イベントループの最大遅延（他のタスクがどれだけ待たされたか）を計測する"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def run_sections(search, section_queries: list[list[str]], db_path: str, top_k: int) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lag_probe = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(search(query_list, db_path, top_k) for query_list in section_queries))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await lag_probe
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--chunk-chars", type=int, default=500)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    long_words = [word for word in WORDS if len(word) >= 3]
+    section_queries = [
+        [f"{rng.choice(long_words)} OR {rng.choice(long_words)}" for _ in range(args.queries)]
+        for _ in range(args.sections)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "bench.sqlite")
+        retriever = SQLiteFTSDocumentRetriever(db_path)
+        retriever.create_document_table()
+        retriever.bulk_insert_documents(generate_corpus(args.chunks, args.chunk_chars))
+        retriever.close()
+        print(f"corpus: {args.chunks} chunks, {args.sections} sections x {args.queries} queries")
+
+        for name, search in [("sequential", sequential_search), ("pooled", pooled_search)]:
+            elapsed, max_lag = asyncio.run(run_sections(search, section_queries, db_path, args.top_k))
+            total_queries = args.sections * args.queries
+            print(
+                f"{name:>12}: {elapsed:8.3f}s  ({total_queries / elapsed:,.1f} queries/s, "
+                f"max event loop lag {max_lag * 1000:,.1f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""シャード数ごとの取り込み・検索性能を比較するベンチマーク
+
+合成コーパスを ShardedFTSWriter で 1 シャード（従来の単一ファイル）と N シャードに取り込み、
+取り込み時間（インデックスの再構築を含む）と local_search の検索スループットを比較する。
+
+    python benchmarks/bench_fts_shards.py --chunks 1000000 --shards 1 4 8
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from itertools import groupby
+from pathlib import Path
+
+from bench_fts_ingest import WORDS, generate_corpus
+
+from open_deep_researcher.retriever.local.full_text_search import ShardedFTSWriter, local_search
+
+
+async def ingest(documents: list[dict[str, str]], db_path: Path, num_shards: int) -> float:
+    start = time.perf_counter()
+    async with ShardedFTSWriter(db_path, num_shards=num_shards, batch_size=50000) as writer:
+        for file_path, chunks in groupby(documents, key=lambda doc: doc["file_path"]):
+            await writer.add(file_path, list(chunks))
+    return time.perf_counter() - start
+
+
+async def search(section_queries: list[list[str]], db_path: Path, num_shards: int, top_k: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            local_search(query_list, db_path=db_path, top_k=top_k, max_tokens_per_source=1024, num_shards=num_shards)
+            for query_list in section_queries
+        )
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--chunk-chars", type=int, default=500)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    long_words = [word for word in WORDS if len(word) >= 3]
+    section_queries = [
+        [f"{rng.choice(long_words)} OR {rng.choice(long_words)}" for _ in range(args.queries)]
+        for _ in range(args.sections)
+    ]
+    documents = generate_corpus(args.chunks, args.chunk_chars)
+    print(f"corpus: {args.chunks} chunks, {args.sections} sections x {args.queries} queries")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_shards in args.shards:
+            db_path = Path(tmp_dir) / f"bench_{num_shards}.sqlite"
+            ingest_time = asyncio.run(ingest(documents, db_path, num_shards))
+            search_time = asyncio.run(search(section_queries, db_path, num_shards, args.top_k))
+            total_queries = args.sections * args.queries
+            print(
+                f"{num_shards:>3} shards: ingest {ingest_time:8.3f}s  "
+                f"search {search_time:8.3f}s ({total_queries / search_time:,.1f} queries/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""本文の保存形式（非圧縮 / zlib 圧縮 + 重複除去）を比較するベンチマーク
+
+合成したファイルをオーバーラップ付きでチャンク化し（一部のファイルは別フォルダに同じ内容で複製）、
+データベースサイズ・ページ数、取り込み時間、検索レイテンシを比較する。
+ページキャッシュへの負荷は、ページキャッシュを小さくしたコネクションでのレイテンシで比較する。
+
+    python benchmarks/bench_fts_storage.py --files 2000 --file-chars 50000 --chunk-size 10000 --chunk-overlap 2000
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bench_fts_ingest import WORDS
+from langchain_core.documents import Document
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever, chunk_documents
+
+
+def generate_documents(
+    num_files: int, file_chars: int, chunk_size: int, chunk_overlap: int, duplicate_ratio: float, seed: int = 0
+) -> list[dict[str, str]]:
+    rng = random.Random(seed)
+    documents = []
+    texts = []
+    for i in range(num_files):
+        if texts and rng.random() < duplicate_ratio:
+            text = rng.choice(texts)  # 別フォルダに置かれた同じファイル
+        else:
+            text = " ".join(rng.choice(WORDS) for _ in range(file_chars // 6))
+            texts.append(text)
+        file_path = f"folder_{i % 10}/file_{i}.txt"
+        chunks = chunk_documents([Document(page_content=text)], chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        for j, chunk in enumerate(chunks):
+            documents.append(
+                {
+                    "file_path": file_path,
+                    "title": f"{file_path} (chunk {j + 1}/{len(chunks)})",
+                    "content": chunk.page_content,
+                    "chunk_id": f"{file_path}_{j}",
+                }
+            )
+    return documents
+
+
+def measure_latency(db_path: str, queries: list[str], cache_pages: int | None = None) -> float:
+    """検索レイテンシの中央値（ミリ秒）"""
+    retriever = SQLiteFTSDocumentRetriever(db_path)
+    if cache_pages is not None:
+        retriever.conn.execute(f"PRAGMA cache_size={cache_pages}")
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.search(query, limit=5)
+        latencies.append(time.perf_counter() - start)
+    retriever.close()
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--file-chars", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--chunk-overlap", type=int, default=2_000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--small-cache-pages", type=int, default=100)
+    args = parser.parse_args()
+
+    documents = generate_documents(
+        args.files, args.file_chars, args.chunk_size, args.chunk_overlap, args.duplicate_ratio
+    )
+    rng = random.Random(1)
+    long_words = [word for word in WORDS if len(word) >= 3]
+    queries = [f"{rng.choice(long_words)} {rng.choice(long_words)}" for _ in range(args.queries)]
+    print(f"corpus: {args.files} files, {len(documents)} chunks, {sum(len(d['content']) for d in documents):,} chars")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, compress_content in [("plain", False), ("compressed", True)]:
+            db_path = str(Path(tmp_dir) / f"{name}.sqlite")
+            retriever = SQLiteFTSDocumentRetriever(db_path)
+            retriever.create_document_table(compress_content=compress_content)
+            start = time.perf_counter()
+            retriever.bulk_insert_documents(documents)
+            ingest_time = time.perf_counter() - start
+            page_count = retriever.conn.execute("PRAGMA page_count").fetchone()[0]
+            retriever.close()
+
+            warm = measure_latency(db_path, queries)
+            small_cache = measure_latency(db_path, queries, cache_pages=args.small_cache_pages)
+            print(
+                f"{name:>10}: size {Path(db_path).stat().st_size / 1e6:8.1f} MB ({page_count:,} pages)  "
+                f"ingest {ingest_time:7.2f}s  search p50 {warm:6.2f} ms  "
+                f"(cache {args.small_cache_pages} pages: {small_cache:6.2f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main()
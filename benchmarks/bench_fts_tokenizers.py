@@ -0,0 +1,80 @@
+"""trigram のみのインデックスと trigram + CJKバイグラムのインデックスを比較するベンチマーク
+
+合成した日本語中心のコーパスについて、取り込み時間・データベースサイズ・ヒット率を計測する。
+ヒット率は、語を含むチャンクが実際に存在するクエリのうち、1件以上の結果が返ったクエリの割合。
+
+    python benchmarks/bench_fts_tokenizers.py --chunks 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever
+
+SHORT_TERMS = ["東京", "規制", "AI", "ML", "税", "株価", "金利", "医療", "電池", "半導体"]
+LONG_TERMS = ["機械学習", "深層学習", "生成モデル", "言語モデル", "データベース", "全文検索", "optimization"]
+FILLER = ["の", "は", "を", "に", "と", "が", "について", "による", "。", "、"]
+
+
+def generate_corpus(num_chunks: int, chunk_terms: int, seed: int = 0) -> list[dict[str, str]]:
+    rng = random.Random(seed)
+    vocabulary = SHORT_TERMS + LONG_TERMS
+    documents = []
+    for i in range(num_chunks):
+        content = "".join(rng.choice(vocabulary) + rng.choice(FILLER) for _ in range(chunk_terms))
+        file_path = f"file_{i // 100}.txt"
+        documents.append(
+            {
+                "file_path": file_path,
+                "title": f"{file_path} (chunk {i % 100 + 1}/100)",
+                "content": content,
+                "chunk_id": f"{file_path}_{i % 100}",
+            }
+        )
+    return documents
+
+
+def build(db_path: Path, documents: list[dict[str, str]], bigram_index: bool) -> float:
+    start = time.perf_counter()
+    retriever = SQLiteFTSDocumentRetriever(str(db_path))
+    retriever.create_document_table(bigram_index=bigram_index)
+    retriever.bulk_insert_documents(documents)
+    retriever.conn.execute("VACUUM")
+    retriever.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--chunk-terms", type=int, default=80)
+    args = parser.parse_args()
+
+    documents = generate_corpus(args.chunks, args.chunk_terms)
+    queries = SHORT_TERMS + LONG_TERMS + [f"{a} {b}" for a, b in zip(SHORT_TERMS, LONG_TERMS, strict=False)]
+    text_bytes = sum(len(doc["content"].encode()) for doc in documents)
+    print(f"corpus: {len(documents)} chunks, {text_bytes / 1e6:.1f} MB of text, {len(queries)} queries")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, bigram_index in [("trigram", False), ("trigram+bigram", True)]:
+            db_path = Path(tmp_dir) / f"{name}.sqlite"
+            elapsed = build(db_path, documents, bigram_index)
+
+            retriever = SQLiteFTSDocumentRetriever(str(db_path))
+            start = time.perf_counter()
+            hits = sum(1 for query in queries if retriever.search(query, limit=5))
+            query_time = time.perf_counter() - start
+            retriever.close()
+
+            print(
+                f"{name:>15}: ingest {elapsed:7.2f}s, size {db_path.stat().st_size / 1e6:8.1f} MB, "
+                f"hit rate {hits}/{len(queries)} ({hits / len(queries):.0%}), "
+                f"{query_time / len(queries) * 1000:.1f} ms/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
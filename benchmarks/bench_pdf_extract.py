@@ -0,0 +1,76 @@
+"""PDF のテキスト抽出性能を比較するベンチマーク
+
+PyPDFLoader（pypdf）と FastPDFLoader（PyMuPDF、逐次 / ページ並列）で同じ PDF を読み込み、
+所要時間と抽出した文字数を比較する。--pdf-dir を指定しない場合は PyMuPDF で合成した PDF を使う。
+
+    python benchmarks/bench_pdf_extract.py --files 20 --pages 50 --large-pages 1000
+    python benchmarks/bench_pdf_extract.py --pdf-dir ~/papers
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import pymupdf
+from bench_fts_ingest import WORDS
+from langchain_community.document_loaders import PyPDFLoader
+
+from open_deep_researcher.retriever.local.pdf_loader import FastPDFLoader
+
+
+def generate_pdf(path: Path, num_pages: int, rng: random.Random):
+    doc = pymupdf.open()
+    for _ in range(num_pages):
+        page = doc.new_page()
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(50)]
+        # 日本語を含むため CJK フォントで書き込む
+        page.insert_text((50, 50), "\n".join(lines), fontsize=9, fontname="japan")
+    doc.save(path)
+    doc.close()
+
+
+def measure(name: str, pdf_paths: list[Path], create_loader):
+    start = time.perf_counter()
+    pages = chars = 0
+    for path in pdf_paths:
+        docs = create_loader(path).load()
+        pages += len(docs)
+        chars += sum(len(doc.page_content) for doc in docs)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>18}: {elapsed:8.2f}s  ({pages / elapsed:8.1f} pages/s, {pages} pages, {chars:,} chars)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf-dir", type=Path, default=None)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--large-pages", type=int, default=600, help="ページ並列を確認する大きな PDF のページ数")
+    parser.add_argument("--page-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.pdf_dir:
+            pdf_paths = sorted(args.pdf_dir.glob("*.pdf"))
+        else:
+            rng = random.Random(0)
+            pdf_paths = []
+            for i in range(args.files):
+                path = Path(tmp_dir) / f"sample_{i}.pdf"
+                generate_pdf(path, args.pages, rng)
+                pdf_paths.append(path)
+            if args.large_pages:
+                path = Path(tmp_dir) / "large.pdf"
+                generate_pdf(path, args.large_pages, rng)
+                pdf_paths.append(path)
+        print(f"corpus: {len(pdf_paths)} PDFs")
+
+        measure("pypdf", pdf_paths, lambda path: PyPDFLoader(str(path)))
+        measure("pymupdf", pdf_paths, lambda path: FastPDFLoader(path, page_workers=1))
+        measure("pymupdf (parallel)", pdf_paths, lambda path: FastPDFLoader(path, page_workers=args.page_workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""TF-IDF インデックスの作成時間と検索レイテンシを測るベンチマーク
+
+Zipf 分布に従う合成語彙でチャンクを生成して FTS データベースに取り込み、
+build_tfidf_index でインデックスを作成したあと、TfidfIndex.search（TF-IDF / LSA）のレイテンシを測る。
+
+    python benchmarks/bench_tfidf_search.py --chunks 1000000 --lsa-components 128
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from itertools import groupby
+from pathlib import Path
+
+import numpy as np
+
+from open_deep_researcher.retriever.local.full_text_search import ShardedFTSWriter
+from open_deep_researcher.retriever.local.tfidf_search import TfidfIndex, build_tfidf_index
+
+
+def generate_corpus(num_chunks: int, chunk_words: int, vocab_size: int, seed: int = 0) -> list[dict[str, str]]:
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i:x}" for i in range(vocab_size)])
+    word_ids = np.minimum(rng.zipf(1.2, size=(num_chunks, chunk_words)), vocab_size) - 1
+    documents = []
+    for i, row in enumerate(word_ids):
+        file_path = f"file_{i // 100}.txt"
+        documents.append(
+            {
+                "file_path": file_path,
+                "title": f"{file_path} (chunk {i % 100 + 1}/100)",
+                "content": " ".join(vocab[row]),
+                "chunk_id": f"{file_path}_{i % 100}",
+            }
+        )
+    return documents
+
+
+async def ingest(documents: list[dict[str, str]], db_path: Path, num_shards: int):
+    async with ShardedFTSWriter(db_path, num_shards=num_shards, batch_size=50000) as writer:
+        for file_path, chunks in groupby(documents, key=lambda doc: doc["file_path"]):
+            await writer.add(file_path, list(chunks))
+
+
+def measure_latency(index: TfidfIndex, queries: list[str], top_k: int, use_lsa: bool) -> tuple[float, float]:
+    """検索レイテンシの中央値と p95（ミリ秒）"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=top_k, use_lsa=use_lsa)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--chunk-words", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--lsa-components", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    documents = generate_corpus(args.chunks, args.chunk_words, args.vocab)
+    rng = np.random.default_rng(1)
+    queries = [
+        " ".join(f"w{i:x}" for i in rng.integers(10, min(args.vocab, 5000), size=args.query_words))
+        for _ in range(args.queries)
+    ]
+    print(f"corpus: {args.chunks} chunks x {args.chunk_words} words (vocab {args.vocab}), {args.queries} queries")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "bench.sqlite"
+        start = time.perf_counter()
+        asyncio.run(ingest(documents, db_path, args.shards))
+        print(f"FTS ingest: {time.perf_counter() - start:8.2f}s")
+
+        start = time.perf_counter()
+        index_dir = build_tfidf_index(
+            db_path, num_shards=args.shards, lsa_components=args.lsa_components, max_workers=args.workers
+        )
+        print(f"TF-IDF build: {time.perf_counter() - start:8.2f}s")
+
+        index = TfidfIndex(index_dir)
+        modes = [("tfidf", False)] + ([("lsa", True)] if index.lsa_documents is not None else [])
+        for name, use_lsa in modes:
+            p50, p95 = measure_latency(index, queries, args.top_k, use_lsa)
+            print(f"{name:>6}: search p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,8 @@ import { ProtectedRoute } from "@/components/protected-route";
 export default function DashboardPage() {
   const router = useRouter();
   const { isAuthenticated, username } = useAuthStore();
-  const { data: researches, isLoading, error, refetch } = useResearchList();
+  const { data, isLoading, error, refetch, fetchNextPage, hasNextPage, isFetchingNextPage } = useResearchList();
+  const researches = data?.pages.flat();
   const [searchQuery, setSearchQuery] = useState("");
   const [isRedirecting, setIsRedirecting] = useState(false);
   
@@ -141,6 +142,20 @@ export default function DashboardPage() {
             ))}
           </div>
         )}
+
+        {hasNextPage && (
+          <div className="mt-8 flex justify-center">
+            <Button
+              variant="outline"
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+              className="flex items-center gap-1.5"
+            >
+              {isFetchingNextPage && <Loader2 size={16} className="animate-spin" />}
+              さらに読み込む
+            </Button>
+          </div>
+        )}
       </div>
     </ProtectedRoute>
   );
@@ -7,7 +7,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Button } from "@/components/ui/button";
 import { ArrowLeft, ThumbsUp, Loader2 } from "lucide-react";
 import { formatDate } from "@/lib/utils";
-import { useResearchStatus, useResearchPlan } from "@/hooks/use-research";
+import { useResearchStatus, useResearchEvents } from "@/hooks/use-research";
 import { FeedbackForm } from "@/components/forms/feedback-form";
 import { sampleResearchPlan } from "@/lib/utils";
 import { useQuery } from "@tanstack/react-query";
@@ -20,6 +20,8 @@ export function FeedbackClient({ researchId }: { researchId: string }) {
   const originalPlanRef = useRef<string | null>(null);
   // 新しいプランが検出されたかのフラグ
   const [newPlanDetected, setNewPlanDetected] = useState(false);
+  // 進捗イベントのストリームに接続中か（接続中はステータスとプランがイベントで更新される）
+  const streaming = useResearchEvents(researchId);
   
   const { 
     data: research, 
@@ -36,7 +38,7 @@ export function FeedbackClient({ researchId }: { researchId: string }) {
   } = useQuery({
     queryKey: ['research', researchId, 'plan'],
     queryFn: () => researchService.getResearchPlan(researchId),
-    refetchInterval: waitingForUpdatedPlan && !newPlanDetected ? 5000 : false,
+    refetchInterval: waitingForUpdatedPlan && !newPlanDetected && !streaming ? 5000 : false,
     retry: false,
     onError: () => {},
   });
@@ -102,9 +104,9 @@ export function FeedbackClient({ researchId }: { researchId: string }) {
     }
   }, [research, researchId, router, waitingForUpdatedPlan, newPlanDetected]);
 
-  // 定期的なポーリング設定
+  // 定期的なポーリング設定（ストリームに接続できない場合のみ）
   useEffect(() => {
-    if (!waitingForUpdatedPlan) return;
+    if (!waitingForUpdatedPlan || streaming) return;
     
     // 最初のポーリングをすぐに実行
     console.log("初回ポーリングを実行...");
@@ -118,7 +120,7 @@ export function FeedbackClient({ researchId }: { researchId: string }) {
     }, 3000); // 3秒間隔に短縮
     
     return () => clearInterval(intervalId);
-  }, [waitingForUpdatedPlan, refetchStatus, refetchPlan]);
+  }, [waitingForUpdatedPlan, streaming, refetchStatus, refetchPlan]);
 
   // 作成日（ダミー）
   const createdAt = new Date().toISOString();
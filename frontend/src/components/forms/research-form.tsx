@@ -767,6 +767,66 @@ export function ResearchForm() {
                     </Label>
                   </div>
 
+                  <div className="flex items-center space-x-2">
+                    <Checkbox 
+                      id="search_hybrid" 
+                      checked={config.available_search_providers?.includes(SearchProviderEnum.HYBRID)}
+                      onCheckedChange={(checked) => {
+                        const providers = [...(config.available_search_providers || [])];
+                        if (checked) {
+                          if (!providers.includes(SearchProviderEnum.HYBRID)) {
+                            providers.push(SearchProviderEnum.HYBRID);
+                          }
+                        } else {
+                          const index = providers.indexOf(SearchProviderEnum.HYBRID);
+                          if (index >= 0) {
+                            providers.splice(index, 1);
+                          }
+                        }
+                        updateConfig({ 
+                          available_search_providers: providers,
+                          default_search_provider: providers.length > 0 ? providers[0] : undefined
+                        });
+                      }}
+                      disabled={isPending}
+                    />
+                    <Label htmlFor="search_hybrid" className="font-medium flex items-center gap-1.5">
+                      <Database size={14} />
+                      ローカルドキュメント（ハイブリッド）
+                      <span className="text-xs font-normal text-gray-500">(全文検索 + ベクトル検索)</span>
+                    </Label>
+                  </div>
+
+                  <div className="flex items-center space-x-2">
+                    <Checkbox 
+                      id="search_tfidf" 
+                      checked={config.available_search_providers?.includes(SearchProviderEnum.TFIDF)}
+                      onCheckedChange={(checked) => {
+                        const providers = [...(config.available_search_providers || [])];
+                        if (checked) {
+                          if (!providers.includes(SearchProviderEnum.TFIDF)) {
+                            providers.push(SearchProviderEnum.TFIDF);
+                          }
+                        } else {
+                          const index = providers.indexOf(SearchProviderEnum.TFIDF);
+                          if (index >= 0) {
+                            providers.splice(index, 1);
+                          }
+                        }
+                        updateConfig({ 
+                          available_search_providers: providers,
+                          default_search_provider: providers.length > 0 ? providers[0] : undefined
+                        });
+                      }}
+                      disabled={isPending}
+                    />
+                    <Label htmlFor="search_tfidf" className="font-medium flex items-center gap-1.5">
+                      <Database size={14} />
+                      ローカルドキュメント（TF-IDF）
+                      <span className="text-xs font-normal text-gray-500">(API不要の関連度検索)</span>
+                    </Label>
+                  </div>
+
                 </div>
                 <p className="text-xs text-gray-500 mt-1">少なくとも1つの検索プロバイダーを選択してください</p>
               </div>
@@ -977,6 +1037,8 @@ export function ResearchForm() {
                           {provider === 'tavily' ? 'Tavily' : 
                            provider === 'arxiv' ? 'arXiv' : 
                            provider === 'local' ? 'ローカルドキュメント' :
+                           provider === 'hybrid' ? 'ローカルドキュメント（ハイブリッド）' :
+                           provider === 'tfidf' ? 'ローカルドキュメント（TF-IDF）' :
                            provider}
                         </SelectItem>
                       ))}
@@ -35,11 +35,11 @@ export function ResearchCard({ research }: ResearchCardProps) {
       ? Math.round(progress * 100)
       : Math.round(progress);
 
-  // 日付表示：完了ならcompleted_at、その他は現在日時
+  // 日付表示：完了ならcompleted_at、その他は作成日時
   const displayDate =
     status === "completed" && research.completed_at
       ? research.completed_at
-      : new Date().toISOString();
+      : research.created_at || new Date().toISOString();
 
   // 削除処理用のフックとダイアログの開閉管理
   const [isDeleteDialogOpen, setIsDeleteDialogOpen] = useState(false);
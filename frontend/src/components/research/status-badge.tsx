@@ -17,7 +17,9 @@ export function StatusBadge({ status }: StatusBadgeProps) {
     researching_sections: "bg-blue-500 hover:bg-blue-600 text-white",
     processing_sections: "bg-blue-500 hover:bg-blue-600 text-white",
     planning: "bg-purple-500 hover:bg-purple-600 text-white",
+    queued: "bg-gray-400 hover:bg-gray-500 text-white",
     initializing: "bg-gray-500 hover:bg-gray-600 text-white",
+    cancelled: "bg-gray-500 hover:bg-gray-600 text-white",
     error: "bg-red-500 hover:bg-red-600 text-white",
     default: "bg-gray-500 hover:bg-gray-600 text-white"
   };
@@ -1,51 +1,134 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useEffect, useState } from 'react';
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient, QueryClient } from '@tanstack/react-query';
 import { researchService } from '@/services/research-service';
-import { ResearchRequest } from '@/types/api';
+import { PlanResponse, ResearchEvent, ResearchListCursor, ResearchRequest, ResearchStatus } from '@/types/api';
 import { useAuthStore } from '@/store/auth-store';
+import { subscribeResearchEvents, TERMINAL_STATUSES } from '@/lib/research-events';
+
+// 一覧の1ページの件数
+const RESEARCH_LIST_PAGE_SIZE = 30;
 
 export const useResearchList = () => {
   const { isAuthenticated, username } = useAuthStore();
   
-  return useQuery({
+  return useInfiniteQuery({
     queryKey: ['researches', username],
-    queryFn: () => {
+    queryFn: ({ pageParam }) => {
       console.log(`Fetching researches for user: ${username}`);
       if (isAuthenticated && username) {
-        return researchService.getUserResearches(username);
+        return researchService.getUserResearches(username, RESEARCH_LIST_PAGE_SIZE, pageParam);
+      }
+      return researchService.listResearches(RESEARCH_LIST_PAGE_SIZE, pageParam);
+    },
+    initialPageParam: undefined as ResearchListCursor | undefined,
+    // 新しい順に取得し、続きは前のページの最後のリサーチより古いものを取得する
+    getNextPageParam: (lastPage): ResearchListCursor | undefined => {
+      const last = lastPage[lastPage.length - 1];
+      if (lastPage.length < RESEARCH_LIST_PAGE_SIZE || !last?.created_at) {
+        return undefined;
       }
-      return researchService.listResearches();
+      return { before: last.created_at, before_id: last.research_id };
     },
     refetchInterval: 30000, // 30秒ごとに自動更新
   });
 };
 
 
+// 進捗イベントをステータス・プランのキャッシュに反映する
+const applyResearchEvent = (queryClient: QueryClient, researchId: string, event: ResearchEvent) => {
+  const statusKey = ['research', researchId, 'status'];
+  const planKey = ['research', researchId, 'plan'];
+
+  switch (event.type) {
+    case 'snapshot':
+      queryClient.setQueryData<ResearchStatus>(statusKey, event.data);
+      break;
+    case 'status': {
+      const { waiting_for_feedback, ...fields } = event.data;
+      queryClient.setQueryData<ResearchStatus>(statusKey, (old) => (old ? { ...old, ...fields } : old));
+      if (waiting_for_feedback !== undefined) {
+        queryClient.setQueryData<PlanResponse>(planKey, (old) => (old ? { ...old, waiting_for_feedback } : old));
+      }
+      if (fields.status && TERMINAL_STATUSES.includes(fields.status)) {
+        queryClient.invalidateQueries({ queryKey: ['research', researchId, 'result'] });
+        queryClient.invalidateQueries({ queryKey: ['researches'] });
+      }
+      break;
+    }
+    case 'plan':
+      queryClient.setQueryData<ResearchStatus>(statusKey, (old) =>
+        old ? { ...old, sections: event.data.sections, completed_sections: [] } : old
+      );
+      queryClient.setQueryData<PlanResponse>(planKey, (old) => ({
+        research_id: researchId,
+        sections: event.data.sections,
+        waiting_for_feedback: old?.waiting_for_feedback ?? false,
+      }));
+      break;
+    case 'section': {
+      const { name, content } = event.data;
+      queryClient.setQueryData<ResearchStatus>(statusKey, (old) => {
+        if (!old) return old;
+        const sections = old.sections || [];
+        const exists = sections.some((section) => section.name === name);
+        return {
+          ...old,
+          sections: exists
+            ? sections.map((section) => (section.name === name ? { ...section, content } : section))
+            : [...sections, { name, description: '', content }],
+          completed_sections: Array.from(new Set([...(old.completed_sections || []), name])),
+        };
+      });
+      break;
+    }
+    case 'deleted':
+      queryClient.invalidateQueries({ queryKey: ['research', researchId] });
+      break;
+  }
+};
+
+// リサーチの進捗イベントを購読する（接続中は true を返し、その間はポーリングしない）
+export const useResearchEvents = (researchId: string) => {
+  const queryClient = useQueryClient();
+  const [streaming, setStreaming] = useState(false);
+
+  useEffect(() => {
+    if (!researchId) return;
+    return subscribeResearchEvents(researchId, {
+      onEvent: (event) => applyResearchEvent(queryClient, researchId, event),
+      onConnectionChange: setStreaming,
+    });
+  }, [researchId, queryClient]);
+
+  return streaming;
+};
+
 export const useResearchStatus = (researchId: string) => {
+  const streaming = useResearchEvents(researchId);
+
   return useQuery({
     queryKey: ['research', researchId, 'status'],
     queryFn: () => researchService.getResearchStatus(researchId),
-    refetchInterval: (data) => {
-      // 完了またはエラー状態、またはフィードバック待ちの場合はポーリングを停止
-      if (
-        data?.status === 'completed' || 
-        data?.status === 'error' || 
-        data?.status === 'waiting_for_feedback'
-      ) {
+    refetchInterval: (query) => {
+      const status = query.state.data?.status;
+      // 完了・エラー・キャンセル状態、またはフィードバック待ちの場合はポーリングを停止
+      if (status && (TERMINAL_STATUSES.includes(status) || status === 'waiting_for_feedback')) {
         return false;
       }
-      // それ以外は5秒ごとにポーリング
-      return 5000;
+      // イベントのストリームに接続中はポーリングしない。接続できない場合は5秒ごとにポーリング
+      return streaming ? false : 5000;
     },
   });
 };
 
 export const useResearchPlan = (researchId: string) => {
+  const streaming = useResearchEvents(researchId);
+
   return useQuery({
     queryKey: ['research', researchId, 'plan'],
     queryFn: () => researchService.getResearchPlan(researchId),
-    // ポーリング間隔を設定（フィードバック処理中も継続）
-    // ステータスに関係なく定期的に確認する
-    refetchInterval: 5000, 
+    // プランの更新はイベントのストリームで受け取り、接続できない場合だけ定期的に確認する
+    refetchInterval: streaming ? false : 5000,
     retry: 3, // リトライを増やす
     // プランがない場合はエラーを表示しない
     onError: () => {},
@@ -0,0 +1,88 @@
+import apiClient from '@/lib/api';
+import { ResearchEvent } from '@/types/api';
+
+// これ以上イベントが届かないステータス
+export const TERMINAL_STATUSES = ['completed', 'error', 'cancelled'];
+
+const EVENT_TYPES: ResearchEvent['type'][] = ['snapshot', 'status', 'plan', 'section', 'deleted'];
+
+export interface ResearchEventListener {
+  onEvent: (event: ResearchEvent) => void;
+  onConnectionChange: (connected: boolean) => void;
+}
+
+interface Connection {
+  source: EventSource;
+  listeners: Set<ResearchEventListener>;
+  connected: boolean;
+}
+
+// 同じリサーチを表示する複数のコンポーネントで1つの接続を共有する
+const connections = new Map<string, Connection>();
+
+function setConnected(connection: Connection, connected: boolean) {
+  connection.connected = connected;
+  connection.listeners.forEach((listener) => listener.onConnectionChange(connected));
+}
+
+function closeConnection(researchId: string, connection: Connection) {
+  connection.source.close();
+  if (connections.get(researchId) === connection) {
+    connections.delete(researchId);
+  }
+  setConnected(connection, false);
+}
+
+function openConnection(researchId: string): Connection {
+  // 切断時は EventSource が Last-Event-ID を付けて自動で再接続し、続きのイベントから受け取る
+  const source = new EventSource(`${apiClient.defaults.baseURL}/research/${researchId}/events`);
+  const connection: Connection = { source, listeners: new Set(), connected: false };
+
+  source.onopen = () => setConnected(connection, true);
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      // 再接続できない（404 など）場合はポーリングに戻す
+      closeConnection(researchId, connection);
+    } else {
+      setConnected(connection, false);
+    }
+  };
+
+  EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (message) => {
+      const event = { type, data: JSON.parse((message as MessageEvent).data) } as ResearchEvent;
+      connection.listeners.forEach((listener) => listener.onEvent(event));
+
+      // 終了状態になったらサーバーがストリームを閉じるため、再接続しないよう閉じる
+      const status = event.type === 'snapshot' || event.type === 'status' ? event.data.status : undefined;
+      if (event.type === 'deleted' || (status !== undefined && TERMINAL_STATUSES.includes(status))) {
+        closeConnection(researchId, connection);
+      }
+    });
+  });
+
+  return connection;
+}
+
+// リサーチの進捗イベントを購読し、購読を解除する関数を返す
+export function subscribeResearchEvents(researchId: string, listener: ResearchEventListener): () => void {
+  if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+
+  let connection = connections.get(researchId);
+  if (!connection) {
+    connection = openConnection(researchId);
+    connections.set(researchId, connection);
+  }
+  connection.listeners.add(listener);
+  listener.onConnectionChange(connection.connected);
+
+  const subscribed = connection;
+  return () => {
+    subscribed.listeners.delete(listener);
+    if (subscribed.listeners.size === 0) {
+      closeConnection(researchId, subscribed);
+    }
+  };
+}
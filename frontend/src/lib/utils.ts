@@ -30,8 +30,12 @@ export function getStatusInfo(status: string): { label: string; color: string; t
       return { label: 'リサーチ中', color: 'bg-blue-500', textColor: 'text-blue-500' };
     case 'planning':
       return { label: 'プラン作成中', color: 'bg-purple-500', textColor: 'text-purple-500' };
+    case 'queued':
+      return { label: '実行待ち', color: 'bg-gray-400', textColor: 'text-gray-400' };
     case 'initializing':
       return { label: '初期化中', color: 'bg-gray-500', textColor: 'text-gray-500' };
+    case 'cancelled':
+      return { label: 'キャンセル', color: 'bg-gray-500', textColor: 'text-gray-500' };
     case 'error':
       return { label: 'エラー', color: 'bg-red-500', textColor: 'text-red-500' };
     default:
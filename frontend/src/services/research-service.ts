@@ -4,7 +4,8 @@ import {
   ResearchResponse, 
   ResearchStatus, 
   PlanResponse, 
-  ResearchResult
+  ResearchResult,
+  ResearchListCursor
 } from '@/types/api';
 
 // バックエンドAPIエンドポイントを明示的に定義（正しいパス形式に統一）
@@ -28,10 +29,14 @@ export const researchService = {
   },
   
   // ユーザー別のリサーチ一覧を取得
-  getUserResearches: async (username: string): Promise<ResearchStatus[]> => {
+  getUserResearches: async (
+    username: string,
+    limit?: number,
+    cursor?: ResearchListCursor
+  ): Promise<ResearchStatus[]> => {
     console.log(`ユーザー ${username} のリサーチ一覧取得`);
     const endpoint = API_ENDPOINTS.USER_RESEARCHES(username);
-    const response = await apiClient.get(endpoint);
+    const response = await apiClient.get(endpoint, { params: { limit, ...cursor } });
     return response.data;
   },
 
@@ -78,9 +83,9 @@ export const researchService = {
   },
 
   // すべてのリサーチを取得
-  listResearches: async (): Promise<ResearchStatus[]> => {
+  listResearches: async (limit?: number, cursor?: ResearchListCursor): Promise<ResearchStatus[]> => {
     console.log('リサーチ一覧取得');
-    const response = await apiClient.get(API_ENDPOINTS.LIST_RESEARCHES);
+    const response = await apiClient.get(API_ENDPOINTS.LIST_RESEARCHES, { params: { limit, ...cursor } });
     return response.data;
   },
 
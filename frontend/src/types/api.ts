@@ -23,7 +23,30 @@ export interface ResearchStatus {
   final_report?: string;
   error?: string;
   completed_at?: string; // 完了日時フィールドを追加
-}
+  queue_position?: number | null; // 実行待ちの場合の順番（次に実行されるものが 1）
+  created_at?: string | null;
+  total_section_count?: number | null; // 一覧でのみ設定
+  completed_section_count?: number | null;
+}
+
+// 一覧の続きのページを取得するためのカーソル（前のページの最後のリサーチ）
+export interface ResearchListCursor {
+  before: string;
+  before_id: string;
+}
+
+// /research/{id}/events で配信される進捗イベント
+export type ResearchEvent =
+  | { type: 'snapshot'; data: ResearchStatus } // 接続時の現在の状態
+  | {
+      type: 'status';
+      data: Pick<Partial<ResearchStatus>, 'status' | 'progress' | 'error' | 'completed_at'> & {
+        waiting_for_feedback?: boolean;
+      };
+    }
+  | { type: 'plan'; data: { sections: SectionModel[] } } // レポートの計画が作成された
+  | { type: 'section'; data: { name: string; content: string } } // セクションが完了した
+  | { type: 'deleted'; data: Record<string, never> };
 
 export interface PlanResponse {
   research_id: string;
@@ -46,6 +69,8 @@ export enum SearchProviderEnum {
   TAVILY = "tavily",
   ARXIV = "arxiv",
   LOCAL = "local",
+  HYBRID = "hybrid",
+  TFIDF = "tfidf",
 }
 
 export enum PlannerProviderEnum {
@@ -30,6 +30,8 @@ class SearchProvider(str, Enum):
     TAVILY = "tavily"
     ARXIV = "arxiv"
     LOCAL = "local"
+    HYBRID = "hybrid"
+    TFIDF = "tfidf"
 
 
 @dataclass(kw_only=True)
@@ -118,6 +120,39 @@ class Configuration:
             "chunk_size": 10000,
             "chunk_overlap": 2000,
             "top_k": 5,
+            "title_weight": 1.0,  # BM25 のタイトル列の重み
+            "content_weight": 1.0,  # BM25 の本文列の重み
+            "min_score": 0.0,  # 正規化 BM25 スコアの下限（弱い一致を除外する）
+            "retrieval_mode": "chunk",  # "passage" で小さなパッセージを索引し、ヒット周辺のみを返す
+            "passage_size": 1000,  # passage モードのパッセージサイズ（文字数）
+            "passage_window": 1,  # passage モードでヒットの前後に結合するパッセージ数
+            "bigram_index": False,  # 3文字未満の語（日本語の短い語など）用の CJK バイグラムインデックスを追加する
+            "num_shards": 1,  # 大規模なライブラリ向けにインデックスをファイルのハッシュで分割するシャード数
+            "compress_content": False,  # チャンク本文を zlib 圧縮・重複除去して保存する（オーバーラップが大きい場合に有効）
+            "pdf_max_chars_per_page": 50000,  # PDF の1ページあたりの最大文字数（異常に長いページを切り詰める）
+            "text_cache_dir": "tmp/text_cache",  # PDF・CSV から抽出したテキストのキャッシュ（チャンク設定を変えても再パースしない）。None で無効
+            "text_cache_max_bytes": 2 * 1024**3,  # 取り込み後に古い順に削減するキャッシュの上限。None で無制限
+        }
+    )
+    # hybrid 検索（FTS + ベクトル検索）の設定。FTS 側は local_search_config を共有する
+    hybrid_search_config: dict[str, Any] | None = field(
+        default_factory=lambda: {
+            "vector_store_path": "tmp/vector_store",
+            "embedding_provider": "hashing",  # "openai" または API 不要の "hashing"（CPU の文字 n-gram 埋め込み）
+            "embedding_model": "hashing-512",  # openai の場合は "text-embedding-3-small" など
+            "collection_name": None,  # None の場合は FTS データベースのパスから生成する
+            "rrf_k": 60,  # FTS とベクトル検索の順位を統合する RRF の定数 k
+            "embedding_cache_dir": "tmp/embedding_cache",  # (モデル, チャンク本文) ごとの埋め込みキャッシュ。None で無効
+            "embedding_batch_size": 256,  # 1回の埋め込み呼び出しでまとめるチャンク数
+            "embedding_concurrency": 4,  # 埋め込み呼び出しの最大並列数
+        }
+    )
+    # tfidf 検索（API 不要の TF-IDF / LSA インデックス）の設定。チャンクは local_search_config の FTS データベースを使う
+    tfidf_search_config: dict[str, Any] | None = field(
+        default_factory=lambda: {
+            "lsa_components": 0,  # LSA の次元数（0 の場合は TF-IDF のみ。作成には scipy が必要）
+            "use_lsa": True,  # LSA ベクトルがある場合は LSA で検索する
+            "rrf_k": 60,  # クエリ間の順位を統合する RRF の定数 k
         }
     )
 
@@ -1,10 +1,11 @@
 import asyncio
-from pathlib import Path
+from dataclasses import asdict
 from typing import Literal
 
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from langgraph.constants import Send
 from langgraph.graph import END, START, StateGraph
 from langgraph.types import Command, interrupt
@@ -24,7 +25,19 @@ from open_deep_researcher.prompts import (
     section_grader_instructions,
     section_writer_instructions,
 )
-from open_deep_researcher.retriever.local.full_text_search import initialize_knowledge_base, local_search
+from open_deep_researcher.retriever.local.full_text_search import (
+    IngestionProgress,
+    initialize_knowledge_base,
+    local_search,
+    remove_knowledge_base,
+)
+from open_deep_researcher.retriever.local.tfidf_search import remove_tfidf_index, tfidf_search
+from open_deep_researcher.retriever.local.vector_search import (
+    hash_collection_name,
+    hybrid_search,
+    index_knowledge_base,
+    remove_vector_index,
+)
 from open_deep_researcher.retriever.web import web_search
 from open_deep_researcher.state import (
     Feedback,
@@ -50,6 +63,8 @@ PROVIDER_DESCRIPTIONS = {
     "tavily": "General web search, good for broad information gathering",
     "arxiv": "Academic papers and preprints, best for scientific topics",
     "local": "Search through locally stored documents",
+    "hybrid": "Search through locally stored documents by keywords and meaning (full text + vector search)",
+    "tfidf": "Search through locally stored documents ranked by term relevance (TF-IDF)",
 }
 
 QUERY_GNERATION_DESCRIPTION = {
@@ -86,6 +101,26 @@ Local search is performed on a SQLite FTS (full text search) database of stored
 7. Be sure to include common industry abbreviations, technical terms, and spelling variations
 8. Output only the search condition part compatible with SQLite FTS (SQL statement not needed)
 </Local>
+""",
+    "hybrid": """
+<Hybrid>
+Hybrid search runs the same query against a SQLite FTS (full text search) index and a vector index of stored documents, and fuses the rankings.
+1. Write each query as a short natural-language phrase that also contains the key terms (it is embedded for vector search)
+2. Include both Japanese and English queries to cover documents in either language
+3. Avoid long boolean expressions; the full text side treats adjacent terms as AND, so keep each query focused on one concept
+4. Cover different aspects and synonyms across multiple queries rather than inside one query
+   Example: "機械学習 モデルの評価指標", "machine learning model evaluation metrics"
+</Hybrid>
+""",
+    "tfidf": """
+<Tfidf>
+TF-IDF search ranks stored documents by how strongly they contain the query terms (no boolean operators are evaluated).
+1. Write each query as a list of the key terms and their close synonyms, without AND / OR / NOT
+2. Include both Japanese and English terms to cover documents in either language
+3. Prefer distinctive technical terms over common words, which carry little weight
+4. Cover different aspects across multiple queries
+   Example: "機械学習 評価指標 精度 再現率", "machine learning evaluation metrics precision recall"
+</Tfidf>
 """,
 }
 
@@ -99,6 +134,12 @@ def get_provider_config(configurable: Configuration, provider_name: str) -> dict
         return configurable.arxiv_search_config or {}
     elif provider_name == "local":
         return configurable.local_search_config or {}
+    elif provider_name == "hybrid":
+        # FTS 側の設定は local_search_config を共有する
+        return {**(configurable.local_search_config or {}), **(configurable.hybrid_search_config or {})}
+    elif provider_name == "tfidf":
+        # チャンクは local_search_config の FTS データベースから読む
+        return {**(configurable.local_search_config or {}), **(configurable.tfidf_search_config or {})}
     else:
         # デフォルト設定（空の辞書）を返す
         return {}
@@ -112,7 +153,8 @@ async def setup_knowledge_base(state: ReportState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
 
     # Skip if local document provider is not available
-    if "local" not in configurable.available_search_providers:
+    available_providers = configurable.available_search_providers
+    if not {"local", "hybrid", "tfidf"} & set(available_providers):
         return {"local_db_path": None}
 
     local_config = configurable.local_search_config or {}
@@ -122,7 +164,24 @@ async def setup_knowledge_base(state: ReportState, config: RunnableConfig):
     if not local_document_path:
         return {"local_db_path": None}
 
-    db_path = await initialize_knowledge_base(**local_config)
+    # 構築の進捗を custom ストリームに流す（stream_mode に "custom" を含めた呼び出し側で受け取れる）
+    writer = get_stream_writer()
+
+    def report_progress(progress: IngestionProgress):
+        writer({"knowledge_base_progress": {**asdict(progress), "fraction": progress.fraction}})
+
+    # tfidf 検索では FTS データベースの取り込み後に TF-IDF インデックスも作成する
+    db_path = await initialize_knowledge_base(
+        **local_config,
+        progress_callback=report_progress,
+        tfidf_index="tfidf" in available_providers,
+        lsa_components=(configurable.tfidf_search_config or {}).get("lsa_components", 0),
+    )
+
+    # hybrid 検索では同じチャンクからベクトルインデックスも作成する
+    if db_path and "hybrid" in available_providers:
+        await index_knowledge_base(**{**get_provider_config(configurable, "hybrid"), "db_path": db_path})
+
     return {"local_db_path": db_path}
 
 
@@ -184,7 +243,7 @@ async def generate_introduction(state: ReportState, config: RunnableConfig):
     system_instructions_query += f"\n\nPlease respond in **{configurable.language}** language."
 
     # Generate queries
-    results = structured_llm.invoke(
+    results = await structured_llm.ainvoke(
         [
             SystemMessage(content=system_instructions_query),
             HumanMessage(content="Generate search queries that will help with writing an introduction for the report."),
@@ -200,6 +259,18 @@ async def generate_introduction(state: ReportState, config: RunnableConfig):
             max_tokens_per_source=configurable.max_tokens_per_source,
             **provider_config,
         )
+    elif introduction_provider == "hybrid":
+        source_str = await hybrid_search(
+            query_list=query_list,
+            max_tokens_per_source=configurable.max_tokens_per_source,
+            **provider_config,
+        )
+    elif introduction_provider == "tfidf":
+        source_str = await tfidf_search(
+            query_list=query_list,
+            max_tokens_per_source=configurable.max_tokens_per_source,
+            **provider_config,
+        )
     else:
         source_str = await web_search(
             search_api=introduction_provider,
@@ -221,7 +292,7 @@ async def generate_introduction(state: ReportState, config: RunnableConfig):
     system_instructions += f"\n\nPlease respond in **{configurable.language}** language."
 
     # Write introduction
-    introduction_content = writer_model.invoke(
+    introduction_content = await writer_model.ainvoke(
         [
             SystemMessage(content=system_instructions),
             HumanMessage(content="Write an introduction for the report based on the provided sources."),
@@ -295,7 +366,7 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     system_instructions_query += f"\n\nPlease respond in **{configurable.language}** language."
 
     # Generate queries
-    results = structured_llm.invoke(
+    results = await structured_llm.ainvoke(
         [
             SystemMessage(content=system_instructions_query),
             HumanMessage(content="Generate search queries that will help with planning the sections of the report."),
@@ -311,6 +382,18 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
             max_tokens_per_source=configurable.max_tokens_per_source,
             **provider_config,
         )
+    elif planning_provider == "hybrid":
+        source_str = await hybrid_search(
+            query_list=query_list,
+            max_tokens_per_source=configurable.max_tokens_per_source,
+            **provider_config,
+        )
+    elif planning_provider == "tfidf":
+        source_str = await tfidf_search(
+            query_list=query_list,
+            max_tokens_per_source=configurable.max_tokens_per_source,
+            **provider_config,
+        )
     else:
         source_str = await web_search(
             search_api=planning_provider,
@@ -367,7 +450,7 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
 
     # Generate the report sections
     structured_llm = planner_llm.with_structured_output(Sections)
-    report_sections = structured_llm.invoke(
+    report_sections = await structured_llm.ainvoke(
         [
             SystemMessage(content=system_instructions_sections),
             HumanMessage(content=planner_message),
@@ -575,6 +658,18 @@ async def search(state: SectionState, config: RunnableConfig):  # noqa: C901
                 max_tokens_per_source=max_tokens_per_source,
                 **get_provider_config(configurable, provider),
             )
+        elif provider == "hybrid":
+            task = hybrid_search(
+                query_list,
+                max_tokens_per_source=max_tokens_per_source,
+                **get_provider_config(configurable, provider),
+            )
+        elif provider == "tfidf":
+            task = tfidf_search(
+                query_list,
+                max_tokens_per_source=max_tokens_per_source,
+                **get_provider_config(configurable, provider),
+            )
         else:
             continue
 
@@ -656,7 +751,7 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_config = configurable.writer_model_config or {}
     writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, **writer_model_config)
-    section_content = writer_model.invoke(
+    section_content = await writer_model.ainvoke(
         [
             SystemMessage(content=section_writer_instruction_query),
             HumanMessage(content="検索結果に基づいてセクションを作成してください。"),
@@ -689,7 +784,7 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     ).with_structured_output(Feedback)
 
     # Generate feedback
-    feedback = reflection_model.invoke(
+    feedback = await reflection_model.ainvoke(
         [
             SystemMessage(content=section_grader_instructions_formatted),
             HumanMessage(content=section_grader_message),
@@ -947,6 +1042,18 @@ async def deep_research_search(state: SectionState, config: RunnableConfig):
                         max_tokens_per_source=configurable.max_tokens_per_source,
                         **provider_config,
                     )
+                elif provider == "hybrid":
+                    result = await hybrid_search(
+                        query_list=query_list,
+                        max_tokens_per_source=configurable.max_tokens_per_source,
+                        **provider_config,
+                    )
+                elif provider == "tfidf":
+                    result = await tfidf_search(
+                        query_list=query_list,
+                        max_tokens_per_source=configurable.max_tokens_per_source,
+                        **provider_config,
+                    )
                 else:
                     result = await web_search(
                         search_api=provider,
@@ -1031,13 +1138,23 @@ def deep_research_writer(state: SectionState, config: RunnableConfig):
         )
 
 
-def cleanup(state: ReportState):
+def cleanup(state: ReportState, config: RunnableConfig):
     db_path = state.get("local_db_path")
     if not db_path:
         return {}
 
-    db_path = Path(db_path)
-    db_path.unlink(missing_ok=True)
+    configurable = Configuration.from_runnable_config(config)
+    local_config = configurable.local_search_config or {}
+    remove_knowledge_base(db_path, num_shards=local_config.get("num_shards", 1))
+
+    if "hybrid" in configurable.available_search_providers:
+        hybrid_config = get_provider_config(configurable, "hybrid")
+        remove_vector_index(
+            hybrid_config["vector_store_path"], hybrid_config.get("collection_name") or hash_collection_name(db_path)
+        )
+
+    if "tfidf" in configurable.available_search_providers:
+        remove_tfidf_index(db_path)
     return {}
 
 
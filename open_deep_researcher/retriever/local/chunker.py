@@ -0,0 +1,138 @@
+import re
+from collections import deque
+
+# RecursiveCharacterTextSplitter に渡していた区切り文字（優先度の高い順）
+CHUNK_SEPARATORS = [
+    "\n\n",
+    "\n",
+    " ",
+    ".",
+    ",",
+    "\u200b",  # Zero-width space
+    "\uff0c",  # Fullwidth comma
+    "\u3001",  # Ideographic comma
+    "\uff0e",  # Fullwidth full stop
+    "\u3002",  # Ideographic full stop
+    "",
+]
+
+_SEPARATOR_PATTERNS = {separator: re.compile(re.escape(separator)) for separator in CHUNK_SEPARATORS if separator}
+
+
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """str.strip() と同じく前後の空白を除いた範囲を返す"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class OffsetChunker:
+    """RecursiveCharacterTextSplitter（keep_separator=True, strip_whitespace=True）と同じチャンクを
+    部分文字列を作らずに (開始, 終了) のオフセットとして求めるチャンカー
+
+    区切り文字の位置だけを走査し、分割・結合はオフセットの演算で行う。区切り文字で分割できない長い範囲
+    （空白や句読点のない日本語など）は1文字ずつに分割せず、チャンク単位で計算する。
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, separators: list[str] | None = None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or CHUNK_SEPARATORS
+        self._patterns = {
+            separator: _SEPARATOR_PATTERNS.get(separator) or re.compile(re.escape(separator))
+            for separator in self.separators
+            if separator
+        }
+
+    def split_offsets(self, text: str) -> list[tuple[int, int]]:
+        """テキストをチャンクの (開始, 終了) のリストに分割する（text[開始:終了] がチャンク）"""
+        spans: list[tuple[int, int]] = []
+        self._split(text, 0, len(text), self.separators, spans)
+        return spans
+
+    def split_text(self, text: str) -> list[str]:
+        """テキストをチャンクの文字列のリストに分割する"""
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def _append(self, text: str, start: int, end: int, spans: list[tuple[int, int]]):
+        start, end = _strip_span(text, start, end)
+        if start < end:
+            spans.append((start, end))
+
+    def _split(self, text: str, start: int, end: int, separators: list[str], spans: list[tuple[int, int]]):  # noqa: C901
+        # 範囲内に現れる最初の区切り文字を使う（見つからなければ残りの "" で1文字ずつ）
+        separator = separators[-1]
+        remaining: list[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1 :]
+                break
+
+        if separator == "":
+            self._split_chars(text, start, end, spans)
+            return
+
+        # 区切り文字を次の断片の先頭に含めて分割する（keep_separator=True と同じ）
+        bounds = [start]
+        bounds.extend(match.start() for match in self._patterns[separator].finditer(text, start, end))
+        bounds.append(end)
+
+        good: list[tuple[int, int]] = []
+        for piece_start, piece_end in zip(bounds, bounds[1:], strict=False):
+            if piece_start == piece_end:
+                continue
+            if piece_end - piece_start < self.chunk_size:
+                good.append((piece_start, piece_end))
+                continue
+            if good:
+                self._merge(text, good, spans)
+                good = []
+            if remaining:
+                self._split(text, piece_start, piece_end, remaining, spans)
+            else:
+                # これ以上分割できない断片は空白を除かずにそのまま返す（RecursiveCharacterTextSplitter と同じ）
+                spans.append((piece_start, piece_end))
+        if good:
+            self._merge(text, good, spans)
+
+    def _merge(self, text: str, pieces: list[tuple[int, int]], spans: list[tuple[int, int]]):
+        """連続する断片を chunk_size 以下のチャンクにまとめ、chunk_overlap 分の断片を次のチャンクに残す"""
+        window: deque[tuple[int, int]] = deque()
+        total = 0
+        for piece_start, piece_end in pieces:
+            length = piece_end - piece_start
+            if total + length > self.chunk_size and window:
+                self._append(text, window[0][0], window[-1][1], spans)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    popped_start, popped_end = window.popleft()
+                    total -= popped_end - popped_start
+            window.append((piece_start, piece_end))
+            total += length
+        if window:
+            self._append(text, window[0][0], window[-1][1], spans)
+
+    def _split_chars(self, text: str, start: int, end: int, spans: list[tuple[int, int]]):
+        """1文字ずつの断片を _merge したのと同じチャンクを、文字を列挙せずに求める"""
+        if self.chunk_size <= 1:
+            # 1文字でも chunk_size に達するため、各文字がそのまま（空白も含めて）チャンクになる
+            spans.extend((position, position + 1) for position in range(start, end))
+            return
+
+        # チャンクが chunk_size 文字に達するたびに、末尾の min(chunk_overlap, chunk_size - 1) 文字を残して進む
+        step = self.chunk_size - min(self.chunk_overlap, self.chunk_size - 1)
+        position = start
+        while end - position > self.chunk_size:
+            self._append(text, position, position + self.chunk_size, spans)
+            position += step
+        if position < end:
+            self._append(text, position, end, spans)
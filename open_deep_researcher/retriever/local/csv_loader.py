@@ -0,0 +1,133 @@
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from langchain_community.document_loaders import CSVLoader
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+# 1ブロックの目安の文字数（取り込み時は chunk_size を渡し、1ブロックが1チャンクになるようにする）
+DEFAULT_BLOCK_CHARS = 4000
+
+# pandas で一度に読み込む行数
+DEFAULT_READ_ROWS = 50_000
+
+# CSV の値を引用符で囲む必要がある文字
+_QUOTE_CHARS = '",\r\n'
+_QUOTE_PATTERN = f"[{_QUOTE_CHARS}]"
+
+
+def _quote_column(values: pd.Series) -> pd.Series:
+    """区切り文字・改行・引用符を含む値を CSV の規則で引用符で囲む"""
+    # 多くの列はどの値も囲む必要がないため、列全体を連結した文字列で先に確かめる
+    joined = "".join(values.tolist())
+    if not any(char in joined for char in _QUOTE_CHARS):
+        return values
+    needs_quote = values.str.contains(_QUOTE_PATTERN, regex=True)
+    if not needs_quote.any():
+        return values
+    return values.where(~needs_quote, '"' + values.str.replace('"', '""', regex=False) + '"')
+
+
+def format_csv_rows(frame: pd.DataFrame) -> pd.Series:
+    """DataFrame の各行を CSV の1行の文字列に変換する（列ごとのベクトル演算で行う）"""
+    columns = [_quote_column(frame[column]) for column in frame.columns]
+    if not columns:
+        return pd.Series([""] * len(frame), dtype=str)
+    return columns[0].str.cat(columns[1:], sep=",") if len(columns) > 1 else columns[0]
+
+
+def iter_row_blocks(row_batches: Iterable[tuple[str, pd.Series]], block_chars: int) -> Iterator[tuple[int, int, str]]:
+    """(ヘッダー行, CSV の行の Series) の列を、先頭にヘッダー行を付けた block_chars 文字以内のブロックにまとめる
+
+    Returns:
+        (ブロック先頭の行番号, ブロックの行数, ブロックのテキスト) のイテレータ
+    """
+    header = None
+    pending: list[str] = []  # 前の読み込み単位から持ち越した、まだブロックにしていない行
+    first_row = 0
+
+    for header, formatted in row_batches:
+        budget = max(1, block_chars - len(header))
+        rows = pending + formatted.tolist()
+        # 各行の末尾までの累積文字数（改行を含む）から、budget に収まる範囲を二分探索でまとめる
+        lengths = np.concatenate([[len(row) for row in pending], formatted.str.len().to_numpy()]) + 1
+        ends = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        start = 0
+        while True:
+            end = int(np.searchsorted(ends, ends[start] + budget, side="right")) - 1
+            if end >= len(rows):
+                break  # 残りは次の読み込み単位の行と合わせてブロックにする
+            end = max(end, start + 1)  # 1行だけで budget を超える場合はその行だけのブロックにする
+            yield first_row, end - start, header + "\n" + "\n".join(rows[start:end])
+            first_row += end - start
+            start = end
+        pending = rows[start:]
+
+    if header is not None and (pending or first_row == 0):
+        yield first_row, len(pending), "\n".join([header, *pending])
+
+
+class PandasCSVLoader(BaseLoader):
+    """pandas で CSV を読み込み、複数行をまとめたブロックを1ドキュメントとして返すローダー
+
+    CSVLoader は1行を1ドキュメントにするため、大きな CSV では行数分のオブジェクトと小さなチャンクができる。
+    このローダーは read_rows 行ずつ読み込み、行を block_chars 文字以内のブロックにまとめて、
+    各ブロックの先頭にヘッダー行を付ける。読み込めない場合は CSVLoader にフォールバックする。
+    """
+
+    def __init__(
+        self,
+        file_path: str | Path,
+        block_chars: int = DEFAULT_BLOCK_CHARS,
+        read_rows: int = DEFAULT_READ_ROWS,
+        encoding: str = "utf-8",
+    ):
+        """initialize PandasCSVLoader
+
+        Args:
+            file_path: CSV ファイルのパス
+            block_chars: 1ブロックの最大文字数（ヘッダー行を含む。1行だけでこれを超える場合はその行だけのブロックになる）
+            read_rows: pandas で一度に読み込む行数
+            encoding: ファイルのエンコーディング（デコードできないバイトは置換する）
+        """
+        self.file_path = str(file_path)
+        self.block_chars = block_chars
+        self.read_rows = read_rows
+        self.encoding = encoding
+
+    def iter_rows(self) -> Iterator[tuple[str, pd.Series]]:
+        """read_rows 行ずつ読み込み、(ヘッダー行, CSV の1行の文字列の Series) を順に返す"""
+        reader = pd.read_csv(
+            self.file_path,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=self.read_rows,
+            encoding=self.encoding,
+            encoding_errors="replace",
+        )
+        header = None
+        for frame in reader:
+            if header is None:
+                header = ",".join(_quote_column(pd.Series(frame.columns.astype(str), dtype=str)))
+            yield header, format_csv_rows(frame)
+
+    def lazy_load(self) -> Iterator[Document]:
+        """ブロックを pandas で読み込んだ順に1つずつ返す"""
+        return self.load_rows(self.iter_rows())
+
+    def load_rows(self, row_batches: Iterable[tuple[str, pd.Series]]) -> Iterator[Document]:
+        """iter_rows と同じ形式の行（キャッシュから読み込んだ行など）をブロックにまとめて1つずつ返す
+
+        途中で行を読み込めなくなった場合は、返し終えた行を飛ばして残りを CSVLoader で返す。
+        """
+        rows_done = 0
+        try:
+            for first_row, num_rows, text in iter_row_blocks(row_batches, self.block_chars):
+                yield Document(page_content=text, metadata={"source": self.file_path, "row": first_row})
+                rows_done = first_row + num_rows
+        except Exception as e:
+            print(f"pandas で {self.file_path} を読み込めなかったため、CSVLoader で読み込みます: {e}")
+            yield from islice(CSVLoader(self.file_path).lazy_load(), rows_done, None)
@@ -0,0 +1,187 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from open_deep_researcher.retriever.local.full_text_search import content_hash
+
+
+class EmbeddingCache:
+    """(埋め込みモデル, チャンク本文のハッシュ) をキーにした永続的な埋め込みキャッシュ
+
+    ベクトルは float32 の行列として vectors.f32 に追記し、読み出しはメモリマップで行う。
+    ハッシュ -> 行番号の対応と確定済みの行数は index.sqlite に保存する。
+    同じキャッシュを複数のプロセスで共有できるよう、追記と索引の更新は vectors.lock のファイルロックを取って行う。
+    ベクトルを書き込んで fsync してから索引と行数を1つのトランザクションでコミットするため、索引が書き込まれていない
+    行を指すことはない。中断した書き込みで残った確定前の行は、次の書き込みで確定済みの行数に切り詰めて上書きする。
+    """
+
+    def __init__(self, cache_dir: str | Path, model_key: str):
+        """initialize EmbeddingCache
+
+        Args:
+            cache_dir: キャッシュのルートディレクトリ（モデルごとにサブディレクトリを作成する）
+            model_key: 埋め込みモデルを識別する文字列（例: "openai:text-embedding-3-small"）
+        """
+        self.model_key = model_key
+        self.cache_dir = Path(cache_dir) / hashlib.md5(model_key.encode()).hexdigest()[:16]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.cache_dir / "vectors.f32"
+        self.lock_path = self.cache_dir / "vectors.lock"
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_dir / "index.sqlite"), check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS vectors (hash BLOB PRIMARY KEY, row INTEGER) WITHOUT ROWID")
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('model', ?)", (model_key,))
+        self.conn.commit()
+
+        self.dimension: int | None = None
+        self._load_dimension()
+
+    def _load_dimension(self):
+        # 他のプロセスが最初のベクトルを書き込んで次元数を確定させている場合があるため、未確定なら読み直す
+        if self.dimension is None:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+            self.dimension = int(row[0]) if row else None
+
+    def _num_rows(self) -> int:
+        """索引にコミット済みの行数（行数を記録していない古いキャッシュではファイルサイズから求める）"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'rows'").fetchone()
+        if row:
+            return int(row[0])
+        if self.dimension is None or not self.vectors_path.exists():
+            return 0
+        return self.vectors_path.stat().st_size // (4 * self.dimension)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """キャッシュを共有する他のプロセスと追記を排他するファイルロック"""
+        with self.lock_path.open("ab") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def get_many(self, hashes: list[bytes]) -> dict[bytes, np.ndarray]:
+        """キャッシュにあるハッシュのベクトルを返す（ないハッシュは含まれない）"""
+        with self._lock:
+            rows: dict[bytes, int] = {}
+            it = iter(hashes)
+            # バインド変数の上限を超えないよう分けて引く
+            while chunk := list(islice(it, 500)):
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(self.conn.execute(f"SELECT hash, row FROM vectors WHERE hash IN ({placeholders})", chunk))
+
+            if not rows:
+                return {}
+            self._load_dimension()
+            matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._num_rows(), self.dimension))
+            return {digest: np.array(matrix[row]) for digest, row in rows.items()}
+
+    def put_many(self, hashes: list[bytes], vectors: list[list[float]] | np.ndarray):
+        """ベクトルをキャッシュに追加する（既にあるハッシュは無視する）"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(hashes) == 0:
+            return
+
+        with self._lock, self._file_lock():
+            self._load_dimension()
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('dimension', ?)", (str(self.dimension),))
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"埋め込みの次元数が一致しません: {vectors.shape[1]} != {self.dimension}")
+
+            # 他のプロセスが同じ本文を先に書き込んでいる場合があるため、ロックを取ってから未登録のものだけを追記する
+            existing: set[bytes] = set()
+            it = iter(hashes)
+            while chunk := list(islice(it, 500)):
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(
+                    row[0]
+                    for row in self.conn.execute(f"SELECT hash FROM vectors WHERE hash IN ({placeholders})", chunk)
+                )
+            new_rows: dict[bytes, int] = {}  # ハッシュ -> vectors の行（同じ呼び出し内の重複は最初の1つ）
+            for i, digest in enumerate(hashes):
+                if digest not in existing:
+                    new_rows.setdefault(digest, i)
+            if not new_rows:
+                self.conn.commit()
+                return
+
+            row_bytes = 4 * self.dimension
+            committed = self._num_rows()
+            with self.vectors_path.open("ab") as f:
+                # 中断した書き込みの確定前の行を切り詰め、実際の書き込み位置から行番号を決める
+                f.truncate(committed * row_bytes)
+                f.seek(0, os.SEEK_END)
+                start = f.tell() // row_bytes
+                f.write(vectors[list(new_rows.values())].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.conn.executemany(
+                "INSERT INTO vectors (hash, row) VALUES (?, ?)",
+                ((digest, start + i) for i, digest in enumerate(new_rows)),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('rows', ?)", (str(start + len(new_rows)),)
+            )
+            self.conn.commit()
+
+    def close(self):
+        """索引のコネクションを閉じる"""
+        self.conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """EmbeddingCache を通して埋め込みを計算する Embeddings
+
+    embed_documents ではキャッシュにない本文だけを batch_size 件ずつに分け、最大 max_concurrency 並列で埋め込む。
+    同じ呼び出し内で重複する本文は1回だけ埋め込む。クエリ（embed_query）はキャッシュしない。
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, batch_size: int = 256, max_concurrency: int = 4):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+        unique_texts = dict(zip(hashes, texts, strict=True))
+        vectors = self.cache.get_many(list(unique_texts))
+
+        missing = [digest for digest in unique_texts if digest not in vectors]
+        if missing:
+            batches = [missing[i : i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+
+            def embed_batch(batch: list[bytes]) -> list[list[float]]:
+                return self.embeddings.embed_documents([unique_texts[digest] for digest in batch])
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embedding") as executor:
+                for batch, embedded in zip(batches, executor.map(embed_batch, batches), strict=True):
+                    self.cache.put_many(batch, embedded)
+                    vectors.update(zip(batch, np.asarray(embedded, dtype=np.float32), strict=True))
+
+        return [vectors[digest].tolist() for digest in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
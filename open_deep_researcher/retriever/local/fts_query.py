@@ -0,0 +1,206 @@
+import re
+from dataclasses import dataclass
+
+# ひらがな・カタカナ・CJK統合漢字（拡張A、互換漢字を含む）・半角カナ・ハングル
+CJK_CHARS = "぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ가-힯"
+CJK_RUN_PATTERN = re.compile(f"[{CJK_CHARS}]+")
+
+# trigram トークナイザーで一致させられる最短の語長
+TRIGRAM_MIN_TERM_LENGTH = 3
+
+OPERATORS = {"AND", "OR", "NOT"}
+QUERY_TOKEN_PATTERN = re.compile(r'"[^"]*"?|\(|\)|[^\s()"]+')
+
+
+def cjk_bigrams(text: str | None) -> str | None:
+    """CJK文字の連続をバイグラムに分割した文字列を返す（bigram インデックスに格納するテキスト）
+
+    "機械学習の本" は "機械 械学 学習 習の の本 本" になる。末尾の1文字も単独で残し、
+    1文字の検索語を前方一致で拾えるようにする。CJK以外の文字はそのまま unicode61 に分割させる。
+    """
+    if text is None:
+        return None
+
+    def expand(match: re.Match) -> str:
+        run = match.group(0)
+        bigrams = [run[i : i + 2] for i in range(len(run) - 1)]
+        return " " + " ".join([*bigrams, run[-1]]) + " "
+
+    return CJK_RUN_PATTERN.sub(expand, text)
+
+
+@dataclass
+class Term:
+    text: str
+    prefix: bool = False
+
+
+@dataclass
+class Operation:
+    operator: str  # "AND", "OR", "NOT"（NOT は children[0] NOT children[1]）
+    children: list
+
+
+class _QueryParser:
+    """LLM が生成したクエリを寛容にパースする
+
+    不正な括弧や前後に余った演算子は読み飛ばし、隣接する語は暗黙の AND として扱う（FTS5 と同じ優先順位）。
+    """
+
+    def __init__(self, query: str):
+        self.tokens = QUERY_TOKEN_PATTERN.findall(query)
+        self.position = 0
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def parse(self) -> Term | Operation | None:
+        node = None
+        while self._peek() is not None:
+            # 対応しない閉じ括弧や余った演算子で止まった場合は読み飛ばして続ける
+            parsed = self._parse_or()
+            if parsed is None:
+                self.position += 1
+                continue
+            node = parsed if node is None else Operation("AND", [node, parsed])
+        return node
+
+    def _parse_or(self):
+        children = []
+        while True:
+            node = self._parse_and()
+            if node is not None:
+                children.append(node)
+            if self._peek() != "OR":
+                break
+            self.position += 1
+        return _combine("OR", children)
+
+    def _parse_and(self):
+        children = []
+        while True:
+            if self._peek() == "AND":
+                self.position += 1
+            token = self._peek()
+            if token is None or token in {")", "OR"}:
+                break
+            node = self._parse_not()
+            if node is None:
+                break
+            children.append(node)
+        return _combine("AND", children)
+
+    def _parse_not(self):
+        node = self._parse_primary()
+        while self._peek() == "NOT":
+            self.position += 1
+            excluded = self._parse_primary()
+            if node is not None and excluded is not None:
+                node = Operation("NOT", [node, excluded])
+        return node
+
+    def _parse_primary(self):
+        token = self._peek()
+        if token is None or token in OPERATORS or token == ")":
+            return None
+        self.position += 1
+
+        if token == "(":
+            node = self._parse_or()
+            if self._peek() == ")":
+                self.position += 1
+            return node
+
+        if token.startswith('"'):
+            text = token.strip('"').strip()
+            return Term(text) if text else None
+
+        prefix = token.endswith("*")
+        text = token.rstrip("*")
+        return Term(text, prefix=prefix) if text else None
+
+
+def _combine(operator: str, children: list):
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+    return Operation(operator, children)
+
+
+def parse_query(query: str) -> Term | Operation | None:
+    """クエリ文字列を構文木に変換する"""
+    return _QueryParser(query).parse()
+
+
+def iter_terms(node: Term | Operation | None):
+    """構文木に含まれる語を順に返す"""
+    if isinstance(node, Term):
+        yield node
+    elif isinstance(node, Operation):
+        for child in node.children:
+            yield from iter_terms(child)
+
+
+def _quote(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _compile_term(term: Term, index: str) -> str | None:
+    if index == "trigram":
+        # trigram は部分一致のため前方一致指定は不要。3文字未満の語は一致しないため除外する
+        if len(term.text) < TRIGRAM_MIN_TERM_LENGTH:
+            return None
+        return _quote(term.text)
+
+    # bigram インデックスでは語をバイグラムの連続（フレーズ）として検索する
+    tokens = []
+    for match in re.finditer(f"[{CJK_CHARS}]+|[^{CJK_CHARS}]+", term.text):
+        run = match.group(0)
+        if CJK_RUN_PATTERN.fullmatch(run) and len(run) > 1:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    phrase = _quote(" ".join(tokens))
+    single_cjk_char = len(term.text) == 1 and CJK_RUN_PATTERN.fullmatch(term.text)
+    return phrase + "*" if term.prefix or single_cjk_char else phrase
+
+
+def _compile_node(node: Term | Operation | None, index: str) -> str | None:
+    if node is None:
+        return None
+    if isinstance(node, Term):
+        return _compile_term(node, index)
+
+    children = [_compile_node(child, index) for child in node.children]
+    if node.operator == "NOT":
+        included, excluded = children
+        if included is None:
+            return None
+        return included if excluded is None else f"({included} NOT {excluded})"
+
+    children = [child for child in children if child is not None]
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+    return "(" + f" {node.operator} ".join(children) + ")"
+
+
+def compile_fts_query(query: str, bigram_index: bool = False) -> tuple[str, str | None]:
+    """LLM が生成したクエリを安全な FTS5 の MATCH 式に変換し、検索するインデックスを決める
+
+    すべての語が trigram で一致できる長さであれば trigram インデックスを使う。
+    3文字未満の語を含む場合、bigram インデックスがあればそちらで検索し、なければその語を除外する。
+
+    Args:
+        query: 検索クエリ（AND / OR / NOT / 括弧 / 引用符を含んでもよい）
+        bigram_index: bigram インデックスが利用可能かどうか
+
+    Returns:
+        (インデックス名 "trigram" または "bigram", MATCH 式。検索可能な語がない場合は None)
+    """
+    node = parse_query(query)
+    has_short_term = any(len(term.text) < TRIGRAM_MIN_TERM_LENGTH for term in iter_terms(node))
+    index = "bigram" if has_short_term and bigram_index else "trigram"
+    return index, _compile_node(node, index)
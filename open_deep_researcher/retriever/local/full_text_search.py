@@ -1,25 +1,87 @@
 import asyncio
+import hashlib
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
 import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from typing import Any
 
+import pandas as pd
 from langchain.schema import Document
-from langchain_community.document_loaders import (
-    CSVLoader,
-    PyPDFLoader,
-    TextLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+from langchain_core.document_loaders import BaseLoader
 from langsmith import traceable
 
+from open_deep_researcher.retriever.local.chunker import OffsetChunker
+from open_deep_researcher.retriever.local.csv_loader import PandasCSVLoader
+from open_deep_researcher.retriever.local.fts_query import cjk_bigrams, compile_fts_query
+from open_deep_researcher.retriever.local.pdf_loader import DEFAULT_MAX_CHARS_PER_PAGE, FastPDFLoader
+from open_deep_researcher.retriever.local.text_cache import (
+    DEFAULT_TEXT_CACHE_MAX_BYTES,
+    ExtractedTextCache,
+    file_digest,
+)
 from open_deep_researcher.utils import deduplicate_and_format_sources
 
+# トリガーの {table} / {new_content} / {old_content} は保存形式（圧縮の有無）に合わせて埋める
+INSERT_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO documents_fts(rowid, title, content, file_path, chunk_id)
+    VALUES (new.id, new.title, {new_content}, new.file_path, new.chunk_id);
+END;
+"""
+
+BIGRAM_INSERT_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS documents_bigram_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO documents_fts_bigram(rowid, title, content)
+    VALUES (new.id, cjk_bigrams(new.title), cjk_bigrams({new_content}));
+END;
+"""
+
+# 圧縮保存時にトリガーから本文を復元する式
+COMPRESSED_CONTENT_SQL = "(SELECT decompress_text(content) FROM chunk_texts WHERE hash = {row}.content_hash)"
+
+
+def compress_text(text: str) -> bytes:
+    """チャンク本文を zlib で圧縮する"""
+    return zlib.compress(text.encode())
+
+
+def decompress_text(data: bytes | None) -> str | None:
+    """compress_text で圧縮した本文を復元する"""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode()
+
+
+def content_hash(text: str) -> bytes:
+    """同一チャンクの重複を除くための本文のハッシュ"""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
 LOADER_MAPPING = {
-    ".pdf": PyPDFLoader,
+    ".pdf": FastPDFLoader,
     ".txt": TextLoader,
-    ".csv": CSVLoader,
+    ".csv": PandasCSVLoader,
 }
 
+# 抽出したテキストをキャッシュする拡張子（テキストファイルはそのまま読む方が速い）
+TEXT_CACHE_EXTENSIONS = {".pdf", ".csv"}
+
 
 def get_loader_for_extension(file_path: str | Path) -> type:
     """ファイル拡張子に基づいて適切なローダークラスを返す"""
@@ -30,6 +92,21 @@ def get_loader_for_extension(file_path: str | Path) -> type:
     return LOADER_MAPPING[ext]
 
 
+def create_loader(
+    file_path: str | Path, pdf_options: dict[str, Any] | None = None, csv_options: dict[str, Any] | None = None
+) -> BaseLoader:
+    """ファイル拡張子に基づいてローダーを作成する
+
+    PDF には pdf_options を FastPDFLoader の引数として、CSV には csv_options を PandasCSVLoader の引数として渡す。
+    """
+    loader_class = get_loader_for_extension(file_path)
+    if loader_class is FastPDFLoader:
+        return loader_class(str(file_path), **(pdf_options or {}))
+    if loader_class is PandasCSVLoader:
+        return loader_class(str(file_path), **(csv_options or {}))
+    return loader_class(str(file_path))
+
+
 async def load_document(file_path: str | Path) -> list[Document]:
     """拡張子に基づいて適切なローダーでドキュメントを読み込む"""
     path = Path(file_path)
@@ -48,6 +125,8 @@ async def load_document(file_path: str | Path) -> list[Document]:
 def chunk_documents(documents: list[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> list[Document]:
     """ドキュメントを指定されたサイズのチャンクに分割する
 
+    RecursiveCharacterTextSplitter と同じ区切り文字・同じ結果の OffsetChunker を使う。
+
     Args:
         documents: 分割するドキュメントのリスト
         chunk_size: 各チャンクの最大サイズ（文字数）
@@ -56,59 +135,532 @@ def chunk_documents(documents: list[Document], chunk_size: int = 1000, chunk_ove
     Returns:
         チャンクに分割されたドキュメントのリスト
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=[
-            "\n\n",
-            "\n",
-            " ",
-            ".",
-            ",",
-            "\u200b",  # Zero-width space
-            "\uff0c",  # Fullwidth comma
-            "\u3001",  # Ideographic comma
-            "\uff0e",  # Fullwidth full stop
-            "\u3002",  # Ideographic full stop
-            "",
-        ],
+    chunker = OffsetChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return [
+        Document(page_content=doc.page_content[start:end], metadata=dict(doc.metadata))
+        for doc in documents
+        for start, end in chunker.split_offsets(doc.page_content)
+    ]
+
+
+def load_file_documents(
+    file_path: str | Path,
+    pdf_options: dict[str, Any] | None = None,
+    text_cache_dir: str | Path | None = None,
+    csv_options: dict[str, Any] | None = None,
+) -> Iterable[Document]:
+    """ファイルをページ（CSV は行のブロック）ごとのドキュメントとして読み込む
+
+    text_cache_dir を指定した場合、PDF と CSV は抽出したテキストをファイル内容のハッシュをキーにキャッシュし、
+    同じファイルを再び読み込むときはパースせずにキャッシュから返す（メタデータは source のみ）。
+    CSV は行ごとのテキストをキャッシュし、block_chars でのブロックへのまとめ直しはキャッシュの後に行うため、
+    chunk_size を変えても同じエントリを使える。
+    """
+    path = Path(file_path)
+    if text_cache_dir is None or path.suffix.lower() not in TEXT_CACHE_EXTENSIONS:
+        return create_loader(path, pdf_options, csv_options).lazy_load()
+
+    loader_class = get_loader_for_extension(path)
+    cache = ExtractedTextCache(text_cache_dir)
+    if loader_class is PandasCSVLoader:
+        return _load_csv_documents(path, cache, csv_options)
+
+    # 抽出結果が変わるオプションだけをキーに含める（page_workers は結果に影響しない）
+    options = f"{loader_class.__name__}:{(pdf_options or {}).get('max_chars_per_page', DEFAULT_MAX_CHARS_PER_PAGE)}"
+    key = cache.make_key(file_digest(path), options)
+    pages = cache.get(key)
+    if pages is not None:
+        return [Document(page_content=page, metadata={"source": str(path)}) for page in pages]
+
+    documents = create_loader(path, pdf_options, csv_options).load()
+    cache.put(key, [doc.page_content for doc in documents])
+    return documents
+
+
+def _load_csv_documents(
+    path: Path, cache: ExtractedTextCache, csv_options: dict[str, Any] | None = None
+) -> Iterable[Document]:
+    """CSV の行をファイル内容のハッシュだけをキーにキャッシュし、キャッシュの後で行のブロックにまとめる
+
+    キャッシュのページは [ヘッダー行, 1行目, 2行目, ...]。書き込みも読み込みも pandas の読み込み単位や
+    キャッシュの展開単位ごとに行い、ファイル全体の行をメモリに持たない。pandas で読み込めない CSV はキャッシュしない。
+    """
+    loader = PandasCSVLoader(path, **(csv_options or {}))
+    key = cache.make_key(file_digest(path), "PandasCSVLoader:rows")
+    pages = cache.iter_pages(key)
+    if pages is not None:
+        return loader.load_rows(_iter_cached_csv_rows(pages))
+    return loader.load_rows(_iter_csv_rows_into_cache(loader, cache, key))
+
+
+def _iter_cached_csv_rows(pages: Iterable[list[str]]) -> Iterator[tuple[str, pd.Series]]:
+    """キャッシュしたページを PandasCSVLoader.iter_rows と同じ (ヘッダー行, 行の Series) の形式で返す"""
+    header = None
+    for batch in pages:
+        if header is None:
+            header, batch = batch[0], batch[1:]
+        yield header, pd.Series(batch, dtype=str)
+
+
+def _iter_csv_rows_into_cache(
+    loader: PandasCSVLoader, cache: ExtractedTextCache, key: str
+) -> Iterator[tuple[str, pd.Series]]:
+    """pandas で読み込んだ行を返しながらキャッシュに追記する（最後まで読み込めた場合だけエントリを作る）"""
+    with cache.writer(key) as entry:
+        header_written = False
+        for header, formatted in loader.iter_rows():
+            if not header_written:
+                entry.write([header])
+                header_written = True
+            entry.write(formatted.tolist())
+            yield header, formatted
+
+
+# ワーカーから1つのリストとして受け渡すチャンク数の上限。これを超えるファイルはこの件数ずつ一時ファイルに書き出す
+SPILL_CHUNKS = 5000
+
+
+@dataclass
+class ChunkedFile:
+    """ワーカーでチャンク化した1ファイルの結果
+
+    チャンク数が SPILL_CHUNKS 以下のファイルは chunks にそのまま持つ。超えるファイルはチャンクを
+    SPILL_CHUNKS 件ずつ pickle で spill_path に書き出し、親プロセスでは iter_batches で1バッチずつ読み込む。
+    チャンクの title には総数を含めるため、総数が分かった後の iter_batches で付ける。
+    """
+
+    file_name: str
+    num_chunks: int
+    chunks: list[dict[str, str]]
+    spill_path: str | None = None
+
+    def iter_batches(self) -> Iterator[list[dict[str, str]]]:
+        """title を付けたチャンクを最大 SPILL_CHUNKS 件ずつ返す（読み終えた一時ファイルは削除する）"""
+        if self.spill_path is None:
+            batches: Iterable[list[dict[str, str]]] = [self.chunks] if self.chunks else []
+        else:
+            batches = self._read_spill()
+        index = 0
+        for batch in batches:
+            for chunk in batch:
+                index += 1
+                chunk["title"] = f"{self.file_name} (chunk {index}/{self.num_chunks})"
+            yield batch
+
+    def _read_spill(self) -> Iterator[list[dict[str, str]]]:
+        try:
+            with open(self.spill_path, "rb") as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+        finally:
+            Path(self.spill_path).unlink(missing_ok=True)
+
+
+def load_and_chunk_file(
+    file_path: str,
+    rel_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    pdf_options: dict[str, Any] | None = None,
+    text_cache_dir: str | None = None,
+    spill_dir: str | None = None,
+) -> ChunkedFile:
+    """1つのファイルを読み込んでチャンクに分割し、挿入用のドキュメントデータを返す
+
+    プロセスプールのワーカーで実行されるため、例外はそのまま呼び出し元に送出する。
+    ページ（CSV は行のブロック）は読み込んだ順にチャンク化し、spill_dir を指定した場合は
+    ファイル全体のチャンクを1つのリストとしてメモリに持たない。
+
+    Args:
+        file_path: 読み込むファイルのパス
+        rel_path: データベースに記録する相対パス
+        chunk_size: 各チャンクの最大サイズ（文字数）
+        chunk_overlap: チャンク間のオーバーラップ（文字数）
+        pdf_options: PDF の読み込みオプション（FastPDFLoader の max_chars_per_page / page_workers）
+        text_cache_dir: 抽出したテキストのキャッシュディレクトリ（None の場合はキャッシュしない）
+        spill_dir: チャンク数が SPILL_CHUNKS を超えたときに書き出すディレクトリ（None の場合はすべてメモリに持つ）
+
+    Returns:
+        チャンク化の結果
+    """
+    # チャンクはオフセットで求め、挿入用のデータを作るときにだけ文字列にする
+    chunker = OffsetChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    # CSV は1ブロックが1チャンクに収まるよう、chunk_size 以内で行をまとめる（各ブロックにヘッダー行が付く）
+    documents = load_file_documents(file_path, pdf_options, text_cache_dir, csv_options={"block_chars": chunk_size})
+    spans = (
+        (doc.page_content, start, end) for doc in documents for start, end in chunker.split_offsets(doc.page_content)
+    )
+    chunks = (
+        {"file_path": rel_path, "content": page[start:end], "chunk_id": f"{rel_path}_{i}"}
+        for i, (page, start, end) in enumerate(spans)
     )
+    file_name = Path(file_path).name
+
+    batch = list(islice(chunks, SPILL_CHUNKS))
+    if spill_dir is None or len(batch) < SPILL_CHUNKS:
+        batch.extend(chunks)
+        return ChunkedFile(file_name, len(batch), batch)
+
+    fd, spill_path = tempfile.mkstemp(dir=spill_dir, suffix=".chunks")
+    num_chunks = 0
+    with os.fdopen(fd, "wb") as f:
+        while batch:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+            num_chunks += len(batch)
+            batch = list(islice(chunks, SPILL_CHUNKS))
+    return ChunkedFile(file_name, num_chunks, [], spill_path)
+
+
+def get_available_cpu_count() -> int:
+    """このプロセスが利用可能なCPUコア数を返す"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_parse_worker():
+    """ParsePool のワーカーの初期化
+
+    タイムアウトで強制終了（SIGTERM）されたときに、PDF のページ抽出などでワーカーが起動した子プロセスも
+    終了させてから終了する（ワーカーだけを終了すると子プロセスが残るため）。
+    """
+
+    def terminate(signum, frame):
+        for child in multiprocessing.active_children():
+            child.terminate()
+        os._exit(1)
+
+    signal.signal(signal.SIGTERM, terminate)
+
+
+def _worker_ready() -> bool:
+    """ワーカープロセスの起動を待つためのタスク"""
+    return True
+
+
+class ParsePool:
+    """ドキュメントのパースとチャンク化を行うプロセスプール
+
+    ワーカーごとに1プロセスのプールを持ち、各ワーカーは1度に1ファイルだけを実行する。
+    タイムアウトはファイルがワーカーで実行され始めてから数え、タイムアウトしたワーカーはそのプロセスだけを
+    強制終了して作り直すため、後続のファイルが応答しないワーカーの後ろで待たされることはない。
+    ワーカーがクラッシュした場合も同様に作り直して再試行する。
+    """
+
+    def __init__(self, max_workers: int, func: Callable[..., Any] = load_and_chunk_file):
+        self.max_workers = max_workers
+        self.func = func
+        self._executors: list[ProcessPoolExecutor | None] = [None] * max_workers
+        self._free: asyncio.Queue[int] = asyncio.Queue()
+        self._busy: set[int] = set()  # ファイルを実行中のワーカー
+        for index in range(max_workers):
+            self._free.put_nowait(index)
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # サーバープロセス内のスレッドを fork で複製しないよう spawn を使用する
+        return ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_init_parse_worker
+        )
+
+    async def _get_executor(self, index: int) -> ProcessPoolExecutor:
+        executor = self._executors[index]
+        if executor is None:
+            executor = self._executors[index] = self._create_pool()
+            # プロセスの起動時間をファイルのタイムアウトに含めないよう、先に起動しておく
+            await asyncio.get_running_loop().run_in_executor(executor, _worker_ready)
+        return executor
+
+    def _terminate(self, index: int):
+        """ワーカーのプロセスを強制終了する（次に使うときに作り直す）"""
+        executor = self._executors[index]
+        self._executors[index] = None
+        if executor is None:
+            return
+        # 実行中のタスクは shutdown では止まらないため、プロセスを終了させる
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, *args, timeout: float | None = None, retries: int = 1) -> Any:
+        """func をワーカーで実行する（空いているワーカーを待つ時間はタイムアウトに含めない）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            index = await self._free.get()
+            self._busy.add(index)
+            try:
+                executor = await self._get_executor(index)
+                return await asyncio.wait_for(loop.run_in_executor(executor, self.func, *args), timeout)
+            except BrokenProcessPool:
+                self._terminate(index)
+                if retries <= 0:
+                    raise
+                retries -= 1
+            except (TimeoutError, asyncio.CancelledError):
+                # ワーカーはまだファイルを処理しているため、止めてから次のファイルに使う
+                self._terminate(index)
+                raise
+            finally:
+                self._busy.discard(index)
+                self._free.put_nowait(index)
+
+    def close(self):
+        """すべてのワーカーを停止する（イベントループを止めないよう、実行中のファイルの完了は待たない）"""
+        for index, executor in enumerate(self._executors):
+            if index in self._busy:
+                self._terminate(index)
+            elif executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executors[index] = None
+
+
+@dataclass
+class IngestionProgress:
+    """ナレッジベース構築の進捗"""
+
+    files_total: int = 0
+    files_processed: int = 0
+    files_failed: int = 0
+    chunks_written: int = 0
+
+    @property
+    def fraction(self) -> float:
+        """処理済みファイルの割合（0.0〜1.0）"""
+        if self.files_total == 0:
+            return 1.0
+        return (self.files_processed + self.files_failed) / self.files_total
+
+
+def iter_document_files(doc_path: Path, enabled_files: list[str] | None = None) -> Iterator[Path]:
+    """ディレクトリ内の読み込み可能なドキュメントを順に返す（サブディレクトリは含まない）"""
+    for file_path in doc_path.glob("*"):
+        if file_path.is_file() and file_path.suffix.lower() in LOADER_MAPPING:
+            # 有効なファイルリストが指定されている場合、そのリストにあるファイルのみを処理
+            if enabled_files is None or file_path.name in enabled_files:
+                yield file_path
+
+
+async def iter_chunked_files(  # noqa: C901
+    files: Iterable[tuple[Path, str]],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    max_workers: int | None = None,
+    file_timeout: float | None = 300.0,
+    queue_size: int | None = None,
+    pdf_options: dict[str, Any] | None = None,
+    text_cache_dir: str | None = None,
+) -> AsyncIterator[tuple[str, ChunkedFile | None, str | None]]:
+    """ファイルをプロセスプールで並列にパース・チャンク化し、完了した順に結果を返す
+
+    files は必要になった時点で1件ずつ取り出す。結果キューが埋まっている間はワーカー枠が解放されず、
+    次のファイルの投入も止まるため、メモリ上に保持されるのは最大で (ワーカー数 + キューサイズ) ファイル分となる。
+    チャンク数が SPILL_CHUNKS を超えるファイルは一時ディレクトリに書き出され、ChunkedFile.iter_batches で
+    SPILL_CHUNKS 件ずつ読み込むため、1ファイルあたりのメモリも SPILL_CHUNKS 件分に抑えられる。
+
+    Args:
+        files: (ファイルパス, 相対パス) のイテラブル
+        chunk_size: 各チャンクの最大サイズ（文字数）
+        chunk_overlap: チャンク間のオーバーラップ（文字数）
+        max_workers: ワーカープロセス数（デフォルト: 利用可能なCPUコア数）
+        file_timeout: 1ファイルあたりのタイムアウト（秒）
+        queue_size: 書き込み待ちの結果を保持するキューのサイズ（デフォルト: ワーカー数）
+        pdf_options: PDF の読み込みオプション（FastPDFLoader の引数）。page_workers が None の場合は、
+            ワーカーごとのページ抽出プロセスの合計が CPU コア数を超えないよう CPU コア数 // ワーカー数 にする
+        text_cache_dir: 抽出したテキストのキャッシュディレクトリ（None の場合はキャッシュしない）
+
+    Yields:
+        (相対パス, チャンク化の結果, エラーメッセージ)。失敗したファイルは結果が None でエラーメッセージを含む
+    """
+    max_workers = max(1, max_workers or get_available_cpu_count())
+    if (pdf_options or {}).get("page_workers") is None:
+        pdf_options = {**(pdf_options or {}), "page_workers": max(1, get_available_cpu_count() // max_workers)}
+    pool = ParsePool(max_workers)
+    results: asyncio.Queue = asyncio.Queue(maxsize=queue_size or max_workers)
+    # 投入数をワーカー数に抑え、タイムアウトがキュー待ちの時間を含まないようにする
+    semaphore = asyncio.Semaphore(max_workers)
+    tasks: set[asyncio.Task] = set()
+    spill_dir = tempfile.TemporaryDirectory(prefix="chunks_")
+
+    async def process(file_path: Path, rel_path: str):
+        try:
+            try:
+                chunked = await pool.run(
+                    str(file_path),
+                    rel_path,
+                    chunk_size,
+                    chunk_overlap,
+                    pdf_options,
+                    text_cache_dir,
+                    spill_dir.name,
+                    timeout=file_timeout,
+                )
+                result = (rel_path, chunked, None)
+            except TimeoutError:
+                result = (rel_path, None, f"タイムアウトしました（{file_timeout}秒）")
+            except Exception as e:
+                result = (rel_path, None, str(e))
+            # キューが空くまで待つことでワーカー枠を保持し、上流を止める
+            await results.put(result)
+        finally:
+            semaphore.release()
+
+    async def produce():
+        try:
+            for file_path, rel_path in files:
+                await semaphore.acquire()
+                task = asyncio.create_task(process(file_path, rel_path))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            while tasks:
+                await asyncio.gather(*tasks)
+            await results.put(None)
+        except Exception as e:
+            await results.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await results.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+        pool.close()
+        spill_dir.cleanup()
+
+
+def normalize_bm25_score(bm25_score: float) -> float:
+    """FTS5 の bm25() の値を 0〜1 の関連度スコアに変換する
+
+    bm25() は関連度が高いほど小さい負の値を返すため、符号を反転した s に対して s / (1 + s) を返す。
+    Web 検索プロバイダーのスコアと同じく 1 に近いほど関連度が高い。
+    """
+    relevance = max(0.0, -bm25_score)
+    return relevance / (1.0 + relevance)
 
-    return text_splitter.split_documents(documents)
+
+def min_score_to_bm25(min_score: float) -> float:
+    """正規化スコアの下限を bm25() の値の上限に変換する（normalize_bm25_score の逆変換）"""
+    if min_score <= 0.0:
+        return float("inf")
+    if min_score >= 1.0:
+        return float("-inf")
+    return -min_score / (1.0 - min_score)
+
+
+def bm25_rank(title_weight: float, content_weight: float) -> str:
+    """FTS5 の rank 列に設定する bm25() の式（ORDER BY rank で FTS5 内の並べ替えを使うため）"""
+    return f"bm25({float(title_weight)}, {float(content_weight)})"
 
 
 class SQLiteFTSDocumentRetriever:
     """SQLite FTSを使用した全文検索レトリーバー"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, conn: sqlite3.Connection | None = None):
         """initialize SQLiteFTSDocumentRetriever
 
         Args:
             db_path: SQLiteデータベースのパス
+            conn: 既存のコネクション（コネクションプールから借りる場合など）。指定した場合 close() では閉じない
         """
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self._owns_connection = conn is None
+        self.conn = conn if conn is not None else sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
+        # bigram インデックスのトリガーと再構築で使用する
+        self.conn.create_function("cjk_bigrams", 1, cjk_bigrams, deterministic=True)
+        # 圧縮保存時の documents ビューで使用する（返す行の本文だけが復元される）
+        self.conn.create_function("decompress_text", 1, decompress_text, deterministic=True)
+        self._has_bigram_index: bool | None = None
+        self._is_compressed: bool | None = None
+
+    def has_bigram_index(self) -> bool:
+        """bigram インデックス（documents_fts_bigram）が作成されているかどうか"""
+        if self._has_bigram_index is None:
+            row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents_fts_bigram'").fetchone()
+            self._has_bigram_index = row is not None
+        return self._has_bigram_index
+
+    def is_compressed(self) -> bool:
+        """本文を圧縮・重複除去して保存しているかどうか（documents が chunk_texts を参照するビューになる）"""
+        if self._is_compressed is None:
+            row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_texts'").fetchone()
+            self._is_compressed = row is not None
+        return self._is_compressed
+
+    def _trigger_sql(self, template: str) -> str:
+        """保存形式に合わせてトリガーの対象テーブルと本文の式を埋める"""
+        if self.is_compressed():
+            return template.format(
+                table="documents_meta",
+                new_content=COMPRESSED_CONTENT_SQL.format(row="new"),
+                old_content=COMPRESSED_CONTENT_SQL.format(row="old"),
+            )
+        return template.format(table="documents", new_content="new.content", old_content="old.content")
+
+    def _compile_match(self, query: str) -> tuple[str, str | None]:
+        """クエリを MATCH 式に変換し、検索する FTS テーブル名と組で返す"""
+        index, expression = compile_fts_query(query, bigram_index=self.has_bigram_index())
+        return ("documents_fts_bigram" if index == "bigram" else "documents_fts"), expression
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        title_weight: float = 1.0,
+        content_weight: float = 1.0,
+        min_score: float = 0.0,
+    ) -> list[dict[str, Any]]:
+        """FTS検索を実行
 
-    def search(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
-        """FTS検索を実行"""
-        cursor = self.conn.cursor()
+        Args:
+            query: 検索クエリ（compile_fts_query で安全な MATCH 式に変換される）
+            limit: 返す結果の最大数
+            title_weight: BM25 のタイトル列の重み
+            content_weight: BM25 の本文列の重み
+            min_score: 正規化スコア（normalize_bm25_score）の下限。これ未満の結果は返さない
 
+        Returns:
+            検索結果のリスト（bm25_score は FTS5 の bm25() の値で、小さいほど関連度が高い）
+        """
+        table, expression = self._compile_match(query)
+        if expression is None:
+            return []
+
+        # bigram インデックスは本文を持たない（contentless）ため highlight() は使えない
+        if table == "documents_fts":
+            highlights = """
+                    highlight(documents_fts, 0, '<mark>', '</mark>') as title_highlight,
+                    highlight(documents_fts, 1, '<mark>', '</mark>') as content_highlight,"""
+        else:
+            highlights = """
+                    NULL as title_highlight,
+                    NULL as content_highlight,"""
+
+        # ORDER BY rank は FTS5 内で並べ替えるため、本文の取得（圧縮時は復元）と highlight() は返す行だけで行われる
+        cursor = self.conn.cursor()
         cursor.execute(
-            """
-            SELECT
-                file_path,
-                title,
-                content,
-                chunk_id,
-                highlight(documents_fts, 0, '<mark>', '</mark>') as title_highlight,
-                highlight(documents_fts, 1, '<mark>', '</mark>') as content_highlight
-            FROM documents_fts
-            WHERE documents_fts MATCH ?
-            ORDER BY rank
-            LIMIT ?
+            f"""
+            SELECT * FROM (
+                SELECT
+                    d.file_path,
+                    d.title,
+                    d.content,
+                    d.chunk_id,{highlights}
+                    {table}.rank as bm25_score
+                FROM {table}
+                JOIN documents d ON d.id = {table}.rowid
+                WHERE {table} MATCH ? AND {table}.rank MATCH ?
+                ORDER BY {table}.rank
+                LIMIT ?
+            )
+            WHERE bm25_score <= ?
             """,
-            (query, limit),
+            (expression, bm25_rank(title_weight, content_weight), limit, min_score_to_bm25(min_score)),
         )
 
         results = []
@@ -121,27 +673,323 @@ class SQLiteFTSDocumentRetriever:
                     "chunk_id": row["chunk_id"],
                     "title_highlight": row["title_highlight"],
                     "content_highlight": row["content_highlight"],
+                    "bm25_score": row["bm25_score"],
                 }
             )
 
         return results
 
-    def create_document_table(self):
-        """ドキュメントデータ用のテーブルとFTSインデックスを作成"""
+    def search_passages(
+        self,
+        query: str,
+        limit: int = 10,
+        window: int = 1,
+        title_weight: float = 1.0,
+        content_weight: float = 1.0,
+        min_score: float = 0.0,
+    ) -> list[dict[str, Any]]:
+        """パッセージ単位でFTS検索を実行し、ヒットしたパッセージの前後を結合して返す
+
+        本文全体の highlight() は計算せず、ヒット箇所周辺の snippet() と前後 window 件のパッセージのみを返す。
+        1ファイルのパッセージは連続した id で挿入されている前提で、id の範囲から前後のパッセージを取得する。
+
+        Args:
+            query: 検索クエリ（compile_fts_query で安全な MATCH 式に変換される）
+            limit: 返す結果の最大数
+            window: ヒットしたパッセージの前後に結合するパッセージ数
+            title_weight: BM25 のタイトル列の重み
+            content_weight: BM25 の本文列の重み
+            min_score: 正規化スコア（normalize_bm25_score）の下限。これ未満の結果は返さない
+
+        Returns:
+            検索結果のリスト（content は前後のパッセージを結合した本文、snippet はヒット箇所周辺の抜粋）
+        """
+        table, expression = self._compile_match(query)
+        if expression is None:
+            return []
+
+        # bigram インデックスは本文を持たない（contentless）ため snippet() は使えない
+        snippet = "snippet(documents_fts, 1, '<mark>', '</mark>', '…', 64)" if table == "documents_fts" else "NULL"
+
         cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT * FROM (
+                SELECT
+                    d.id,
+                    d.file_path,
+                    d.title,
+                    d.chunk_id,
+                    {snippet} as snippet,
+                    {table}.rank as bm25_score
+                FROM {table}
+                JOIN documents d ON d.id = {table}.rowid
+                WHERE {table} MATCH ? AND {table}.rank MATCH ?
+                ORDER BY {table}.rank
+                LIMIT ?
+            )
+            WHERE bm25_score <= ?
+            """,
+            (expression, bm25_rank(title_weight, content_weight), limit, min_score_to_bm25(min_score)),
+        )
 
-        # ドキュメントテーブルを作成
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT,
-            title TEXT,
-            content TEXT,
-            chunk_id TEXT
+        return self._expand_passages([dict(hit) for hit in cursor.fetchall()], window)
+
+    def _expand_passages(self, hits: list[dict[str, Any]], window: int) -> list[dict[str, Any]]:
+        """ヒットしたパッセージの前後 window 件を結合した本文を content に設定する
+
+        同じファイルで結合範囲が重なる・隣接するヒットは、順位の高いヒットの結果に範囲をまとめ、
+        同じパッセージが複数の結果に含まれないようにする。
+        """
+        groups: list[dict[str, Any]] = []  # 順位の高い順（ヒット, ファイル, 結合範囲）
+        for hit in hits:
+            file_path, start, end = hit["file_path"], hit["id"] - window, hit["id"] + window
+            merged = None
+            for group in list(groups):
+                if group["file_path"] != file_path or start > group["end"] + 1 or end < group["start"] - 1:
+                    continue
+                if merged is None:
+                    merged = group
+                else:
+                    # このヒットで2つの範囲がつながった場合は、順位の低い方を順位の高い方にまとめる
+                    groups.remove(group)
+                merged["start"], merged["end"] = (
+                    min(merged["start"], group["start"], start),
+                    max(merged["end"], group["end"], end),
+                )
+            if merged is None:
+                groups.append({"hit": hit, "file_path": file_path, "start": start, "end": end})
+
+        results = []
+        for group in groups:
+            passages = self.conn.execute(
+                "SELECT content FROM documents WHERE id BETWEEN ? AND ? AND file_path = ? ORDER BY id",
+                (group["start"], group["end"], group["file_path"]),
+            ).fetchall()
+            results.append({**group["hit"], "content": "\n".join(passage["content"] for passage in passages)})
+
+        return results
+
+    def search_many(
+        self,
+        queries: list[str],
+        limit: int = 10,
+        per_query_limit: int | None = None,
+        rrf_k: int = 60,
+        window: int | None = None,
+        title_weight: float = 1.0,
+        content_weight: float = 1.0,
+        min_score: float = 0.0,
+    ) -> list[dict[str, Any]]:
+        """複数のクエリを1つのSQL文で検索し、Reciprocal Rank Fusion で統合した結果を返す
+
+        クエリごとの上位 per_query_limit 件を UNION ALL でまとめ、チャンクごとに
+        sum(1 / (rrf_k + 順位)) を計算して重複を除いた上位 limit 件を返す。
+
+        Args:
+            queries: 検索クエリのリスト（それぞれ compile_fts_query で MATCH 式に変換される）
+            limit: 返す結果の最大数
+            per_query_limit: 各クエリで統合対象とする上位件数（デフォルト: limit）
+            rrf_k: RRF の定数 k
+            window: 指定した場合は passage モードとして前後 window 件のパッセージを結合し、
+                search_passages と同じくヒット箇所周辺の snippet を付けて返す
+            title_weight: BM25 のタイトル列の重み
+            content_weight: BM25 の本文列の重み
+            min_score: 正規化スコア（normalize_bm25_score）の下限。これ未満の結果は統合前に除外する
+
+        Returns:
+            検索結果のリスト（rrf_score の降順。bm25_score は一致したクエリのうち最良の値）
+        """
+        max_bm25 = min_score_to_bm25(min_score)
+        branches, params = [], []
+        for query in queries:
+            table, expression = self._compile_match(query)
+            if expression is None:
+                continue
+            # passage モードではヒット箇所周辺の snippet() を返す。bigram インデックスは本文を持たないため使えない
+            if window is not None and table == "documents_fts":
+                snippet = "snippet(documents_fts, 1, '<mark>', '</mark>', '…', 64)"
+            else:
+                snippet = "NULL"
+            # ORDER BY rank は FTS5 内で並べ替えるため、snippet() は各クエリの上位の行だけで計算される
+            branches.append(
+                f"""
+                SELECT id, bm25_score, snippet, row_number() OVER (ORDER BY bm25_score) AS query_rank
+                FROM (
+                    SELECT rowid AS id, {table}.rank AS bm25_score, {snippet} AS snippet
+                    FROM {table}
+                    WHERE {table} MATCH ? AND {table}.rank MATCH ?
+                    ORDER BY {table}.rank
+                    LIMIT ?
+                )
+                WHERE bm25_score <= ?
+                """
+            )
+            params.extend([expression, bm25_rank(title_weight, content_weight), per_query_limit or limit, max_bm25])
+
+        if not branches:
+            return []
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            WITH hits AS ({" UNION ALL ".join(branches)}),
+            fused AS (
+                SELECT
+                    id,
+                    SUM(1.0 / (? + query_rank)) AS rrf_score,
+                    -- MIN() と同時に選択した snippet は、bm25_score が最良のクエリの行の値になる
+                    MIN(bm25_score) AS bm25_score,
+                    snippet,
+                    COUNT(*) AS matched_queries
+                FROM hits
+                GROUP BY id
+                ORDER BY rrf_score DESC, bm25_score
+                LIMIT ?
+            )
+            SELECT
+                d.id,
+                d.file_path,
+                d.title,
+                d.content,
+                d.chunk_id,
+                fused.rrf_score,
+                fused.bm25_score,
+                fused.matched_queries,
+                fused.snippet
+            FROM fused
+            JOIN documents d ON d.id = fused.id
+            ORDER BY fused.rrf_score DESC, fused.bm25_score
+            """,
+            (*params, rrf_k, limit),
         )
-        """)
 
-        # FTSテーブルを作成
+        results = [dict(row) for row in cursor.fetchall()]
+        if window is not None:
+            return self._expand_passages(results, window)
+        for result in results:
+            del result["snippet"]
+        return results
+
+    def search_query_hits(
+        self,
+        queries: list[str],
+        per_query_limit: int = 10,
+        title_weight: float = 1.0,
+        content_weight: float = 1.0,
+        min_score: float = 0.0,
+        snippet: bool = False,
+    ) -> list[list[dict[str, Any]]]:
+        """クエリごとの上位 per_query_limit 件のヒットを、統合せずにそれぞれ返す
+
+        シャードに分割したインデックスで、全シャードのヒットをまとめてから RRF で統合するために使う。
+        本文は返さないため、統合後に get_results で取得する。
+
+        Returns:
+            queries と同じ順のリスト。各要素は id, file_path, bm25_score, snippet を持つヒットの BM25 の昇順のリスト
+        """
+        max_bm25 = min_score_to_bm25(min_score)
+        query_hits = []
+        for query in queries:
+            table, expression = self._compile_match(query)
+            if expression is None:
+                query_hits.append([])
+                continue
+            snippet_sql = (
+                "snippet(documents_fts, 1, '<mark>', '</mark>', '…', 64)"
+                if snippet and table == "documents_fts"
+                else "NULL"
+            )
+            cursor = self.conn.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT
+                        d.id,
+                        d.file_path,
+                        {snippet_sql} AS snippet,
+                        {table}.rank AS bm25_score
+                    FROM {table}
+                    JOIN documents d ON d.id = {table}.rowid
+                    WHERE {table} MATCH ? AND {table}.rank MATCH ?
+                    ORDER BY {table}.rank
+                    LIMIT ?
+                )
+                WHERE bm25_score <= ?
+                """,
+                (expression, bm25_rank(title_weight, content_weight), per_query_limit, max_bm25),
+            )
+            query_hits.append([dict(row) for row in cursor.fetchall()])
+        return query_hits
+
+    def get_results(self, hits: list[dict[str, Any]], window: int | None = None) -> list[dict[str, Any]]:
+        """search_query_hits のヒットに title, chunk_id と本文を付けて、検索結果として返す
+
+        window を指定した場合は search_passages と同じく前後 window 件のパッセージを結合する。
+        """
+        if not hits:
+            return []
+        columns = "id, title, chunk_id" if window is not None else "id, title, content, chunk_id"
+        placeholders = ", ".join("?" for _ in hits)
+        rows = {
+            row["id"]: dict(row)
+            for row in self.conn.execute(
+                f"SELECT {columns} FROM documents WHERE id IN ({placeholders})", [hit["id"] for hit in hits]
+            )
+        }
+        results = [{**hit, **rows[hit["id"]]} for hit in hits if hit["id"] in rows]
+        if window is not None:
+            return self._expand_passages(results, window)
+        return results
+
+    def create_document_table(self, bigram_index: bool = False, compress_content: bool = False):
+        """ドキュメントデータ用のテーブルとFTSインデックスを作成
+
+        Args:
+            bigram_index: trigram インデックスに加えて、3文字未満の語やCJKの短い語を検索するための
+                unicode61 + CJKバイグラムのインデックス（documents_fts_bigram）を作成する
+            compress_content: チャンク本文を zlib で圧縮し、同一の本文をハッシュで重複除去して chunk_texts に保存する。
+                documents は本文を復元するビューになり、検索では返す行の本文だけが復元される
+        """
+        cursor = self.conn.cursor()
+
+        # ドキュメントテーブルを作成
+        if compress_content:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_texts (
+                hash BLOB PRIMARY KEY,
+                content BLOB NOT NULL
+            ) WITHOUT ROWID
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS documents_meta (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT,
+                title TEXT,
+                content_hash BLOB,
+                chunk_id TEXT
+            )
+            """)
+
+            cursor.execute("""
+            CREATE VIEW IF NOT EXISTS documents AS
+            SELECT m.id, m.file_path, m.title, decompress_text(t.content) AS content, m.chunk_id
+            FROM documents_meta m
+            JOIN chunk_texts t ON t.hash = m.content_hash
+            """)
+            self._is_compressed = True
+        else:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT,
+                title TEXT,
+                content TEXT,
+                chunk_id TEXT
+            )
+            """)
+
+        # FTSテーブルを作成（圧縮時は documents ビューを外部コンテンツとして参照する）
         cursor.execute("""
         CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
             title,
@@ -155,54 +1003,167 @@ class SQLiteFTSDocumentRetriever:
         """)
 
         # FTSテーブル更新用のトリガーを作成
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
-            INSERT INTO documents_fts(rowid, title, content, file_path, chunk_id)
-            VALUES (new.id, new.title, new.content, new.file_path, new.chunk_id);
-        END;
-        """)
+        cursor.execute(self._trigger_sql(INSERT_TRIGGER_SQL))
 
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+        cursor.execute(
+            self._trigger_sql("""
+        CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON {table} BEGIN
             INSERT INTO documents_fts(documents_fts, rowid, title, content, file_path, chunk_id)
-            VALUES('delete', old.id, old.title, old.content, old.file_path, old.chunk_id);
+            VALUES('delete', old.id, old.title, {old_content}, old.file_path, old.chunk_id);
         END;
         """)
+        )
 
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+        cursor.execute(
+            self._trigger_sql("""
+        CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON {table} BEGIN
             INSERT INTO documents_fts(documents_fts, rowid, title, content, file_path, chunk_id)
-            VALUES('delete', old.id, old.title, old.content, old.file_path, old.chunk_id);
+            VALUES('delete', old.id, old.title, {old_content}, old.file_path, old.chunk_id);
             INSERT INTO documents_fts(rowid, title, content, file_path, chunk_id)
-            VALUES (new.id, new.title, new.content, new.file_path, new.chunk_id);
+            VALUES (new.id, new.title, {new_content}, new.file_path, new.chunk_id);
         END;
         """)
+        )
+
+        if bigram_index:
+            # CJK をバイグラムに分割したテキストのみを索引する contentless テーブル（本文は documents から取得する）
+            cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts_bigram USING fts5(
+                title,
+                content,
+                content='',
+                tokenize='unicode61'
+            )
+            """)
+
+            cursor.execute(self._trigger_sql(BIGRAM_INSERT_TRIGGER_SQL))
+
+            cursor.execute(
+                self._trigger_sql("""
+            CREATE TRIGGER IF NOT EXISTS documents_bigram_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO documents_fts_bigram(documents_fts_bigram, rowid, title, content)
+                VALUES('delete', old.id, cjk_bigrams(old.title), cjk_bigrams({old_content}));
+            END;
+            """)
+            )
+
+            cursor.execute(
+                self._trigger_sql("""
+            CREATE TRIGGER IF NOT EXISTS documents_bigram_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO documents_fts_bigram(documents_fts_bigram, rowid, title, content)
+                VALUES('delete', old.id, cjk_bigrams(old.title), cjk_bigrams({old_content}));
+                INSERT INTO documents_fts_bigram(rowid, title, content)
+                VALUES (new.id, cjk_bigrams(new.title), cjk_bigrams({new_content}));
+            END;
+            """)
+            )
+            self._has_bigram_index = True
 
         self.conn.commit()
 
-    def insert_documents(self, documents: list[dict[str, str]]):
+    def insert_documents(self, documents: Iterable[dict[str, str]], batch_size: int = 5000):
         """ドキュメントデータをデータベースに挿入
 
         Args:
             documents: ドキュメントデータのリスト（各要素はファイルパス、タイトル、コンテンツ、チャンクIDを含む）
+            batch_size: 1回の executemany で挿入する行数
         """
+        if self.is_compressed():
+            self._insert_compressed_documents(documents, batch_size)
+            return
+
         cursor = self.conn.cursor()
 
-        for doc in documents:
-            cursor.execute(
+        rows = ((doc["file_path"], doc["title"], doc["content"], doc["chunk_id"]) for doc in documents)
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(
                 """
                 INSERT INTO documents (file_path, title, content, chunk_id)
                 VALUES (?, ?, ?, ?)
                 """,
-                (
-                    doc["file_path"],
-                    doc["title"],
-                    doc["content"],
-                    doc["chunk_id"],
-                ),
+                batch,
             )
+            self.conn.commit()
 
+    def _insert_compressed_documents(self, documents: Iterable[dict[str, str]], batch_size: int):
+        """本文を圧縮して chunk_texts に、メタデータを documents_meta に挿入する（同一の本文は1回だけ保存）"""
+        cursor = self.conn.cursor()
+
+        documents = iter(documents)
+        while batch := list(islice(documents, batch_size)):
+            texts: dict[bytes, str] = {}
+            rows = []
+            for doc in batch:
+                digest = content_hash(doc["content"])
+                texts.setdefault(digest, doc["content"])
+                rows.append((doc["file_path"], doc["title"], digest, doc["chunk_id"]))
+
+            # 以前のバッチで保存済みの本文は圧縮しない（バインド変数の上限を超えないよう分けて確認する）
+            digests = list(texts)
+            stored = set()
+            for start in range(0, len(digests), 500):
+                chunk = digests[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                stored.update(
+                    row[0]
+                    for row in cursor.execute(f"SELECT hash FROM chunk_texts WHERE hash IN ({placeholders})", chunk)
+                )
+            cursor.executemany(
+                "INSERT INTO chunk_texts (hash, content) VALUES (?, ?)",
+                ((digest, compress_text(text)) for digest, text in texts.items() if digest not in stored),
+            )
+            cursor.executemany(
+                """
+                INSERT INTO documents_meta (file_path, title, content_hash, chunk_id)
+                VALUES (?, ?, ?, ?)
+                """,
+                rows,
+            )
+            self.conn.commit()
+
+    @contextmanager
+    def bulk_load(self):
+        """一括取り込みモード
+
+        取り込み中は WAL と synchronous=OFF を使用し、FTS の挿入トリガーを外しておく。
+        終了時にトリガーを戻し、FTS インデックスを一度だけ rebuild して optimize でセグメントをマージした後、
+        ジャーナル設定を開始前の値（WAL のデータベースなら WAL のまま）に戻す。bigram インデックスは contentless のため rebuild の代わりに全件を再投入する。
+        """
+        cursor = self.conn.cursor()
+        journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("DROP TRIGGER IF EXISTS documents_ai")
+        cursor.execute("DROP TRIGGER IF EXISTS documents_bigram_ai")
         self.conn.commit()
+        try:
+            yield self
+        finally:
+            cursor.execute(self._trigger_sql(INSERT_TRIGGER_SQL))
+            cursor.execute("INSERT INTO documents_fts(documents_fts) VALUES('rebuild')")
+            cursor.execute("INSERT INTO documents_fts(documents_fts) VALUES('optimize')")
+            if self.has_bigram_index():
+                cursor.execute(self._trigger_sql(BIGRAM_INSERT_TRIGGER_SQL))
+                cursor.execute("INSERT INTO documents_fts_bigram(documents_fts_bigram) VALUES('delete-all')")
+                cursor.execute("""
+                INSERT INTO documents_fts_bigram(rowid, title, content)
+                SELECT id, cjk_bigrams(title), cjk_bigrams(content) FROM documents
+                """)
+                cursor.execute("INSERT INTO documents_fts_bigram(documents_fts_bigram) VALUES('optimize')")
+            self.conn.commit()
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={int(synchronous)}")
+
+    def bulk_insert_documents(self, documents: Iterable[dict[str, str]], batch_size: int = 50000):
+        """大量のドキュメントを一括取り込みモードで挿入
+
+        Args:
+            documents: ドキュメントデータのイテラブル
+            batch_size: 1トランザクションで挿入する行数
+        """
+        with self.bulk_load():
+            self.insert_documents(documents, batch_size=batch_size)
 
     def get_db_stats(self) -> dict[str, Any]:
         """データベースの統計情報を取得
@@ -222,90 +1183,434 @@ class SQLiteFTSDocumentRetriever:
 
     def close(self):
         """データベース接続を閉じる"""
-        self.conn.close()
+        if self._owns_connection:
+            self.conn.close()
+
+
+class ConnectionPool:
+    """1つのデータベースに対する読み取り専用コネクションのプール
+
+    コネクションはスレッド間で使い回すため check_same_thread=False で開き、同時に1スレッドだけが使用する。
+    """
+
+    def __init__(self, db_path: str, max_connections: int = 8):
+        self.db_path = db_path
+        self._idle: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """プールからコネクションを借りる（上限に達している場合は返却を待つ）"""
+        with self._semaphore:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        """待機中のコネクションをすべて閉じる"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_connection_pools: dict[str, ConnectionPool] = {}
+_connection_pools_lock = threading.Lock()
+_search_executor: ThreadPoolExecutor | None = None
+
+
+def get_connection_pool(db_path: str | Path) -> ConnectionPool:
+    """データベースパスごとのコネクションプールを取得"""
+    key = str(Path(db_path).resolve())
+    with _connection_pools_lock:
+        if key not in _connection_pools:
+            _connection_pools[key] = ConnectionPool(key)
+        return _connection_pools[key]
+
+
+def close_connection_pool(db_path: str | Path):
+    """データベースパスのコネクションプールを閉じる（データベースを削除・再作成する前に呼ぶ）"""
+    key = str(Path(db_path).resolve())
+    with _connection_pools_lock:
+        pool = _connection_pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """FTS検索専用のスレッドプールを取得"""
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = ThreadPoolExecutor(thread_name_prefix="fts-search")
+    return _search_executor
+
+
+def search_with_pool(
+    db_path: str | Path,
+    query: str | list[str],
+    limit: int = 10,
+    retrieval_mode: str = "chunk",
+    **search_kwargs,
+) -> list[dict[str, Any]]:
+    """コネクションプールのコネクションを使ってFTS検索を実行（ブロッキング）
+
+    query がリストの場合は search_many、retrieval_mode が "passage" の場合は search_passages、
+    それ以外は search を使用する。
+    """
+    with get_connection_pool(db_path).connection() as conn:
+        retriever = SQLiteFTSDocumentRetriever(str(db_path), conn=conn)
+        if isinstance(query, list):
+            return retriever.search_many(query, limit=limit, **search_kwargs)
+        if retrieval_mode == "passage":
+            return retriever.search_passages(query, limit=limit, **search_kwargs)
+        return retriever.search(query, limit=limit, **search_kwargs)
+
+
+def get_shard_paths(db_path: str | Path, num_shards: int = 1) -> list[Path]:
+    """シャードのデータベースパスを返す（num_shards が1以下の場合は db_path そのもの）"""
+    db_path = Path(db_path)
+    if num_shards <= 1:
+        return [db_path]
+    return [db_path.with_name(f"{db_path.stem}.shard{i}{db_path.suffix}") for i in range(num_shards)]
+
+
+def shard_for_file(rel_path: str, num_shards: int) -> int:
+    """ファイルの相対パスのハッシュからシャード番号を決める（プロセスをまたいでも同じ値になる）"""
+    digest = hashlib.md5(rel_path.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def remove_knowledge_base(db_path: str | Path, num_shards: int = 1):
+    """データベースとシャードのコネクションプールを閉じてファイルを削除する"""
+    for path in {Path(db_path), *get_shard_paths(db_path, num_shards)}:
+        close_connection_pool(path)  # 削除前の古いファイルを読み続けないよう閉じておく
+        path.unlink(missing_ok=True)
+
+
+def merge_shard_results(shard_results: list[list[dict[str, Any]]], limit: int) -> list[dict[str, Any]]:
+    """1つのクエリのシャードごとの上位結果を BM25 の昇順で統合して上位 limit 件を返す
+
+    BM25 の語の統計（IDF・平均の長さ）はシャードごとに計算されるため、分割しないインデックスとは
+    スコアが少しずれるが、ファイルのハッシュで分割していればシャード間の統計はほぼ揃う。
+    """
+    results = [result for results in shard_results for result in results]
+    results.sort(key=lambda result: result["bm25_score"])
+    return results[:limit]
+
+
+def fuse_query_hits(
+    query_hits: list[list[dict[str, Any]]], limit: int, per_query_limit: int, rrf_k: int = 60
+) -> list[dict[str, Any]]:
+    """クエリごとのヒットを Reciprocal Rank Fusion で統合する（search_many と同じ計算）
+
+    query_hits[i] はクエリ i の全シャードのヒット（shard と id でチャンクを区別する）。
+    クエリごとに BM25 の昇順で並べ直して上位 per_query_limit 件に全体での順位を付け、
+    チャンクごとに sum(1 / (rrf_k + 順位)) を計算する。シャード内の順位ではなく全体の順位を使うため、
+    各シャードの1位が BM25 の強さに関係なく同じスコアになることはない。
+
+    Returns:
+        rrf_score の降順の上位 limit 件（bm25_score と snippet は一致したクエリのうち最良のもの）
+    """
+    fused: dict[tuple[int, int], dict[str, Any]] = {}
+    for hits in query_hits:
+        ranked = sorted(hits, key=lambda hit: hit["bm25_score"])[:per_query_limit]
+        for query_rank, hit in enumerate(ranked, start=1):
+            key = (hit["shard"], hit["id"])
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**hit, "rrf_score": 0.0, "matched_queries": 0}
+            elif hit["bm25_score"] < entry["bm25_score"]:
+                entry["bm25_score"], entry["snippet"] = hit["bm25_score"], hit.get("snippet")
+            entry["rrf_score"] += 1.0 / (rrf_k + query_rank)
+            entry["matched_queries"] += 1
+
+    results = sorted(fused.values(), key=lambda entry: (-entry["rrf_score"], entry["bm25_score"]))
+    return results[:limit]
+
+
+def search_hits_with_pool(db_path: str | Path, queries: list[str], **search_kwargs) -> list[list[dict[str, Any]]]:
+    """コネクションプールのコネクションで search_query_hits を実行（ブロッキング）"""
+    with get_connection_pool(db_path).connection() as conn:
+        return SQLiteFTSDocumentRetriever(str(db_path), conn=conn).search_query_hits(queries, **search_kwargs)
+
+
+def get_results_with_pool(
+    db_path: str | Path, hits: list[dict[str, Any]], window: int | None = None
+) -> list[dict[str, Any]]:
+    """コネクションプールのコネクションで get_results を実行（ブロッキング）"""
+    with get_connection_pool(db_path).connection() as conn:
+        return SQLiteFTSDocumentRetriever(str(db_path), conn=conn).get_results(hits, window)
+
+
+class ShardedFTSWriter:
+    """ファイルのハッシュで分割した N 個の SQLite FTS シャードに並列に書き込むライター
+
+    SQLite は1ファイルにつき1ライターのため、シャードごとに専用のライタースレッドを持たせて書き込みを並列化する。
+    コネクションはシャードのスレッドで作成・使用し、1ファイルのチャンクは同じシャードに連続して挿入される。
+
+    Usage:
+        async with ShardedFTSWriter(db_path, num_shards=4) as writer:
+            await writer.add(rel_path, chunks)
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        num_shards: int = 1,
+        bigram_index: bool = False,
+        compress_content: bool = False,
+        batch_size: int = 10000,
+        max_pending_batches: int = 2,
+    ):
+        self.shard_paths = get_shard_paths(db_path, num_shards)
+        self.bigram_index = bigram_index
+        self.compress_content = compress_content
+        # シャード全体でバッファするチャンク数がおおよそ batch_size に収まるようにする
+        self.batch_size = max(1, batch_size // len(self.shard_paths))
+        self.max_pending_batches = max_pending_batches
+
+        num = len(self.shard_paths)
+        self._executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fts-shard{i}") for i in range(num)]
+        self._retrievers: list[SQLiteFTSDocumentRetriever | None] = [None] * num
+        self._bulk_loads = [ExitStack() for _ in range(num)]
+        self._buffers: list[list[dict[str, str]]] = [[] for _ in range(num)]
+        self._pending: list[deque[Future]] = [deque() for _ in range(num)]
+        self._chunks_written = [0] * num
+
+    @property
+    def chunks_written(self) -> int:
+        """挿入が完了したチャンク数"""
+        return sum(self._chunks_written)
+
+    def _open_shard(self, index: int):
+        retriever = SQLiteFTSDocumentRetriever(str(self.shard_paths[index]))
+        retriever.create_document_table(bigram_index=self.bigram_index, compress_content=self.compress_content)
+        self._bulk_loads[index].enter_context(retriever.bulk_load())
+        self._retrievers[index] = retriever
+
+    def _insert_shard(self, index: int, documents: list[dict[str, str]]):
+        self._retrievers[index].insert_documents(documents, batch_size=len(documents))
+        self._chunks_written[index] += len(documents)
+
+    def _close_shard(self, index: int):
+        try:
+            self._bulk_loads[index].close()  # トリガーを戻して FTS インデックスを再構築する
+        finally:
+            if self._retrievers[index] is not None:
+                self._retrievers[index].close()
+
+    async def _run(self, index: int, func: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self._executors[index].submit(func, index, *args))
+
+    async def __aenter__(self) -> "ShardedFTSWriter":
+        try:
+            await asyncio.gather(*(self._run(index, self._open_shard) for index in range(len(self.shard_paths))))
+        except BaseException:
+            await self._shutdown()
+            raise
+        return self
+
+    async def add(self, rel_path: str, chunks: list[dict[str, str]]):
+        """ファイルのチャンクを担当シャードのバッファに追加し、バッファが溜まったら書き込みを依頼する
+
+        シャードの未完了バッチが max_pending_batches に達している場合は、最も古いバッチの完了を待つ。
+        """
+        index = shard_for_file(rel_path, len(self.shard_paths))
+        self._buffers[index].extend(chunks)
+        if len(self._buffers[index]) >= self.batch_size:
+            await self._flush(index)
+
+    async def _flush(self, index: int):
+        pending = self._pending[index]
+        while len(pending) >= self.max_pending_batches:
+            await asyncio.wrap_future(pending.popleft())
+
+        documents, self._buffers[index] = self._buffers[index], []
+        if documents:
+            pending.append(self._executors[index].submit(self._insert_shard, index, documents))
+
+    async def _drain(self, index: int):
+        await self._flush(index)
+        while self._pending[index]:
+            await asyncio.wrap_future(self._pending[index].popleft())
+
+    async def _shutdown(self):
+        # すべてのシャードを並列に閉じ（インデックスの再構築も並列になる）、最初のエラーを送出する
+        results = await asyncio.gather(
+            *(self._run(index, self._close_shard) for index in range(len(self.shard_paths))),
+            return_exceptions=True,
+        )
+        for executor in self._executors:
+            executor.shutdown()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await asyncio.gather(*(self._drain(index) for index in range(len(self.shard_paths))))
+        finally:
+            # シャードのスレッドは投入順に処理するため、書き込み中のバッチが終わってから閉じられる
+            await self._shutdown()
 
 
 @traceable
-async def initialize_knowledge_base(
+async def initialize_knowledge_base(  # noqa: C901
     local_document_path: str | Path,
     db_path: str | Path,
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
     enabled_files: list[str] | None = None,
+    max_workers: int | None = None,
+    file_timeout: float | None = 300.0,
+    batch_size: int = 10000,
+    progress_callback: Callable[[IngestionProgress], None] | None = None,
+    retrieval_mode: str = "chunk",
+    passage_size: int = 1000,
+    bigram_index: bool = False,
+    num_shards: int = 1,
+    compress_content: bool = False,
+    tfidf_index: bool = False,
+    lsa_components: int = 0,
+    pdf_max_chars_per_page: int | None = DEFAULT_MAX_CHARS_PER_PAGE,
+    pdf_page_workers: int | None = None,
+    text_cache_dir: str | Path | None = None,
+    text_cache_max_bytes: int | None = DEFAULT_TEXT_CACHE_MAX_BYTES,
     **kwargs,
 ) -> Any | None:
     """指定されたディレクトリ内のドキュメントを処理してFTSデータベースを作成
 
+    ファイルの列挙 → 読み込み → チャンク化 → バッチ挿入をストリームで処理するため、
+    メモリ使用量はコーパス全体ではなくバッチサイズと同時処理ファイル数で決まる。
+
     Args:
         local_document_path: ドキュメントが含まれるディレクトリ
         db_path: SQLiteデータベースを保存するパス（デフォルト: None、指定されない場合は一時ファイルを使用）
         chunk_size: 各チャンクの最大サイズ（文字数）
         chunk_overlap: チャンク間のオーバーラップ（文字数）
         enabled_files: 有効なファイル名のリスト（指定された場合はそのファイルのみ処理）
+        max_workers: パース・チャンク化に使用するワーカープロセス数（デフォルト: 利用可能なCPUコア数）
+        file_timeout: 1ファイルあたりのパース・チャンク化のタイムアウト（秒）
+        batch_size: 1回の挿入でまとめるチャンク数
+        progress_callback: ファイルの処理が終わるたびに IngestionProgress を受け取るコールバック
+        retrieval_mode: "chunk"（chunk_size のチャンクを索引）または "passage"（passage_size の小さなパッセージを索引）
+        passage_size: passage モードで索引するパッセージの最大サイズ（文字数、オーバーラップなし）
+        bigram_index: 3文字未満の語を検索できる unicode61 + CJKバイグラムのインデックスも作成する
+        num_shards: ファイルのハッシュで分割するシャード数（2以上で db_path の隣にシャードのファイルを作成し、並列に書き込む）
+        compress_content: チャンク本文を zlib で圧縮し、同一の本文を重複除去して保存する
+        tfidf_index: 取り込み後に tfidf プロバイダー用の TF-IDF インデックスを db_path の隣に作成する
+        lsa_components: TF-IDF インデックスに LSA ベクトルも作成する場合の次元数（0 の場合は作成しない）
+        pdf_max_chars_per_page: PDF の1ページあたりの最大文字数（None の場合は制限しない）
+        pdf_page_workers: 大きな PDF のページを並列に抽出するワーカープロセス数
+            （デフォルト: CPU コア数 // max_workers。max_workers がデフォルトの場合は 1 でファイル単位でのみ並列化する）
+        text_cache_dir: PDF・CSV から抽出したテキストのキャッシュディレクトリ（チャンク設定を変えても再パースしない。None で無効）
+        text_cache_max_bytes: 取り込み後にテキストのキャッシュを削減する合計サイズの上限（None の場合は削減しない）
 
     Returns:
-        データベースパスまたは処理に失敗した場合はNone
+        データベースパスまたは処理に失敗した場合はNone（シャードを使う場合も db_path を返す）
     """
+    if retrieval_mode == "passage":
+        # 検索時に前後のパッセージを結合するため、オーバーラップは付けない
+        chunk_size, chunk_overlap = passage_size, 0
+
     # Pathオブジェクトに変換
     doc_path = Path(local_document_path)
     db_path = Path(db_path)
 
-    db_path.unlink(missing_ok=True)  # 常に新しく作成するため
+    remove_knowledge_base(db_path, num_shards)  # 常に新しく作成するため
     db_path.parent.mkdir(parents=True, exist_ok=True)
 
     print(f"データベースパス: {db_path}")
     print(f"チャンクサイズ: {chunk_size}, オーバーラップ: {chunk_overlap}")
+    if num_shards > 1:
+        print(f"シャード数: {num_shards}")
     if enabled_files:
         print(f"有効なファイル数: {len(enabled_files)}")
 
     try:
-        # レトリーバーを初期化
-        retriever = SQLiteFTSDocumentRetriever(str(db_path))
-        retriever.create_document_table()
-
-        # ディレクトリ内のすべてのドキュメントを収集
-        all_files = []
-        for file_path in doc_path.glob("*"):  # sub directories are not included
-            if file_path.is_file() and file_path.suffix.lower() in LOADER_MAPPING:
-                # 有効なファイルリストが指定されている場合、そのリストにあるファイルのみを処理
-                if enabled_files is None or file_path.name in enabled_files:
-                    all_files.append(file_path)
-
-        if not all_files:
+        # 進捗の母数を得るためにファイル数だけ先に数える
+        progress = IngestionProgress(files_total=sum(1 for _ in iter_document_files(doc_path, enabled_files)))
+        if progress.files_total == 0:
             print("読み込み可能なドキュメントが見つかりません。")
             return None
 
-        # 各ファイルを処理
-        documents_to_insert = []
-        total_chunks = 0
-
-        for file_path in all_files:
-            rel_path = str(file_path.relative_to(doc_path))
-            print(f"ドキュメントを処理中: {rel_path}")
-
-            # ドキュメントを読み込む
-            docs = await load_document(file_path)
-            chunked_docs = chunk_documents(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-            for i, chunk in enumerate(chunked_docs):
-                chunk_id = f"{rel_path}_{i}"
-
-                # ドキュメントデータを作成
-                doc_data = {
-                    "file_path": rel_path,
-                    "title": f"{file_path.name} (chunk {i + 1}/{len(chunked_docs)})",
-                    "content": chunk.page_content,
-                    "chunk_id": chunk_id,
-                }
-                documents_to_insert.append(doc_data)
-                total_chunks += 1
-
-        # ドキュメントをデータベースに挿入
-        if documents_to_insert:
-            retriever.insert_documents(documents_to_insert)
-            print(f"{len(all_files)}個のファイルから{total_chunks}個のチャンクを処理しました。")
+        files = (
+            (file_path, str(file_path.relative_to(doc_path)))
+            for file_path in iter_document_files(doc_path, enabled_files)
+        )
+        failed_files = []
+
+        # 各ファイルをプロセスプールで並列に処理し、シャードごとのライタースレッドでバッチ挿入する
+        async with ShardedFTSWriter(
+            db_path,
+            num_shards=num_shards,
+            bigram_index=bigram_index,
+            compress_content=compress_content,
+            batch_size=batch_size,
+        ) as writer:
+            async for rel_path, chunked, error in iter_chunked_files(
+                files,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                max_workers=max_workers,
+                file_timeout=file_timeout,
+                pdf_options={"max_chars_per_page": pdf_max_chars_per_page, "page_workers": pdf_page_workers},
+                text_cache_dir=str(text_cache_dir) if text_cache_dir else None,
+            ):
+                if error is not None:
+                    print(f"エラー: {rel_path}の読み込み中に問題が発生しました: {error}")
+                    failed_files.append(rel_path)
+                    progress.files_failed += 1
+                else:
+                    print(f"ドキュメントを処理しました: {rel_path} ({chunked.num_chunks}チャンク)")
+                    progress.files_processed += 1
+                    # 大きなファイルも SPILL_CHUNKS 件ずつライターに渡す
+                    for chunks in chunked.iter_batches():
+                        await writer.add(rel_path, chunks)
+
+                progress.chunks_written = writer.chunks_written
+                if progress_callback is not None:
+                    progress_callback(progress)
+
+        progress.chunks_written = writer.chunks_written
+        if progress_callback is not None:
+            progress_callback(progress)
+
+        print(f"{progress.files_processed}個のファイルから{progress.chunks_written}個のチャンクを処理しました。")
+        if failed_files:
+            print(f"処理に失敗したファイル: {', '.join(failed_files)}")
+
+        if text_cache_dir and text_cache_max_bytes is not None:
+            # 編集されたファイルの古いエントリなどが溜まり続けないよう、使われていないエントリから削除する
+            removed = await asyncio.to_thread(ExtractedTextCache(text_cache_dir).prune, text_cache_max_bytes)
+            if removed:
+                print(f"テキストのキャッシュから{removed}個のエントリを削除しました。")
+
+        if tfidf_index:
+            # 循環インポートを避けるためここでインポートする
+            from open_deep_researcher.retriever.local.tfidf_search import build_tfidf_index
+
+            await asyncio.to_thread(
+                build_tfidf_index,
+                db_path,
+                num_shards=num_shards,
+                lsa_components=lsa_components,
+                max_workers=max_workers,
+            )
 
-        retriever.close()
         return str(db_path)
 
     except Exception as e:
@@ -317,25 +1622,141 @@ async def initialize_knowledge_base(
 
 
 @traceable
+async def search_shards_many(
+    shard_paths: list[Path],
+    queries: list[str],
+    limit: int,
+    per_query_limit: int,
+    rrf_k: int = 60,
+    window: int | None = None,
+    **search_kwargs,
+) -> list[dict[str, Any]]:
+    """複数のクエリで全シャードを検索し、RRF で統合した上位 limit 件を返す
+
+    各シャードからクエリごとの生のヒット（BM25 スコア）を集め、fuse_query_hits で1回だけ RRF を計算する。
+    その後、選ばれたヒットの本文（passage モードでは前後のパッセージ）をそれぞれのシャードから取得する。
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_search_executor()
+    shard_hits = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                executor,
+                partial(
+                    search_hits_with_pool,
+                    shard_path,
+                    queries,
+                    per_query_limit=per_query_limit,
+                    snippet=window is not None,
+                    **search_kwargs,
+                ),
+            )
+            for shard_path in shard_paths
+        )
+    )
+    query_hits = [
+        [{**hit, "shard": shard} for shard, hits in enumerate(shard_hits) for hit in hits[i]]
+        for i in range(len(queries))
+    ]
+    fused = fuse_query_hits(query_hits, limit, per_query_limit, rrf_k)
+
+    # 本文はヒットが選ばれたシャードからだけ取得する（ファイルは1つのシャードにあるため、パッセージの結合もシャード内で行える）
+    by_shard: dict[int, list[dict[str, Any]]] = {}
+    for hit in fused:
+        by_shard.setdefault(hit["shard"], []).append(hit)
+    shard_results = await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, get_results_with_pool, shard_paths[shard], hits, window)
+            for shard, hits in by_shard.items()
+        )
+    )
+    results = [result for results in shard_results for result in results]
+    results.sort(key=lambda result: (-result["rrf_score"], result["bm25_score"]))
+    for result in results:
+        del result["shard"]
+        if window is None:
+            del result["snippet"]
+    return results
+
+
 async def search_local_documents(
-    query: str,
+    query: str | list[str],
     db_path: str | Path,
     top_k: int = 5,
+    title_weight: float = 1.0,
+    content_weight: float = 1.0,
+    min_score: float = 0.0,
+    retrieval_mode: str = "chunk",
+    passage_window: int = 1,
+    rrf_k: int = 60,
+    num_shards: int = 1,
     **kwargs,
 ):
     """SQLite FTSを使用してローカルドキュメントを検索
 
+    query にリストを渡した場合は、すべてのクエリを1つのSQL文で検索し、RRF で統合・重複除去した
+    最大 top_k * クエリ数 件の結果を1つの検索結果として返す。
+    シャードに分割したインデックスでは、すべてのシャードをスレッドで並行して検索し、1つのクエリの結果は
+    BM25 で、複数のクエリの結果はクエリごとに全シャードのヒットを並べ直してから RRF で統合する（search_shards_many）。
+
     Args:
-        query: 検索クエリ
+        query: 検索クエリ、または検索クエリのリスト
         db_path: SQLiteデータベースへのパス
         top_k: 返す結果の数（デフォルト: 5）
+        title_weight: BM25 のタイトル列の重み
+        content_weight: BM25 の本文列の重み
+        min_score: 正規化スコアの下限（これ未満の弱い一致は結果に含めない）
+        retrieval_mode: "chunk" または "passage"（initialize_knowledge_base と同じ値を指定する）
+        passage_window: passage モードでヒットの前後に結合するパッセージ数
+        rrf_k: 複数クエリの結果を統合する RRF の定数 k
+        num_shards: インデックスのシャード数（initialize_knowledge_base と同じ値を指定する）
 
     Returns:
         検索結果のリスト
     """
+    search_kwargs = {"window": passage_window} if retrieval_mode == "passage" else {}
+    limit = top_k
+    if isinstance(query, list):
+        search_kwargs.update(per_query_limit=top_k, rrf_k=rrf_k)
+        limit = top_k * len(query)
+    query_label = " | ".join(query) if isinstance(query, list) else query
+    shard_paths = get_shard_paths(db_path, num_shards)
     try:
-        retriever = SQLiteFTSDocumentRetriever(str(db_path))
-        results = retriever.search(query, limit=top_k)
+        # イベントループを止めないよう、プールしたコネクションで専用スレッドプール上で検索する
+        loop = asyncio.get_running_loop()
+        if isinstance(query, list) and len(shard_paths) > 1:
+            results = await search_shards_many(
+                shard_paths,
+                query,
+                limit=limit,
+                per_query_limit=top_k,
+                rrf_k=rrf_k,
+                window=search_kwargs.get("window"),
+                title_weight=title_weight,
+                content_weight=content_weight,
+                min_score=min_score,
+            )
+        else:
+            shard_results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        get_search_executor(),
+                        partial(
+                            search_with_pool,
+                            shard_path,
+                            query,
+                            limit=limit,
+                            title_weight=title_weight,
+                            content_weight=content_weight,
+                            min_score=min_score,
+                            retrieval_mode=retrieval_mode,
+                            **search_kwargs,
+                        ),
+                    )
+                    for shard_path in shard_paths
+                )
+            )
+            results = merge_shard_results(shard_results, limit)
 
         formatted_results = []
         for doc in results:
@@ -346,16 +1767,16 @@ async def search_local_documents(
                 {
                     "title": f"{doc['title']}{chunk_info}",
                     "url": doc["file_path"],  # ファイルパスをURLとして使用
-                    "content": doc["content_highlight"] if "content_highlight" in doc else doc["content"],
-                    "score": 1.0,  # FTSはスコアを返さないため固定値
+                    "content": doc.get("snippet") or doc.get("content_highlight") or doc["content"],
+                    "score": normalize_bm25_score(doc["bm25_score"]),
                     "raw_content": doc["content"],
+                    "chunk_id": doc.get("chunk_id"),
                 }
             )
 
-        retriever.close()
         return [
             {
-                "query": query,
+                "query": query_label,
                 "follow_up_questions": None,
                 "answer": None,
                 "images": [],
@@ -366,7 +1787,7 @@ async def search_local_documents(
         print(f"ローカルドキュメント検索中にエラーが発生しました: {e}")
         return [
             {
-                "query": query,
+                "query": query_label,
                 "follow_up_questions": None,
                 "answer": None,
                 "images": [],
@@ -382,6 +1803,13 @@ async def local_search(
     db_path: str | Path | None = None,
     top_k: int = 5,
     max_tokens_per_source: int = 8192,
+    title_weight: float = 1.0,
+    content_weight: float = 1.0,
+    min_score: float = 0.0,
+    retrieval_mode: str = "chunk",
+    passage_window: int = 1,
+    rrf_k: int = 60,
+    num_shards: int = 1,
     **kwargs,
 ) -> str:
     """SQLite FTSを使用してローカルドキュメントを検索
@@ -391,29 +1819,28 @@ async def local_search(
         db_path: SQLiteデータベースへのパス
         top_k: 返す上位結果の数（デフォルト: 5）
         max_tokens_per_source: ソースあたりの最大トークン数
+        title_weight: BM25 のタイトル列の重み
+        content_weight: BM25 の本文列の重み
+        min_score: 正規化スコアの下限（これ未満の弱い一致はプロンプトに含めない）
+        retrieval_mode: "chunk" または "passage"（initialize_knowledge_base と同じ値を指定する）
+        passage_window: passage モードでヒットの前後に結合するパッセージ数
+        rrf_k: クエリ間の結果を統合する RRF の定数 k
+        num_shards: インデックスのシャード数（initialize_knowledge_base と同じ値を指定する）
 
     Returns:
         検索結果の文字列
     """
-    search_docs = []
-    for query in query_list:
-        try:
-            result = await search_local_documents(
-                query,
-                db_path,
-                top_k=top_k,
-            )
-            search_docs.extend(result)
-        except Exception as e:
-            print(f"クエリ '{query}'のローカル検索中にエラーが発生しました: {str(e)}")
-            search_docs.append(
-                {
-                    "query": query,
-                    "follow_up_questions": None,
-                    "answer": None,
-                    "images": [],
-                    "results": [],
-                    "error": str(e),
-                }
-            )
+    # すべてのクエリを1つのSQL文で検索し、RRF で統合・重複除去する（1回の呼び出しにつき1往復）
+    search_docs = await search_local_documents(
+        query_list,
+        db_path,
+        top_k=top_k,
+        title_weight=title_weight,
+        content_weight=content_weight,
+        min_score=min_score,
+        retrieval_mode=retrieval_mode,
+        passage_window=passage_window,
+        rrf_k=rrf_k,
+        num_shards=num_shards,
+    )
     return deduplicate_and_format_sources(search_docs, max_tokens_per_source=max_tokens_per_source)
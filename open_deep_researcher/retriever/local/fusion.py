@@ -0,0 +1,19 @@
+from typing import Any
+
+
+def reciprocal_rank_fusion(ranked_lists: list[list[dict]], rrf_k: int = 60) -> list[dict]:
+    """複数の順位付きリストを Reciprocal Rank Fusion で統合する
+
+    結果は chunk_id（なければ url と content）で同一視し、sum(1 / (rrf_k + 順位)) の降順で返す。
+    同じ結果が複数のリストにある場合は、先に渡したリストの結果を残す。
+    """
+    fused: dict[Any, dict] = {}
+    scores: dict[Any, float] = {}
+    for ranked in ranked_lists:
+        for rank, result in enumerate(ranked, start=1):
+            key = result.get("chunk_id") or (result["url"], result["content"])
+            fused.setdefault(key, result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+
+    keys = sorted(scores, key=scores.get, reverse=True)
+    return [{**fused[key], "score": scores[key]} for key in keys]
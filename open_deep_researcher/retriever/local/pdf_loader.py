@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+# 1ページあたりの最大文字数（図面や埋め込みデータで異常に長いページがチャンク数を膨らませないようにする）
+DEFAULT_MAX_CHARS_PER_PAGE = 50_000
+
+# このページ数以上の PDF はページ範囲に分けて複数プロセスで抽出する
+PARALLEL_MIN_PAGES = 200
+
+# 1ワーカーに割り当てる最小ページ数（プロセス起動とファイルを開くコストを償却するため）
+MIN_PAGES_PER_WORKER = 100
+
+
+def extract_page_range(file_path: str, start: int, end: int, max_chars_per_page: int | None = None) -> list[str]:
+    """PyMuPDF で [start, end) のページのテキストを抽出する（ワーカープロセスで実行）
+
+    PyMuPDF のドキュメントはスレッドセーフではないため、ワーカーごとにファイルを開き直す。
+    """
+    import pymupdf
+
+    with pymupdf.open(file_path) as doc:
+        texts = []
+        for page_number in range(start, end):
+            text = doc[page_number].get_text()
+            texts.append(text[:max_chars_per_page] if max_chars_per_page else text)
+        return texts
+
+
+class FastPDFLoader(BaseLoader):
+    """PyMuPDF で PDF を読み込むローダー（PyPDFLoader と同じく1ページを1ドキュメントとして返す）
+
+    PARALLEL_MIN_PAGES 以上の大きな PDF はページ範囲に分けて複数プロセスで抽出する。
+    PyMuPDF で読み込めない場合は PyPDFLoader にフォールバックする。
+    """
+
+    def __init__(
+        self,
+        file_path: str | Path,
+        max_chars_per_page: int | None = DEFAULT_MAX_CHARS_PER_PAGE,
+        page_workers: int | None = None,
+        parallel_min_pages: int = PARALLEL_MIN_PAGES,
+    ):
+        """initialize FastPDFLoader
+
+        Args:
+            file_path: PDF ファイルのパス
+            max_chars_per_page: 1ページあたりの最大文字数（None の場合は制限しない）
+            page_workers: ページ抽出に使用するワーカープロセス数（デフォルト: ページ数と利用可能なCPUコア数から決める。1 で並列化しない）。
+                取り込み（iter_chunked_files）では CPU コア数 // ファイルのワーカー数 が渡される
+            parallel_min_pages: 並列に抽出する PDF の最小ページ数
+        """
+        self.file_path = str(file_path)
+        self.max_chars_per_page = max_chars_per_page
+        self.page_workers = page_workers
+        self.parallel_min_pages = parallel_min_pages
+
+    def _num_workers(self, page_count: int) -> int:
+        if page_count < self.parallel_min_pages:
+            return 1
+        if self.page_workers is not None:
+            return max(1, self.page_workers)
+        cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        return max(1, min(cpu_count, page_count // MIN_PAGES_PER_WORKER))
+
+    def _extract_with_pymupdf(self) -> list[str]:
+        import pymupdf
+
+        with pymupdf.open(self.file_path) as doc:
+            page_count = doc.page_count
+        num_workers = self._num_workers(page_count)
+        if num_workers == 1:
+            return extract_page_range(self.file_path, 0, page_count, self.max_chars_per_page)
+
+        # ページ範囲を均等に分け、ページ順に結合する
+        bounds = [page_count * i // num_workers for i in range(num_workers + 1)]
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(extract_page_range, self.file_path, start, end, self.max_chars_per_page)
+                for start, end in zip(bounds, bounds[1:], strict=False)
+            ]
+            return [text for future in futures for text in future.result()]
+
+    def lazy_load(self) -> Iterator[Document]:
+        try:
+            texts = self._extract_with_pymupdf()
+        except Exception as e:
+            print(f"PyMuPDF で {self.file_path} を読み込めなかったため、pypdf で読み込みます: {e}")
+            for doc in PyPDFLoader(self.file_path).lazy_load():
+                if self.max_chars_per_page:
+                    doc.page_content = doc.page_content[: self.max_chars_per_page]
+                yield doc
+            return
+
+        for page_number, text in enumerate(texts):
+            yield Document(
+                page_content=text,
+                metadata={"source": self.file_path, "page": page_number, "total_pages": len(texts)},
+            )
@@ -0,0 +1,194 @@
+import codecs
+import hashlib
+import os
+import tempfile
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+# キャッシュの形式やテキスト抽出の方法を変えた場合は上げる（古いエントリは使われなくなる）
+TEXT_CACHE_VERSION = 1
+
+# 取り込み後に削減するキャッシュの合計サイズの上限
+DEFAULT_TEXT_CACHE_MAX_BYTES = 2 * 1024**3
+
+
+def file_digest(file_path: str | Path, block_size: int = 1 << 20) -> str:
+    """ファイルの内容のハッシュ（16バイトの blake2b の16進文字列）"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with Path(file_path).open("rb") as f:
+        while block := f.read(block_size):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class CacheEntryWriter:
+    """ExtractedTextCache.writer が返す、エントリにページを追記するライター"""
+
+    def __init__(self, text_file: BinaryIO, offsets_file: BinaryIO):
+        self.text_file = text_file
+        self.offsets_file = offsets_file
+        self.compressor = zlib.compressobj()
+        self.num_chars = 0
+
+    def write(self, pages: list[str]):
+        """ページを追記する（各ページの開始位置をサイドカーに、本文を圧縮して本文のファイルに書き込む）"""
+        if not pages:
+            return
+        lengths = np.fromiter((len(page) for page in pages), dtype="<i8", count=len(pages))
+        starts = np.concatenate([[0], np.cumsum(lengths[:-1])]).astype("<i8") + self.num_chars
+        self.offsets_file.write(starts.tobytes())
+        self.text_file.write(self.compressor.compress("".join(pages).encode()))
+        self.num_chars += int(lengths.sum())
+
+    def close(self):
+        self.text_file.write(self.compressor.flush())
+
+
+def _iter_entry_pages(text_file: BinaryIO, offsets: np.ndarray, read_size: int) -> Iterator[list[str]]:
+    """圧縮した本文を read_size ずつ展開し、開始位置 offsets で区切ったページのリストを順に返す"""
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""  # 展開済みでまだページとして返していないテキスト（先頭は文字位置 base）
+    base = 0
+    page = 0
+    with text_file:
+        while page < len(offsets):
+            # 展開後のサイズも read_size の数倍までに抑える（圧縮率の高いテキストでもメモリを使いすぎない）
+            data = decompressor.unconsumed_tail or text_file.read(read_size)
+            final = not data
+            raw = decompressor.flush() if final else decompressor.decompress(data, 4 * read_size)
+            if final and not decompressor.eof:
+                raise zlib.error("キャッシュの本文が途中で切れています")
+            buffer += decoder.decode(raw, final=final)
+
+            pages = []
+            end = base + len(buffer)
+            while page + 1 < len(offsets) and offsets[page + 1] <= end:
+                pages.append(buffer[offsets[page] - base : offsets[page + 1] - base])
+                page += 1
+            if final:
+                pages.append(buffer[offsets[page] - base :])
+                page += 1
+            elif page < len(offsets):
+                cut = int(offsets[page]) - base
+                buffer, base = buffer[cut:], base + cut
+            if pages:
+                yield pages
+
+
+class ExtractedTextCache:
+    """ファイルから抽出したテキストを、(ファイル内容のハッシュ, 抽出オプション) をキーに保存するキャッシュ
+
+    ページ（CSV は行）ごとのテキストを連結して zlib で圧縮した {key}.txt.z と、
+    各ページの開始位置（文字オフセット、int64）を並べた {key}.offsets をサイドカーとして保存する。
+    チャンクの設定を変えても、パースをやり直さずにキャッシュしたテキストから再チャンク化できる。
+
+    writer で行のバッチごとに追記し、iter_pages で少しずつ展開して読むため、大きな CSV でも全体をメモリに持たない。
+    複数のワーカープロセスから同時に書き込まれるため、一時ファイルに書いてから os.replace で置き換える。
+    サイドカーを先に置き、本文のファイルの存在をエントリの完成とみなす。
+    ファイルを編集するとキーが変わり古いエントリが残るため、取り込みの後に prune で合計サイズを上限以下に保つ
+    （読み込んだエントリは本文のファイルの更新日時を更新し、最も長く使われていないエントリから削除する）。
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, digest: str, options: str = "") -> str:
+        """ファイル内容のハッシュと抽出オプションからキーを作る"""
+        return hashlib.blake2b(f"{TEXT_CACHE_VERSION}:{digest}:{options}".encode(), digest_size=16).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.txt.z", directory / f"{key}.offsets"
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator["CacheEntryWriter"]:
+        """ページを少しずつ追記してエントリを作る（with を正常に抜けたときだけエントリを置き換える）"""
+        text_path, offsets_path = self._paths(key)
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_paths = []
+        try:
+            files = []
+            for path in (text_path, offsets_path):
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+                tmp_paths.append(tmp_path)
+                files.append(os.fdopen(fd, "wb"))
+            with files[0] as text_file, files[1] as offsets_file:
+                entry = CacheEntryWriter(text_file, offsets_file)
+                yield entry
+                entry.close()
+            os.replace(tmp_paths[1], offsets_path)
+            os.replace(tmp_paths[0], text_path)
+        except BaseException:
+            for tmp_path in tmp_paths:
+                Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def iter_pages(self, key: str, read_size: int = 1 << 20) -> Iterator[list[str]] | None:
+        """キャッシュしたページを少しずつ展開し、ページのリストを順に返す（ない場合は None）
+
+        本文は read_size バイトずつ展開するため、ファイル全体のテキストをメモリに持たない。
+        途中で壊れていることが分かった場合は zlib.error / UnicodeDecodeError を送出する。
+        """
+        text_path, offsets_path = self._paths(key)
+        try:
+            # 本文のファイルの存在がエントリの完成を表すため、サイドカーより先に開く
+            text_file = text_path.open("rb")
+        except FileNotFoundError:
+            return None
+        try:
+            offsets = np.fromfile(offsets_path, dtype="<i8")
+            os.utime(text_path)  # prune で最近使われたエントリを残すため
+        except FileNotFoundError:
+            text_file.close()
+            return None
+        return _iter_entry_pages(text_file, offsets, read_size)
+
+    def get(self, key: str) -> list[str] | None:
+        """キャッシュしたページごとのテキストを返す（ない場合は None）"""
+        batches = self.iter_pages(key)
+        if batches is None:
+            return None
+        try:
+            return [page for pages in batches for page in pages]
+        except (zlib.error, UnicodeDecodeError):
+            return None
+
+    def put(self, key: str, pages: list[str]):
+        """ページごとのテキストを保存する"""
+        with self.writer(key) as entry:
+            entry.write(pages)
+
+    def prune(self, max_bytes: int) -> int:
+        """合計サイズが max_bytes 以下になるまで、最も長く使われていないエントリから削除する
+
+        Returns:
+            削除したエントリの数
+        """
+        entries = []
+        for text_path in self.cache_dir.glob("*/*.txt.z"):
+            offsets_path = text_path.with_name(text_path.name.removesuffix(".txt.z") + ".offsets")
+            try:
+                stat = text_path.stat()
+                size = stat.st_size + (offsets_path.stat().st_size if offsets_path.exists() else 0)
+            except FileNotFoundError:
+                continue  # 他のプロセスが削除した
+            entries.append((stat.st_mtime, size, text_path, offsets_path))
+
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for _, size, text_path, offsets_path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= max_bytes:
+                break
+            # 本文を先に消し、読み込み中のプロセスには未完成のエントリに見えるようにする
+            text_path.unlink(missing_ok=True)
+            offsets_path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import multiprocessing
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from langsmith import traceable
+
+from open_deep_researcher.retriever.local.fts_query import cjk_bigrams
+from open_deep_researcher.retriever.local.full_text_search import (
+    SQLiteFTSDocumentRetriever,
+    get_available_cpu_count,
+    get_connection_pool,
+    get_search_executor,
+    get_shard_paths,
+)
+from open_deep_researcher.retriever.local.fusion import reciprocal_rank_fusion
+from open_deep_researcher.utils import deduplicate_and_format_sources
+
+# cjk_bigrams で CJK をバイグラムに分割してから単語を取り出す（英数字は単語、CJK はバイグラム）
+TOKEN_PATTERN = re.compile(r"\w+")
+
+DEFAULT_NUM_FEATURES = 2**20
+
+
+def tokenize(text: str) -> list[str]:
+    """TF-IDF 用に分割する（英数字は小文字の単語、CJK は文字バイグラム）"""
+    return TOKEN_PATTERN.findall(cjk_bigrams(text.lower()))
+
+
+def hash_terms(text: str, num_features: int) -> tuple[np.ndarray, np.ndarray]:
+    """テキストの語をハッシュで特徴番号に変換し、(特徴番号, サブリニアな語頻度 1 + log(tf)) を返す
+
+    語彙を保存しないよう feature hashing を使う。crc32 を使うためプロセスをまたいでも同じ番号になる。
+    """
+    features: Counter[int] = Counter()
+    for term, count in Counter(tokenize(text)).items():
+        features[zlib.crc32(term.encode()) % num_features] += count
+    terms = np.fromiter(features.keys(), dtype=np.int32, count=len(features))
+    counts = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+    return terms, 1.0 + np.log(counts)
+
+
+def vectorize_texts(texts: list[str], num_features: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """チャンクのリストを CSR 形式の (行ごとの要素数, 特徴番号, 語頻度) に変換する（ワーカープロセスで実行）"""
+    vectors = [hash_terms(text or "", num_features) for text in texts]
+    lengths = np.array([len(terms) for terms, _ in vectors], dtype=np.int64)
+    if not vectors:
+        return lengths, np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    return (
+        lengths,
+        np.concatenate([terms for terms, _ in vectors]),
+        np.concatenate([weights for _, weights in vectors]),
+    )
+
+
+def get_tfidf_index_dir(db_path: str | Path) -> Path:
+    """FTSデータベースに対応する TF-IDF インデックスのディレクトリ"""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}.tfidf")
+
+
+def _iter_chunk_batches(db_path: str | Path, num_shards: int, batch_size: int) -> Iterator[tuple[int, list, list]]:
+    """シャードごとに (シャード番号, ドキュメントID のリスト, 本文のリスト) をバッチで返す"""
+    for shard, shard_path in enumerate(get_shard_paths(db_path, num_shards)):
+        retriever = SQLiteFTSDocumentRetriever(str(shard_path))
+        try:
+            cursor = retriever.conn.execute("SELECT id, content FROM documents ORDER BY id")
+            while batch := cursor.fetchmany(batch_size):
+                yield shard, [row["id"] for row in batch], [row["content"] for row in batch]
+        finally:
+            retriever.close()
+
+
+def _build_lsa(index_dir: Path, meta: dict[str, Any], lsa_components: int, lsa_max_features: int):
+    """TF-IDF 行列を頻出語に絞って特異値分解し、チャンクの LSA ベクトルと射影行列を保存する（scipy が必要）"""
+    try:
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import svds
+    except ImportError:
+        print("scipy がインストールされていないため、LSA は作成しません。")
+        return
+
+    indptr = np.load(index_dir / "indptr.npy", mmap_mode="r")
+    df = np.diff(indptr)
+    features = np.sort(np.argsort(df)[::-1][: min(lsa_max_features, int(np.count_nonzero(df)))])
+    k = min(lsa_components, len(features) - 1, meta["num_rows"] - 1)
+    if k < 1:
+        print("チャンクまたは語が少ないため、LSA は作成しません。")
+        return
+
+    matrix = csc_matrix(
+        (
+            np.load(index_dir / "data.npy", mmap_mode="r"),
+            np.load(index_dir / "indices.npy", mmap_mode="r"),
+            indptr,
+        ),
+        shape=(meta["num_rows"], meta["num_features"]),
+    )[:, features]
+    u, s, vt = svds(matrix.astype(np.float32), k=k)
+    documents = u * s
+    norms = np.linalg.norm(documents, axis=1, keepdims=True)
+    documents = np.divide(documents, norms, out=np.zeros_like(documents), where=norms > 0)
+
+    np.save(index_dir / "lsa_features.npy", features.astype(np.int32))
+    np.save(index_dir / "lsa_components.npy", vt.T.astype(np.float32))
+    np.save(index_dir / "lsa_documents.npy", documents.astype(np.float32))
+    meta["lsa_components"] = int(k)
+
+
+def build_tfidf_index(  # noqa: C901
+    db_path: str | Path,
+    num_shards: int = 1,
+    num_features: int = DEFAULT_NUM_FEATURES,
+    lsa_components: int = 0,
+    lsa_max_features: int = 50000,
+    batch_size: int = 2000,
+    max_workers: int | None = None,
+) -> Path:
+    """FTSデータベースのチャンクから TF-IDF インデックスを作成してディスクに保存する
+
+    チャンクを語ごとの転置リスト（CSC: indptr / indices / data）としてメモリマップ可能な .npy に保存するため、
+    検索時はクエリの語の列だけを読み、行列とクエリベクトルの積でスコアを計算できる。
+
+    1. チャンクを batch_size 件ずつワーカープロセスで語頻度に変換し、終わったバッチから CSR の一時ファイルに追記する
+       （読み込み済みで未完了のバッチは最大 2 * ワーカー数 件のため、チャンク数によらずメモリ使用量は一定）
+    2. 文書頻度から idf を計算し、各行を tf-idf にして L2 正規化しながら CSC に並べ替える
+    3. lsa_components を指定した場合は LSA ベクトルも作成する（scipy が必要）
+
+    Args:
+        db_path: FTSデータベースのパス
+        num_shards: FTSデータベースのシャード数
+        num_features: feature hashing の次元数
+        lsa_components: LSA の次元数（0 の場合は作成しない）
+        lsa_max_features: LSA に使用する語の数（文書頻度の高い順）
+        batch_size: 1回のワーカー呼び出しで変換するチャンク数
+        max_workers: 変換に使用するワーカープロセス数（デフォルト: 利用可能なCPUコア数）
+
+    Returns:
+        インデックスのディレクトリ
+    """
+    index_dir = get_tfidf_index_dir(db_path)
+    close_tfidf_index(db_path)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    index_dir.mkdir(parents=True)
+
+    lengths_path, terms_path, weights_path = (index_dir / name for name in ("csr_lengths", "csr_terms", "csr_weights"))
+    row_shards, row_ids = [], []
+
+    # 1. 語頻度への変換。未完了のバッチを最大 2 * ワーカー数 件に抑え、終わった順に書き込む
+    #    （行の順は書き込んだ順になるため、row_shards / row_ids も書き込み時に追加する）
+    num_workers = max(1, max_workers or get_available_cpu_count())
+    max_pending = 2 * num_workers
+    executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        batches = _iter_chunk_batches(db_path, num_shards, batch_size)
+        pending: dict[Future, tuple[int, list[int]]] = {}
+
+        with (
+            lengths_path.open("wb") as lengths_file,
+            terms_path.open("wb") as terms_file,
+            weights_path.open("wb") as weights_file,
+        ):
+            while True:
+                for shard, ids, texts in islice(batches, max_pending - len(pending)):
+                    pending[executor.submit(vectorize_texts, texts, num_features)] = (shard, ids)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    lengths, terms, weights = future.result()
+                    shard, ids = pending.pop(future)
+                    row_shards.extend([shard] * len(ids))
+                    row_ids.extend(ids)
+                    lengths_file.write(lengths.tobytes())
+                    terms_file.write(terms.tobytes())
+                    weights_file.write(weights.tobytes())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    num_rows = len(row_ids)
+    np.save(index_dir / "row_shards.npy", np.array(row_shards, dtype=np.int16))
+    np.save(index_dir / "row_ids.npy", np.array(row_ids, dtype=np.int64))
+
+    lengths = np.fromfile(lengths_path, dtype=np.int64)
+    csr_indptr = np.concatenate([[0], np.cumsum(lengths)])
+    nnz = int(csr_indptr[-1])
+    csr_terms = np.memmap(terms_path, dtype=np.int32, mode="r", shape=(nnz,)) if nnz else np.empty(0, np.int32)
+    csr_weights = np.memmap(weights_path, dtype=np.float32, mode="r", shape=(nnz,)) if nnz else np.empty(0, np.float32)
+
+    # 2. idf と CSC への並べ替え（行のブロックごとに処理し、メモリ使用量を抑える）
+    df = np.zeros(num_features, dtype=np.int64)
+    step = 10_000_000
+    for start in range(0, nnz, step):
+        df += np.bincount(csr_terms[start : start + step], minlength=num_features)
+    idf = (np.log((1 + num_rows) / (1 + df)) + 1).astype(np.float32)
+    csc_indptr = np.concatenate([[0], np.cumsum(df)])
+
+    indices = np.lib.format.open_memmap(index_dir / "indices.npy", mode="w+", dtype=np.int32, shape=(nnz,))
+    data = np.lib.format.open_memmap(index_dir / "data.npy", mode="w+", dtype=np.float32, shape=(nnz,))
+    cursor = csc_indptr[:-1].copy()
+
+    row_start = 0
+    rows_per_block = 50_000
+    while row_start < num_rows:
+        row_end = min(row_start + rows_per_block, num_rows)
+        begin, end = csr_indptr[row_start], csr_indptr[row_end]
+        terms = np.asarray(csr_terms[begin:end])
+        local_rows = np.repeat(np.arange(row_end - row_start), lengths[row_start:row_end])
+        values = csr_weights[begin:end] * idf[terms]
+
+        norms = np.sqrt(np.bincount(local_rows, weights=values.astype(np.float64) ** 2, minlength=row_end - row_start))
+        values = (values / np.where(norms > 0, norms, 1.0)[local_rows]).astype(np.float32)
+
+        # 語ごとに、その語の列の書き込み位置（cursor）から行の順に並べる
+        order = np.argsort(terms, kind="stable")
+        sorted_terms = terms[order]
+        rank_in_term = np.arange(len(sorted_terms)) - np.searchsorted(sorted_terms, sorted_terms, side="left")
+        positions = cursor[sorted_terms] + rank_in_term
+        indices[positions] = local_rows[order] + row_start
+        data[positions] = values[order]
+        cursor += np.bincount(terms, minlength=num_features)
+        row_start = row_end
+
+    indices.flush()
+    data.flush()
+    del indices, data, csr_terms, csr_weights
+    np.save(index_dir / "indptr.npy", csc_indptr)
+    np.save(index_dir / "idf.npy", idf)
+    for path in (lengths_path, terms_path, weights_path):
+        path.unlink()
+
+    meta = {"num_rows": num_rows, "num_features": num_features, "nnz": nnz, "lsa_components": 0}
+
+    # 3. LSA
+    if lsa_components > 0 and num_rows > 0:
+        _build_lsa(index_dir, meta, lsa_components, lsa_max_features)
+
+    (index_dir / "meta.json").write_text(json.dumps(meta))
+    print(f"TF-IDF インデックスを作成しました: {num_rows}チャンク, 非ゼロ要素 {nnz}")
+    return index_dir
+
+
+class TfidfIndex:
+    """build_tfidf_index で作成した TF-IDF インデックス（配列はメモリマップで読み込む）"""
+
+    def __init__(self, index_dir: str | Path):
+        self.index_dir = Path(index_dir)
+        self.meta = json.loads((self.index_dir / "meta.json").read_text())
+        self.num_rows = self.meta["num_rows"]
+        self.num_features = self.meta["num_features"]
+
+        def load(name: str) -> np.ndarray:
+            return np.load(self.index_dir / name, mmap_mode="r")
+
+        self.indptr = load("indptr.npy")
+        self.indices = load("indices.npy")
+        self.data = load("data.npy")
+        self.idf = load("idf.npy")
+        self.row_shards = load("row_shards.npy")
+        self.row_ids = load("row_ids.npy")
+
+        self.lsa_documents = None
+        if self.meta.get("lsa_components"):
+            self.lsa_documents = load("lsa_documents.npy")
+            self.lsa_components = np.load(self.index_dir / "lsa_components.npy")
+            # 特徴番号 -> LSA に使用する語の位置（使用しない語は -1）
+            self.lsa_positions = np.full(self.num_features, -1, dtype=np.int32)
+            features = np.load(self.index_dir / "lsa_features.npy")
+            self.lsa_positions[features] = np.arange(len(features), dtype=np.int32)
+
+    def vectorize_query(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """クエリを L2 正規化した tf-idf の疎ベクトル (特徴番号, 重み) に変換する"""
+        terms, weights = hash_terms(query, self.num_features)
+        weights = weights * self.idf[terms]
+        norm = np.linalg.norm(weights)
+        return terms, (weights / norm if norm > 0 else weights)
+
+    def score(self, query: str, use_lsa: bool = True) -> np.ndarray:
+        """全チャンクとクエリのコサイン類似度を計算する
+
+        TF-IDF では、行列（CSC）のクエリの語の列だけを足し合わせる（疎行列とクエリベクトルの積）。
+        LSA では、チャンクの LSA ベクトルの行列と射影したクエリベクトルの積を計算する。
+        """
+        terms, weights = self.vectorize_query(query)
+
+        if use_lsa and self.lsa_documents is not None:
+            positions = self.lsa_positions[terms]
+            mask = positions >= 0
+            query_vector = weights[mask] @ self.lsa_components[positions[mask]]
+            norm = np.linalg.norm(query_vector)
+            if norm == 0:
+                return np.zeros(self.num_rows, dtype=np.float32)
+            return self.lsa_documents @ (query_vector / norm).astype(np.float32)
+
+        scores = np.zeros(self.num_rows, dtype=np.float32)
+        for term, weight in zip(terms, weights, strict=True):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            # 1つの列に同じ行は1回しか現れないため、ファンシーインデックスの加算で正しく集計できる
+            scores[self.indices[start:end]] += self.data[start:end] * weight
+        return scores
+
+    def search(self, query: str, top_k: int = 5, use_lsa: bool = True) -> list[tuple[int, int, float]]:
+        """上位 top_k 件の (シャード番号, ドキュメントID, スコア) を返す（スコアが 0 の結果は除く）"""
+        scores = self.score(query, use_lsa=use_lsa)
+        if self.num_rows == 0:
+            return []
+        k = min(top_k, self.num_rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(self.row_shards[row]), int(self.row_ids[row]), float(scores[row])) for row in top if scores[row] > 0
+        ]
+
+
+_tfidf_indexes: dict[str, TfidfIndex] = {}
+_tfidf_indexes_lock = threading.Lock()
+
+
+def get_tfidf_index(db_path: str | Path) -> TfidfIndex:
+    """FTSデータベースに対応する TF-IDF インデックスを取得（プロセス内で使い回す）"""
+    key = str(get_tfidf_index_dir(db_path).resolve())
+    with _tfidf_indexes_lock:
+        if key not in _tfidf_indexes:
+            _tfidf_indexes[key] = TfidfIndex(key)
+        return _tfidf_indexes[key]
+
+
+def close_tfidf_index(db_path: str | Path):
+    """キャッシュした TF-IDF インデックスを破棄する（インデックスを削除・再作成する前に呼ぶ）"""
+    key = str(get_tfidf_index_dir(db_path).resolve())
+    with _tfidf_indexes_lock:
+        _tfidf_indexes.pop(key, None)
+
+
+def remove_tfidf_index(db_path: str | Path):
+    """TF-IDF インデックスを削除する"""
+    close_tfidf_index(db_path)
+    shutil.rmtree(get_tfidf_index_dir(db_path), ignore_errors=True)
+
+
+def search_tfidf(
+    db_path: str | Path,
+    query_list: list[str],
+    top_k: int = 5,
+    num_shards: int = 1,
+    use_lsa: bool = True,
+) -> list[list[dict[str, Any]]]:
+    """クエリごとに TF-IDF の上位チャンクを検索し、本文をFTSデータベースから取得する（ブロッキング）"""
+    index = get_tfidf_index(db_path)
+    hits_by_query = [index.search(query, top_k=top_k, use_lsa=use_lsa) for query in query_list]
+
+    # 返すチャンクの本文だけをシャードごとにまとめて取得する
+    ids_by_shard: dict[int, set[int]] = {}
+    for hits in hits_by_query:
+        for shard, doc_id, _ in hits:
+            ids_by_shard.setdefault(shard, set()).add(doc_id)
+
+    shard_paths = get_shard_paths(db_path, num_shards)
+    rows: dict[tuple[int, int], dict[str, Any]] = {}
+    for shard, doc_ids in ids_by_shard.items():
+        with get_connection_pool(shard_paths[shard]).connection() as conn:
+            retriever = SQLiteFTSDocumentRetriever(str(shard_paths[shard]), conn=conn)
+            placeholders = ",".join("?" * len(doc_ids))
+            for row in retriever.conn.execute(
+                f"SELECT id, file_path, title, content, chunk_id FROM documents WHERE id IN ({placeholders})",
+                list(doc_ids),
+            ):
+                rows[(shard, row["id"])] = dict(row)
+
+    return [
+        [{**rows[(shard, doc_id)], "score": score} for shard, doc_id, score in hits if (shard, doc_id) in rows]
+        for hits in hits_by_query
+    ]
+
+
+@traceable
+async def tfidf_search(
+    query_list: list[str],
+    db_path: str | Path | None = None,
+    top_k: int = 5,
+    max_tokens_per_source: int = 8192,
+    num_shards: int = 1,
+    use_lsa: bool = True,
+    rrf_k: int = 60,
+    **kwargs,
+) -> str:
+    """TF-IDF（LSA）インデックスを使用してローカルドキュメントを検索
+
+    クエリごとの上位 top_k 件を Reciprocal Rank Fusion で統合する。
+
+    Args:
+        query_list: 検索クエリのリスト
+        db_path: FTSデータベースへのパス（TF-IDF インデックスは initialize_knowledge_base で隣に作成される）
+        top_k: 各クエリで取得する結果の数（デフォルト: 5）
+        max_tokens_per_source: ソースあたりの最大トークン数
+        num_shards: FTSデータベースのシャード数
+        use_lsa: LSA ベクトルが作成されている場合は LSA で検索する
+        rrf_k: クエリ間の結果を統合する RRF の定数 k
+
+    Returns:
+        検索結果の文字列
+    """
+    try:
+        # イベントループを止めないよう、FTS検索と同じ専用スレッドプールで検索する
+        loop = asyncio.get_running_loop()
+        results_by_query = await loop.run_in_executor(
+            get_search_executor(),
+            partial(search_tfidf, db_path, query_list, top_k=top_k, num_shards=num_shards, use_lsa=use_lsa),
+        )
+        ranked_lists = [
+            [
+                {
+                    "title": f"{doc['title']} (チャンクID: {doc['chunk_id']})",
+                    "url": doc["file_path"],
+                    "content": doc["content"],
+                    "score": doc["score"],
+                    "raw_content": doc["content"],
+                    "chunk_id": doc["chunk_id"],
+                }
+                for doc in results
+            ]
+            for results in results_by_query
+        ]
+        search_docs = [
+            {
+                "query": " | ".join(query_list),
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": reciprocal_rank_fusion(ranked_lists, rrf_k=rrf_k)[: top_k * len(query_list)],
+            }
+        ]
+    except Exception as e:
+        print(f"TF-IDF検索中にエラーが発生しました: {e}")
+        search_docs = [
+            {
+                "query": " | ".join(query_list),
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": [],
+                "error": str(e),
+            }
+        ]
+
+    return deduplicate_and_format_sources(search_docs, max_tokens_per_source=max_tokens_per_source)
@@ -1,27 +1,38 @@
-# 使わない
 import asyncio
 import hashlib
 import json
+import threading
+import zlib
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from langchain.schema import Document
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import (
-    CSVLoader,
-    PyPDFLoader,
-    TextLoader,
-)
+from langchain_community.document_loaders import TextLoader
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langsmith import traceable
 
+from open_deep_researcher.retriever.local.csv_loader import PandasCSVLoader
+from open_deep_researcher.retriever.local.embedding_cache import CachedEmbeddings, EmbeddingCache
+from open_deep_researcher.retriever.local.full_text_search import (
+    SQLiteFTSDocumentRetriever,
+    chunk_documents,
+    get_shard_paths,
+)
+from open_deep_researcher.retriever.local.full_text_search import (
+    search_local_documents as search_fts_documents,
+)
+from open_deep_researcher.retriever.local.fusion import reciprocal_rank_fusion
+from open_deep_researcher.retriever.local.pdf_loader import FastPDFLoader
 from open_deep_researcher.utils import deduplicate_and_format_sources
 
 LOADER_MAPPING = {
-    ".pdf": PyPDFLoader,
+    ".pdf": FastPDFLoader,
     ".txt": TextLoader,
-    ".csv": CSVLoader,
+    ".csv": PandasCSVLoader,
 }
 
 
@@ -75,13 +86,132 @@ async def load_document(file_path: str | Path) -> list[Document]:
         return []
 
 
+class HashingEmbeddings(Embeddings):
+    """API を使わずに CPU で計算する埋め込み（文字 n-gram の feature hashing）
+
+    オフライン環境やテストで使用する。意味的な類似度は持たないが、表記の近いテキストほど近いベクトルになる。
+    ハッシュには crc32 を使うため、プロセスをまたいでも同じテキストは同じベクトルになる。
+    """
+
+    def __init__(self, dimension: int = 512, ngram_range: tuple[int, int] = (1, 3)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> list[float]:
+        text = " ".join(text.lower().split())
+        hashes = [
+            zlib.crc32(text[i : i + n].encode())
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1)
+            for i in range(len(text) - n + 1)
+        ]
+        if not hashes:
+            return [0.0] * self.dimension
+
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        # 最上位ビットで符号を決め、衝突による偏りを打ち消す
+        signs = np.where(hashes >> 31, 1.0, -1.0)
+        vector = np.bincount(hashes % self.dimension, weights=signs, minlength=self.dimension)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def _create_hashing_embeddings(embedding_model: str) -> Embeddings:
+    # "hashing-512" のように末尾の数値で次元数を指定できる
+    suffix = embedding_model.rsplit("-", 1)[-1]
+    return HashingEmbeddings(dimension=int(suffix)) if suffix.isdigit() else HashingEmbeddings()
+
+
+# 埋め込みプロバイダー名 -> モデル名を受け取って Embeddings を返す関数
+EMBEDDING_PROVIDERS: dict[str, Callable[[str], Embeddings]] = {
+    "openai": lambda embedding_model: OpenAIEmbeddings(model=embedding_model),
+    "hashing": _create_hashing_embeddings,
+}
+
+_embeddings_cache: dict[tuple[str, str], Embeddings] = {}
+_vector_stores: dict[tuple[str, str], Chroma] = {}
+_embedding_caches: dict[tuple[str, str], EmbeddingCache] = {}
+_cache_lock = threading.Lock()
+
+
+def register_embedding_provider(name: str, factory: Callable[[str], Embeddings]):
+    """埋め込みプロバイダーを追加する（factory はモデル名を受け取って Embeddings を返す）"""
+    EMBEDDING_PROVIDERS[name] = factory
+
+
 def initialize_embeddings(embedding_provider: str, embedding_model: str) -> Any:
-    """指定されたプロバイダーとモデルで埋め込みを初期化する"""
-    if embedding_provider == "openai":
-        return OpenAIEmbeddings(model=embedding_model)
-    else:
+    """指定されたプロバイダーとモデルで埋め込みを初期化する（プロバイダーとモデルの組ごとに使い回す）"""
+    if embedding_provider not in EMBEDDING_PROVIDERS:
         raise ValueError(f"サポートされていない埋め込みプロバイダー: {embedding_provider}")
 
+    key = (embedding_provider, embedding_model)
+    with _cache_lock:
+        if key not in _embeddings_cache:
+            _embeddings_cache[key] = EMBEDDING_PROVIDERS[embedding_provider](embedding_model)
+        return _embeddings_cache[key]
+
+
+def get_document_embeddings(
+    embedding_provider: str,
+    embedding_model: str,
+    embedding_cache_dir: str | Path | None = None,
+    embedding_batch_size: int = 256,
+    embedding_concurrency: int = 4,
+) -> Embeddings:
+    """インデックス作成用の埋め込みを取得
+
+    embedding_cache_dir を指定した場合は、(モデル, 本文のハッシュ) をキーにした EmbeddingCache を通し、
+    キャッシュにないチャンクだけを embedding_batch_size 件ずつ embedding_concurrency 並列で埋め込む。
+    """
+    embeddings = initialize_embeddings(embedding_provider, embedding_model)
+    if embedding_cache_dir is None:
+        return embeddings
+
+    key = (str(Path(embedding_cache_dir).resolve()), f"{embedding_provider}:{embedding_model}")
+    with _cache_lock:
+        if key not in _embedding_caches:
+            _embedding_caches[key] = EmbeddingCache(*key)
+        cache = _embedding_caches[key]
+    return CachedEmbeddings(embeddings, cache, batch_size=embedding_batch_size, max_concurrency=embedding_concurrency)
+
+
+def _open_vector_store(vector_store_path: str | Path, collection_name: str, embeddings: Embeddings) -> Chroma:
+    return Chroma(
+        persist_directory=str(vector_store_path),
+        embedding_function=embeddings,
+        collection_name=collection_name,
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+
+
+def get_vector_store(
+    vector_store_path: str | Path,
+    collection_name: str,
+    embedding_provider: str = "openai",
+    embedding_model: str = "text-embedding-3-small",
+) -> Chroma:
+    """(パス, コレクション名) ごとのベクトルストアを取得（検索のたびに作り直さない）"""
+    key = (str(Path(vector_store_path).resolve()), collection_name)
+    embeddings = initialize_embeddings(embedding_provider, embedding_model)
+    with _cache_lock:
+        if key not in _vector_stores:
+            _vector_stores[key] = _open_vector_store(key[0], collection_name, embeddings)
+        return _vector_stores[key]
+
+
+def close_vector_store(vector_store_path: str | Path, collection_name: str | None = None):
+    """キャッシュしたベクトルストアを破棄する（collection_name を省略した場合はパス配下のすべて）"""
+    path = str(Path(vector_store_path).resolve())
+    with _cache_lock:
+        for key in [key for key in _vector_stores if key[0] == path and collection_name in (None, key[1])]:
+            del _vector_stores[key]
+
 
 @traceable
 async def process_documents(  # noqa: C901
@@ -90,6 +220,9 @@ async def process_documents(  # noqa: C901
     embedding_provider: str = "openai",
     embedding_model: str = "text-embedding-3-small",
     collection_name: str | None = None,
+    embedding_cache_dir: str | Path | None = None,
+    embedding_batch_size: int = 256,
+    embedding_concurrency: int = 4,
     **kwargs,
 ) -> Any | None:
     """指定されたディレクトリ内のドキュメントを処理して埋め込みを作成
@@ -100,6 +233,9 @@ async def process_documents(  # noqa: C901
         embedding_provider: 埋め込みのプロバイダー（デフォルト: openai）
         embedding_model: 埋め込みに使用するモデル（デフォルト: text-embedding-3-small）
         collection_name: ベクトルストアのコレクション名（デフォルト: Noneでローカルパスからハッシュ生成）
+        embedding_cache_dir: 埋め込みキャッシュのディレクトリ（指定した場合、変更されたファイルでも内容が同じチャンクは再計算しない）
+        embedding_batch_size: 1回の埋め込み呼び出しでまとめるチャンク数
+        embedding_concurrency: 埋め込み呼び出しの最大並列数
 
     Returns:
         ベクトルストアインスタンスまたは処理に失敗した場合はNone
@@ -156,11 +292,7 @@ async def process_documents(  # noqa: C901
         # 既存のベクトルストアがある場合はロード
         if store_path.exists():
             try:
-                embeddings = initialize_embeddings(embedding_provider, embedding_model)
-                vector_store = Chroma(
-                    persist_directory=str(store_path), embedding_function=embeddings, collection_name=collection_name
-                )
-                return vector_store
+                return get_vector_store(store_path, collection_name, embedding_provider, embedding_model)
             except Exception as e:
                 print(f"ベクトルストアの読み込みエラー: {e}")
                 return None
@@ -168,20 +300,14 @@ async def process_documents(  # noqa: C901
             print("既存のベクトルストアが見つかりません。")
             return None
 
-    # 埋め込みを初期化
     try:
-        embeddings = initialize_embeddings(embedding_provider, embedding_model)
-
-        # ベクトルストアを初期化
-        try:
-            vector_store = Chroma(
-                persist_directory=str(store_path), embedding_function=embeddings, collection_name=collection_name
-            )
-        except Exception:
-            # コレクションが存在しない場合は新規作成 (空のドキュメントリストで初期化)
-            vector_store = Chroma.from_documents(
-                documents=[], embedding=embeddings, persist_directory=str(store_path), collection_name=collection_name
-            )
+        vector_store = _open_vector_store(
+            store_path,
+            collection_name,
+            get_document_embeddings(
+                embedding_provider, embedding_model, embedding_cache_dir, embedding_batch_size, embedding_concurrency
+            ),
+        )
 
         # 変更されたファイルの既存のベクトルを削除
         for file_path in changed_files:
@@ -205,24 +331,7 @@ async def process_documents(  # noqa: C901
                 doc.metadata["source"] = rel_path
 
             # ドキュメントを適切なサイズに分割
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=4000,
-                chunk_overlap=200,
-                separators=[
-                    "\n\n",
-                    "\n",
-                    " ",
-                    ".",
-                    ",",
-                    "\u200b",  # Zero-width space
-                    "\uff0c",  # Fullwidth comma
-                    "\u3001",  # Ideographic comma
-                    "\uff0e",  # Fullwidth full stop
-                    "\u3002",  # Ideographic full stop
-                    "",
-                ],
-            )
-            split_docs = text_splitter.split_documents(docs)
+            split_docs = chunk_documents(docs, chunk_size=4000, chunk_overlap=200)
 
             # 分割したドキュメントをベクトルストアに追加
             if split_docs:
@@ -266,9 +375,136 @@ def detect_collection_name(vector_store_path: str | Path) -> str | None:
     return None
 
 
+def _iter_fts_chunks(db_path: str | Path, num_shards: int = 1, batch_size: int = 256):
+    """FTSデータベース（とシャード）に格納されたチャンクをバッチごとに返す"""
+    for shard_path in get_shard_paths(db_path, num_shards):
+        retriever = SQLiteFTSDocumentRetriever(str(shard_path))
+        try:
+            cursor = retriever.conn.execute("SELECT file_path, title, content, chunk_id FROM documents ORDER BY id")
+            while batch := cursor.fetchmany(batch_size):
+                yield batch
+        finally:
+            retriever.close()
+
+
+def _index_fts_chunks(
+    db_path: str | Path,
+    vector_store_path: str | Path,
+    collection_name: str,
+    embedding_provider: str,
+    embedding_model: str,
+    num_shards: int,
+    embedding_cache_dir: str | Path | None,
+    embedding_batch_size: int,
+    embedding_concurrency: int,
+) -> int:
+    get_vector_store(vector_store_path, collection_name, embedding_provider, embedding_model).reset_collection()
+    embeddings = get_document_embeddings(
+        embedding_provider, embedding_model, embedding_cache_dir, embedding_batch_size, embedding_concurrency
+    )
+    vector_store = _open_vector_store(vector_store_path, collection_name, embeddings)
+
+    # 並列に埋め込めるよう、batch_size * concurrency 件ずつ add_texts に渡す
+    num_chunks = 0
+    rows_per_add = embedding_batch_size * embedding_concurrency
+    for batch in _iter_fts_chunks(db_path, num_shards=num_shards, batch_size=rows_per_add):
+        vector_store.add_texts(
+            [row["content"] for row in batch],
+            metadatas=[
+                {"source": row["file_path"], "title": row["title"], "chunk_id": row["chunk_id"]} for row in batch
+            ],
+            ids=[row["chunk_id"] for row in batch],
+        )
+        num_chunks += len(batch)
+    return num_chunks
+
+
+@traceable
+async def index_knowledge_base(
+    db_path: str | Path,
+    vector_store_path: str | Path,
+    embedding_provider: str = "hashing",
+    embedding_model: str = "hashing-512",
+    collection_name: str | None = None,
+    num_shards: int = 1,
+    embedding_cache_dir: str | Path | None = None,
+    embedding_batch_size: int = 256,
+    embedding_concurrency: int = 4,
+    **kwargs,
+) -> str | None:
+    """initialize_knowledge_base で作成したFTSデータベースのチャンクを埋め込み、ベクトルストアに格納する
+
+    FTS と同じチャンクを同じ chunk_id で格納するため、hybrid_search で両方の順位を RRF で統合できる。
+
+    Args:
+        db_path: FTSデータベースのパス
+        vector_store_path: ベクトルストアを保存するディレクトリ
+        embedding_provider: 埋め込みプロバイダー（EMBEDDING_PROVIDERS のキー）
+        embedding_model: 埋め込みモデル名
+        collection_name: コレクション名（デフォルト: None で db_path からハッシュ生成）
+        num_shards: FTSデータベースのシャード数
+        embedding_cache_dir: 埋め込みキャッシュのディレクトリ（指定した場合、過去に埋め込んだチャンクは再計算しない）
+        embedding_batch_size: 1回の埋め込み呼び出しでまとめるチャンク数
+        embedding_concurrency: 埋め込み呼び出しの最大並列数
+
+    Returns:
+        コレクション名または処理に失敗した場合はNone
+    """
+    if collection_name is None:
+        collection_name = hash_collection_name(db_path)
+    Path(vector_store_path).mkdir(parents=True, exist_ok=True)
+
+    try:
+        # 埋め込みとベクトルストアへの書き込みはブロッキングのため、イベントループの外で実行する
+        num_chunks = await asyncio.to_thread(
+            _index_fts_chunks,
+            db_path,
+            vector_store_path,
+            collection_name,
+            embedding_provider,
+            embedding_model,
+            num_shards,
+            embedding_cache_dir,
+            embedding_batch_size,
+            embedding_concurrency,
+        )
+        print(f"{num_chunks}個のチャンクをベクトルストアに格納しました（コレクション: {collection_name}）。")
+        return collection_name
+    except Exception as e:
+        print(f"ベクトルインデックス作成中にエラーが発生しました: {e}")
+        import traceback
+
+        print(traceback.format_exc())
+        return None
+
+
+def remove_vector_index(vector_store_path: str | Path, collection_name: str):
+    """コレクションを削除してキャッシュしたベクトルストアを破棄する"""
+    try:
+        # 削除に埋め込みは使わないため、API キーの不要な hashing で開く
+        get_vector_store(vector_store_path, collection_name, "hashing", "hashing").delete_collection()
+    except Exception as e:
+        print(f"ベクトルコレクションの削除中にエラーが発生しました: {e}")
+    close_vector_store(vector_store_path, collection_name)
+
+
+def _search_vectors(
+    query_list: list[str],
+    vector_store_path: str | Path,
+    embedding_provider: str,
+    embedding_model: str,
+    top_k: int,
+    collection_name: str,
+) -> list[list[tuple[Document, float]]]:
+    vector_store = get_vector_store(vector_store_path, collection_name, embedding_provider, embedding_model)
+    # クエリの埋め込みは1回のバッチで計算する
+    vectors = initialize_embeddings(embedding_provider, embedding_model).embed_documents(query_list)
+    return [vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=top_k) for vector in vectors]
+
+
 @traceable
 async def search_local_documents(
-    query: str,
+    query: str | list[str],
     vector_store_path: str | Path,
     embedding_provider: str = "openai",
     embedding_model: str = "text-embedding-3-small",
@@ -278,40 +514,60 @@ async def search_local_documents(
     """ベクトルストアを使用してローカルドキュメントを検索
 
     Args:
-        query: 検索クエリ
+        query: 検索クエリ、または検索クエリのリスト（リストの場合は埋め込みを1回のバッチで計算する）
         vector_store_path: ベクトルストアへのパス
         embedding_provider: 埋め込みプロバイダー（デフォルト: openai）
         embedding_model: 埋め込みに使用するモデル（デフォルト: text-embedding-3-small）
-        top_k: 返す結果の数（デフォルト: 5）
+        top_k: 各クエリで返す結果の数（デフォルト: 5）
         collection_name: ベクトルストアのコレクション名（デフォルト: None）
 
     Returns:
-        deduplicate_and_format_sources で使用するための検索結果のリスト
+        deduplicate_and_format_sources で使用するための検索結果のリスト（クエリごとに1件）
     """
+    query_list = query if isinstance(query, list) else [query]
     try:
-        store_path = Path(vector_store_path)
-        embeddings = initialize_embeddings(embedding_provider, embedding_model)
-        vector_store = Chroma(
-            persist_directory=str(store_path),
-            embedding_function=embeddings,
-            collection_name=collection_name,
+        results_by_query = await asyncio.to_thread(
+            _search_vectors,
+            query_list,
+            vector_store_path,
+            embedding_provider,
+            embedding_model,
+            top_k,
+            collection_name or "default",
         )
+    except Exception as e:
+        print(f"ローカルドキュメント検索中にエラーが発生しました: {e}")
+        return [
+            {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": [],
+                "error": str(e),
+            }
+            for query in query_list
+        ]
 
-        results = vector_store.similarity_search_with_relevance_scores(query, k=top_k)
+    responses = []
+    for query, results in zip(query_list, results_by_query, strict=True):
         formatted_results = []
-        for doc, score in results:
+        for doc, distance in results:
             source = doc.metadata.get("source", "不明")
+            chunk_id = doc.metadata.get("chunk_id")
+            chunk_info = f" (チャンクID: {chunk_id})" if chunk_id else ""
             formatted_results.append(
                 {
-                    "title": Path(source).name,
+                    "title": f"{doc.metadata.get('title') or Path(source).name}{chunk_info}",
                     "url": source,
                     "content": doc.page_content,
-                    "score": score,
-                    "raw_content": "",
+                    "score": 1.0 - distance,  # コサイン距離を類似度に変換
+                    "raw_content": doc.page_content,
+                    "chunk_id": chunk_id,
                 }
             )
 
-        return [
+        responses.append(
             {
                 "query": query,
                 "follow_up_questions": None,
@@ -319,19 +575,8 @@ async def search_local_documents(
                 "images": [],
                 "results": formatted_results,
             }
-        ]
-    except Exception as e:
-        print(f"ローカルドキュメント検索中にエラーが発生しました: {e}")
-        return [
-            {
-                "query": query,
-                "follow_up_questions": None,
-                "answer": None,
-                "images": [],
-                "results": [],
-                "error": str(e),
-            }
-        ]
+        )
+    return responses
 
 
 @traceable
@@ -368,29 +613,75 @@ async def local_search(
             collection_name = "default"
             print(f"No collection name specified or detected, using default: {collection_name}")
 
-    search_docs = []
-    for query in query_list:
-        try:
-            result = await search_local_documents(
-                query,
-                vector_store_path,
-                embedding_provider,
-                embedding_model,
-                top_k,
-                collection_name,
-            )
-            search_docs.extend(result)
-        except Exception as e:
-            print(f"クエリ '{query}'のローカル検索中にエラーが発生しました: {str(e)}")
-            search_docs.append(
-                {
-                    "query": query,
-                    "follow_up_questions": None,
-                    "answer": None,
-                    "images": [],
-                    "results": [],
-                    "error": str(e),
-                }
-            )
+    search_docs = await search_local_documents(
+        query_list,
+        vector_store_path,
+        embedding_provider,
+        embedding_model,
+        top_k,
+        collection_name,
+    )
+    return deduplicate_and_format_sources(search_docs, max_tokens_per_source=max_tokens_per_source)
+
 
+@traceable
+async def hybrid_search(
+    query_list: list[str],
+    db_path: str | Path | None = None,
+    vector_store_path: str | Path | None = None,
+    embedding_provider: str = "hashing",
+    embedding_model: str = "hashing-512",
+    collection_name: str | None = None,
+    top_k: int = 5,
+    rrf_k: int = 60,
+    max_tokens_per_source: int = 8192,
+    **kwargs,
+) -> str:
+    """FTS とベクトル検索の結果を Reciprocal Rank Fusion で統合して検索
+
+    FTS 側はすべてのクエリを1つのSQL文で RRF 統合した順位、ベクトル側はクエリごとの順位を RRF で統合した順位を使い、
+    最後に両者を RRF で統合する。ベクトルストアは index_knowledge_base で FTS と同じチャンクから作成しておく。
+
+    Args:
+        query_list: 検索クエリのリスト
+        db_path: FTSデータベースへのパス
+        vector_store_path: ベクトルストアへのパス
+        embedding_provider: 埋め込みプロバイダー（index_knowledge_base と同じ値を指定する）
+        embedding_model: 埋め込みモデル名（index_knowledge_base と同じ値を指定する）
+        collection_name: コレクション名（デフォルト: None で db_path からハッシュ生成）
+        top_k: 各クエリ・各検索方式で取得する結果の数
+        rrf_k: RRF の定数 k
+        max_tokens_per_source: ソースあたりの最大トークン数
+        **kwargs: FTS 検索の設定（title_weight, retrieval_mode, num_shards など）
+
+    Returns:
+        検索結果の文字列
+    """
+    if collection_name is None:
+        collection_name = hash_collection_name(db_path)
+
+    fts_responses, vector_responses = await asyncio.gather(
+        search_fts_documents(query_list, db_path, top_k=top_k, rrf_k=rrf_k, **kwargs),
+        search_local_documents(
+            query_list,
+            vector_store_path,
+            embedding_provider=embedding_provider,
+            embedding_model=embedding_model,
+            top_k=top_k,
+            collection_name=collection_name,
+        ),
+    )
+
+    vector_ranked = reciprocal_rank_fusion([response["results"] for response in vector_responses], rrf_k=rrf_k)
+    fused = reciprocal_rank_fusion([fts_responses[0]["results"], vector_ranked], rrf_k=rrf_k)
+
+    search_docs = [
+        {
+            "query": " | ".join(query_list),
+            "follow_up_questions": None,
+            "answer": None,
+            "images": [],
+            "results": fused[: top_k * len(query_list)],
+        }
+    ]
     return deduplicate_and_format_sources(search_docs, max_tokens_per_source=max_tokens_per_source)
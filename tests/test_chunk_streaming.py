@@ -0,0 +1,46 @@
+from open_deep_researcher.retriever.local import full_text_search
+from open_deep_researcher.retriever.local.csv_loader import PandasCSVLoader
+from open_deep_researcher.retriever.local.full_text_search import load_and_chunk_file
+
+
+def test_large_file_is_spilled_in_batches(tmp_path, monkeypatch):
+    path = tmp_path / "notes.txt"
+    path.write_text("\n\n".join(f"paragraph {i} " + "word " * 20 for i in range(200)))
+    expected = load_and_chunk_file(str(path), "notes.txt", chunk_size=100, chunk_overlap=0)
+
+    monkeypatch.setattr(full_text_search, "SPILL_CHUNKS", 30)
+    spilled = load_and_chunk_file(str(path), "notes.txt", chunk_size=100, chunk_overlap=0, spill_dir=str(tmp_path))
+
+    assert spilled.spill_path is not None and not spilled.chunks
+    batches = list(spilled.iter_batches())
+    assert all(len(batch) <= 30 for batch in batches)
+    assert [chunk for batch in batches for chunk in batch] == [
+        chunk for batch in expected.iter_batches() for chunk in batch
+    ]
+    assert batches[-1][-1]["title"] == f"notes.txt (chunk {expected.num_chunks}/{expected.num_chunks})"
+    assert not (tmp_path / spilled.spill_path).exists()
+
+
+class FailingCSVLoader(PandasCSVLoader):
+    """2つ目の読み込み単位の後で pandas が失敗する CSV を模したローダー"""
+
+    def iter_rows(self):
+        for i, batch in enumerate(super().iter_rows()):
+            if i == 2:
+                raise ValueError("broken row")
+            yield batch
+
+
+def test_csv_falls_back_after_streamed_blocks_without_duplicates(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("id,text\n" + "".join(f"{i},row{i}\n" for i in range(40)))
+
+    documents = list(FailingCSVLoader(path, block_chars=40, read_rows=10).lazy_load())
+
+    # pandas のブロックで返し終えた行は CSVLoader で読み直さない
+    streamed = [doc for doc in documents if doc.page_content.startswith("id,text")]
+    fallback = [doc for doc in documents if not doc.page_content.startswith("id,text")]
+    assert streamed and fallback
+    streamed_rows = [line for doc in streamed for line in doc.page_content.split("\n")[1:]]
+    assert streamed_rows == [f"{i},row{i}" for i in range(len(streamed_rows))]
+    assert [doc.metadata["row"] for doc in fallback] == list(range(len(streamed_rows), 40))
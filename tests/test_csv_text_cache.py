@@ -0,0 +1,77 @@
+import csv
+import os
+
+import pytest
+
+from open_deep_researcher.retriever.local.csv_loader import PandasCSVLoader
+from open_deep_researcher.retriever.local.full_text_search import load_file_documents
+from open_deep_researcher.retriever.local.text_cache import ExtractedTextCache
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "rows.csv"
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name, quoted", "text"])
+        for i in range(300):
+            writer.writerow([i, ["plain", 'with "quote"', "multi\nline", "a,b"][i % 4], "x" * (i % 90)])
+    return path
+
+
+def test_csv_cache_is_shared_across_block_sizes(csv_path, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "text_cache"
+    expected = {
+        block_chars: [doc.page_content for doc in PandasCSVLoader(csv_path, block_chars=block_chars).load()]
+        for block_chars in (200, 1000)
+    }
+    list(load_file_documents(csv_path, text_cache_dir=cache_dir, csv_options={"block_chars": 200}))
+
+    # 2回目以降は chunk_size（block_chars）が違ってもパースせず、キャッシュした行をまとめ直す
+    monkeypatch.setattr(PandasCSVLoader, "iter_rows", lambda self: pytest.fail("CSV を再パースした"))
+    for block_chars, contents in expected.items():
+        cached = load_file_documents(csv_path, text_cache_dir=cache_dir, csv_options={"block_chars": block_chars})
+        assert [doc.page_content for doc in cached] == contents
+
+    assert len(list(cache_dir.rglob("*.txt.z"))) == 1
+
+
+def test_prune_removes_least_recently_used_entries(tmp_path):
+    cache = ExtractedTextCache(tmp_path)
+    keys = [cache.make_key(f"digest{i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, [f"{i}" * 1000])
+        os.utime(cache._paths(key)[0], (i, i))  # 0 が最も古い
+    cache.get(keys[0])  # 読み込んだエントリは最近使われたものとして残る
+
+    entry_bytes = sum(path.stat().st_size for path in cache._paths(keys[1]))
+    assert cache.prune(max_bytes=2 * entry_bytes) == 1
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ["0" * 1000]
+    assert cache.get(keys[2]) == ["2" * 1000]
+    assert not any(path.exists() for path in cache._paths(keys[1]))
+
+
+def test_writer_streams_batches_and_discards_failed_entry(tmp_path):
+    cache = ExtractedTextCache(tmp_path)
+    key = cache.make_key("digest")
+    pages = [f"page {i} " + "あ" * (i * 37 % 500) for i in range(200)]
+    with cache.writer(key) as entry:
+        for start in range(0, len(pages), 7):
+            entry.write(pages[start : start + 7])
+
+    # 小さい read_size でも途中で分割せずにページ単位で返す
+    batches = list(cache.iter_pages(key, read_size=64))
+    assert len(batches) > 1
+    assert [page for batch in batches for page in batch] == pages
+
+    failed = cache.make_key("failed")
+    with pytest.raises(RuntimeError):
+        with cache.writer(failed) as entry:
+            entry.write(pages[:3])
+            raise RuntimeError("パースに失敗した")
+    assert cache.iter_pages(failed) is None
+    assert sorted(path.name for path in tmp_path.rglob("*") if path.is_file()) == sorted(
+        path.name for path in cache._paths(key)
+    )
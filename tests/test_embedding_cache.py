@@ -0,0 +1,58 @@
+import multiprocessing
+
+import numpy as np
+
+from open_deep_researcher.retriever.local.embedding_cache import EmbeddingCache
+
+DIMENSION = 8
+
+
+def _digest(worker: int, i: int) -> bytes:
+    return f"{worker}:{i}".encode()
+
+
+def put_vectors(cache_dir: str, worker: int):
+    cache = EmbeddingCache(cache_dir, "test:model")
+    for batch in range(20):
+        hashes = [_digest(worker, batch * 5 + i) for i in range(5)] + [b"shared"]
+        vectors = [[worker * 1000 + batch * 5 + i] * DIMENSION for i in range(5)] + [[-1.0] * DIMENSION]
+        cache.put_many(hashes, vectors)
+    cache.close()
+
+
+def test_concurrent_processes_do_not_overwrite_rows(tmp_path):
+    # 複数のプロセスが同時に追記しても、各ハッシュが自分のベクトルの行を指す
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=put_vectors, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = EmbeddingCache(tmp_path, "test:model")
+    hashes = [_digest(worker, i) for worker in range(4) for i in range(100)]
+    vectors = cache.get_many([*hashes, b"shared"])
+    for worker in range(4):
+        for i in range(100):
+            np.testing.assert_array_equal(vectors[_digest(worker, i)], [worker * 1000 + i] * DIMENSION)
+    np.testing.assert_array_equal(vectors[b"shared"], [-1.0] * DIMENSION)
+    assert len(cache) == 401
+    assert cache.vectors_path.stat().st_size == 401 * 4 * DIMENSION
+    cache.close()
+
+
+def test_interrupted_write_is_truncated(tmp_path):
+    cache = EmbeddingCache(tmp_path, "test:model")
+    cache.put_many([b"a"], [[1.0] * DIMENSION])
+    # 索引をコミットする前に中断した書き込みの残り（行の途中まで）
+    with cache.vectors_path.open("ab") as f:
+        f.write(np.full(DIMENSION + 3, 9.0, dtype=np.float32).tobytes())
+
+    cache.put_many([b"b"], [[2.0] * DIMENSION])
+
+    vectors = cache.get_many([b"a", b"b"])
+    np.testing.assert_array_equal(vectors[b"a"], [1.0] * DIMENSION)
+    np.testing.assert_array_equal(vectors[b"b"], [2.0] * DIMENSION)
+    assert cache.vectors_path.stat().st_size == 2 * 4 * DIMENSION
+    cache.close()
@@ -0,0 +1,20 @@
+import pytest
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever
+
+
+@pytest.mark.parametrize(("journal_mode", "synchronous"), [("wal", 1), ("delete", 2)])
+def test_bulk_load_restores_journal_settings(tmp_path, journal_mode, synchronous):
+    retriever = SQLiteFTSDocumentRetriever(str(tmp_path / "fts.sqlite"))
+    retriever.create_document_table()
+    retriever.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    retriever.conn.execute(f"PRAGMA synchronous={synchronous}")
+
+    retriever.bulk_insert_documents(
+        [{"file_path": "a.txt", "title": "a.txt (chunk 1/1)", "content": "lighthouse keeper", "chunk_id": "a_0"}]
+    )
+
+    assert retriever.conn.execute("PRAGMA journal_mode").fetchone()[0] == journal_mode
+    assert retriever.conn.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+    assert retriever.search("lighthouse", limit=1)
+    retriever.close()
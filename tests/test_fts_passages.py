@@ -0,0 +1,65 @@
+import pytest
+
+from open_deep_researcher.retriever.local.full_text_search import SQLiteFTSDocumentRetriever
+
+PASSAGES = [
+    "introduction to the corpus",
+    "background material",
+    "history of lighthouses",
+    "the lighthouse keeper lit the lamp",
+    "weather on the coast",
+    "another lighthouse stood on the cape",
+    "shipping routes",
+    "unrelated appendix",
+]
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    retriever = SQLiteFTSDocumentRetriever(str(tmp_path / "fts.sqlite"))
+    retriever.create_document_table()
+    retriever.insert_documents(
+        [
+            {"file_path": "coast.txt", "title": f"coast.txt (chunk {i + 1})", "content": text, "chunk_id": f"c_{i}"}
+            for i, text in enumerate(PASSAGES)
+        ]
+    )
+    yield retriever
+    retriever.close()
+
+
+def _passage_counts(results):
+    return {text: sum(text in result["content"] for result in results) for text in PASSAGES}
+
+
+def test_overlapping_windows_are_merged(retriever):
+    # ヒットは 2, 3, 5 番目。window=1 の範囲 [1,3] [2,4] [4,6] は重なるため1つの結果にまとめる
+    results = retriever.search_passages("lighthouse", limit=10, window=1)
+
+    assert len(results) == 1
+    counts = _passage_counts(results)
+    assert all(counts[text] == 1 for text in PASSAGES[1:7])
+    assert counts[PASSAGES[0]] == counts[PASSAGES[7]] == 0
+
+
+def test_hit_connecting_two_windows_merges_them(retriever):
+    # "keeper" (3) と "shipping" (6) の範囲 [3,3] [6,6] は離れているが、"weather" (4) と "cape" (5) で隣接してつながる
+    results = retriever.search_many(["keeper", "shipping", "weather", "cape"], limit=10, window=0)
+
+    assert len(results) == 1
+    assert all(count <= 1 for count in _passage_counts(results).values())
+
+
+def test_search_many_passages_return_snippet(retriever):
+    single = retriever.search_passages("keeper", limit=1, window=1)
+    many = retriever.search_many(["keeper", "nothing matches"], limit=1, window=1)
+
+    assert many[0]["snippet"] == single[0]["snippet"]
+    assert "<mark>" in many[0]["snippet"]
+    assert many[0]["content"] == single[0]["content"]
+
+
+def test_search_many_chunks_have_no_snippet(retriever):
+    results = retriever.search_many(["keeper"], limit=1)
+
+    assert "snippet" not in results[0]
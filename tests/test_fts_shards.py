@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from open_deep_researcher.retriever.local.full_text_search import (
+    ShardedFTSWriter,
+    get_shard_paths,
+    remove_knowledge_base,
+    search_local_documents,
+)
+
+FILLER = " ".join(f"filler{i}" for i in range(40))
+
+# strong.txt はどのチャンクにもクエリの語を何度も含む。weak*.txt は長いチャンクに1回だけ含む
+CORPUS = {
+    "strong.txt": [f"lighthouse keeper lighthouse keeper lamp lighthouse part {i}" for i in range(4)],
+    **{f"weak{n}.txt": [f"{FILLER} lighthouse {FILLER}", f"{FILLER} keeper {FILLER}"] for n in range(10)},
+}
+
+
+async def _ingest(db_path, num_shards):
+    async with ShardedFTSWriter(db_path, num_shards=num_shards) as writer:
+        for file_path, texts in CORPUS.items():
+            await writer.add(
+                file_path,
+                [
+                    {
+                        "file_path": file_path,
+                        "title": f"{file_path} (chunk {i + 1})",
+                        "content": text,
+                        "chunk_id": str(i),
+                    }
+                    for i, text in enumerate(texts)
+                ],
+            )
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    paths = {num_shards: tmp_path / f"fts_{num_shards}.sqlite" for num_shards in (1, 4)}
+    for num_shards, db_path in paths.items():
+        asyncio.run(_ingest(db_path, num_shards))
+    # weak のファイルが strong.txt と別のシャードに入り、各シャードに1位のヒットがある状態を確認しておく
+    assert sum(path.exists() for path in get_shard_paths(paths[4], 4)) > 1
+    yield paths
+    for num_shards, db_path in paths.items():
+        remove_knowledge_base(db_path, num_shards)
+
+
+def _search(db_path, num_shards, query, **kwargs):
+    (response,) = asyncio.run(search_local_documents(query, db_path, top_k=2, num_shards=num_shards, **kwargs))
+    assert "error" not in response
+    return [(result["url"], result["chunk_id"]) for result in response["results"]]
+
+
+@pytest.mark.parametrize("retrieval_mode", ["chunk", "passage"])
+def test_sharded_query_list_matches_unsharded(indexes, retrieval_mode):
+    query = ["lighthouse", "keeper"]
+    unsharded = _search(indexes[1], 1, query, retrieval_mode=retrieval_mode, passage_window=0)
+    sharded = _search(indexes[4], 4, query, retrieval_mode=retrieval_mode, passage_window=0)
+
+    assert {url for url, _ in unsharded} == {"strong.txt"}
+    assert sharded == unsharded
+
+
+def test_sharded_single_query_matches_unsharded(indexes):
+    assert _search(indexes[4], 4, "lighthouse") == _search(indexes[1], 1, "lighthouse")
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from open_deep_researcher.retriever.local.full_text_search import ParsePool
+
+
+def parse_file(name: str) -> list[dict[str, str]]:
+    # slow で始まるファイルはワーカーが応答しなくなった状態を再現する
+    if name.startswith("slow"):
+        time.sleep(60)
+    return [{"file_path": name}]
+
+
+def parse_with_children(pid_path: str) -> list[dict[str, str]]:
+    # 大きな PDF のページ抽出のように、ワーカーが子プロセスのプールを起動して応答しなくなった状態を再現する
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pids = list(executor.map(_child_pid, range(2)))
+        Path(pid_path).write_text(" ".join(map(str, pids)))
+        executor.submit(time.sleep, 60).result()
+    return []
+
+
+def _child_pid(_: int) -> int:
+    time.sleep(0.5)  # 2つのタスクが別々のプロセスで実行されるようにする
+    return os.getpid()
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        state = Path(f"/proc/{pid}/stat").read_text().split(")")[-1].split()[0]
+    except FileNotFoundError:
+        return False
+    return state not in ("Z", "X")
+
+
+async def _run_all(pool: ParsePool, names: list[str], timeout: float) -> dict[str, tuple[str, float]]:
+    start = time.monotonic()
+    results = {}
+
+    async def run(name: str):
+        try:
+            await pool.run(name, timeout=timeout)
+            results[name] = ("ok", time.monotonic() - start)
+        except TimeoutError:
+            results[name] = ("timeout", time.monotonic() - start)
+
+    await asyncio.gather(*(run(name) for name in names))
+    return results
+
+
+def test_timeout_does_not_block_later_files():
+    pool = ParsePool(max_workers=1, func=parse_file)
+    try:
+        results = asyncio.run(_run_all(pool, ["slow.txt", "a_small.txt", "b_small.txt", "c_small.txt"], timeout=2.0))
+    finally:
+        pool.close()
+
+    assert results["slow.txt"][0] == "timeout"
+    # 小さいファイルは応答しないワーカーの後ろで待たされず、キュー待ちの時間もタイムアウトに数えない
+    for name in ("a_small.txt", "b_small.txt", "c_small.txt"):
+        assert results[name][0] == "ok", results
+
+
+def test_pool_is_reusable_after_timeout():
+    pool = ParsePool(max_workers=1, func=parse_file)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await pool.run("slow.txt", timeout=1.0)
+        return await pool.run("small.txt", timeout=10.0)
+
+    try:
+        assert asyncio.run(main()) == [{"file_path": "small.txt"}]
+    finally:
+        pool.close()
+
+
+def test_close_does_not_wait_for_running_files():
+    pool = ParsePool(max_workers=1, func=parse_file)
+
+    async def main():
+        task = asyncio.create_task(pool.run("slow.txt", timeout=30.0))
+        await asyncio.sleep(2.0)  # ワーカーが起動して slow.txt を実行し始めるまで待つ
+        start = time.monotonic()
+        pool.close()
+        elapsed = time.monotonic() - start
+        task.cancel()
+        return elapsed
+
+    assert asyncio.run(main()) < 1.0
+
+
+def test_timeout_terminates_worker_child_processes(tmp_path):
+    pool = ParsePool(max_workers=1, func=parse_with_children)
+    pid_path = tmp_path / "pids"
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await pool.run(str(pid_path), timeout=8.0)
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.close()
+
+    pids = [int(pid) for pid in pid_path.read_text().split()]
+    deadline = time.monotonic() + 5.0
+    while any(map(_is_running, pids)) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not any(map(_is_running, pids))